@@ -7,10 +7,18 @@ Created on Fri Jun 28 14:03:07 2024
 
 import sqlite3
 import datetime
+import threading
+import logging
 import jwt
 
 DATABASE = 'tokens.db'
 
+TOKEN_DUREE = datetime.timedelta(hours=12)  # Durée de validité d'un token
+# Un token déjà émis n'est réutilisé au login que s'il reste valide au moins ce délai
+TOKEN_REUTILISATION_MIN = datetime.timedelta(hours=1)
+
+logger = logging.getLogger(__name__)
+
 def init_db():
     with sqlite3.connect(DATABASE) as conn:
         cursor = conn.cursor()
@@ -29,6 +37,12 @@ def init_db():
                 expiration DATETIME NOT NULL
             )
         ''')
+        # Mode WAL : les lectures (validation) ne sont pas bloquées par les
+        # écritures (login, purge). Le réglage est conservé dans le fichier.
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tokens_token ON tokens (token)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tokens_expiration ON tokens (expiration)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tokens_username_expiration ON tokens (username, expiration)")
         conn.commit()
 
 def add_user(username, password):
@@ -43,9 +57,58 @@ def authenticate_user(username, password, secret_key):
         cursor.execute("SELECT * FROM users WHERE username=? AND password=?", (username, password))
         user = cursor.fetchone()
         if user:
-            expiration = datetime.datetime.utcnow() + datetime.timedelta(hours=12)
+            maintenant = datetime.datetime.utcnow()
+
+            # Réutilisation du dernier token encore valide de l'utilisateur :
+            # un login ne crée plus systématiquement une nouvelle ligne.
+            cursor.execute("SELECT token FROM tokens WHERE username=? AND expiration>? ORDER BY expiration DESC LIMIT 1",
+                           (username, maintenant + TOKEN_REUTILISATION_MIN))
+            existant = cursor.fetchone()
+            if existant:
+                try:
+                    jwt.decode(existant[0], secret_key, algorithms=["HS256"])
+                    return existant[0]
+                except jwt.InvalidTokenError:
+                    pass  # Signé avec une autre clé : un nouveau token est émis
+
+            expiration = maintenant + TOKEN_DUREE
             token = jwt.encode({'user': username, 'exp': expiration}, secret_key, algorithm="HS256")
             cursor.execute("INSERT INTO tokens (token, username, expiration) VALUES (?, ?, ?)", (token, username, expiration))
             conn.commit()
             return token
     return None
+
+def purge_expired_tokens():
+    """Supprime les tokens expirés et renvoie le nombre de lignes supprimées."""
+    with sqlite3.connect(DATABASE) as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM tokens WHERE expiration<?", (datetime.datetime.utcnow(),))
+        conn.commit()
+        return cursor.rowcount
+
+# Purge périodique des tokens expirés dans un thread de fond
+class TokenPurger:
+    def __init__(self, interval=3600):
+        self.interval = interval  # Délai entre deux purges (secondes)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='token-purge', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            try:
+                supprimes = purge_expired_tokens()
+                if supprimes:
+                    logger.info(f"{supprimes} token(s) expiré(s) supprimé(s)")
+            except sqlite3.Error as e:
+                logger.error(f"Échec de la purge des tokens : {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
@@ -11,7 +11,7 @@ from sqlalchemy import Table, Column, Integer, BigInteger, MetaData, Index, Text
 import statistics
 import tracemalloc
 import logging
-from db_utils import add_user, authenticate_user
+from db_utils import init_db, add_user, authenticate_user, TokenPurger
 from functools import wraps
 import sqlite3
 import jwt
@@ -31,12 +31,18 @@ DATABASE = 'tokens.db'
 # Configuration de la journalisation
 logging.basicConfig(level=logging.INFO)
 
+# Création des tables et index de la base des tokens si besoin
+init_db()
+
 # Ajout d'un utilisateur de test, gestion des exceptions
 try:
     add_user('arscg', 'arscg')
 except Exception as e:
     logging.error(f"Error adding user: {e}")
 
+# Purge périodique des tokens expirés
+token_purger = TokenPurger().start()
+
 @app.route('/login', methods=['POST'])
 def login():
     """
@@ -8,26 +8,40 @@ import mlflow
 import matplotlib
 matplotlib.use('Agg')  # Utilise 'Agg' backend pour Matplotlib, nécessaire pour les environnements sans interface graphique
 import os
+import sys
 import logging
-import datetime
+import multiprocessing
+import sqlite3
 from functools import wraps
-from db_utils import init_db, add_user, authenticate_user  # Import des utilitaires pour la base de données
-from logic import train_model, predict_model, log_rmse, fetch_rmse_history  # Import des fonctions logiques principales
+from concurrent.futures.process import BrokenProcessPool
+from db_utils import init_db, add_user, authenticate_user, validate_token, revoke_token, purge_expired_tokens, TokenPurger  # Import des utilitaires pour la base de données
+from logic import entrainer, configurer_mlflow, MODES_ENTRAINEMENT, predict_model, log_rmse, fetch_rmse_history, model_cache  # Import des fonctions logiques principales
+from recherche import rechercher, parametres_recherche  # Recherche parallèle des ordres SARIMAX
+from training_jobs import JobManager, STATUTS_FINAUX  # Entraînements exécutés en tâche de fond
 from models import DataCleaner, SARIMAXModel, CustomModel  # Import des modèles
-import jwt  # Import pour JSON Web Token
-import sqlite3  # Import pour la gestion de la base de données SQLite
+
+# Module commun aux API E3 et E4 : Projet/commun/json_provider.py
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'commun')))
+
+from json_provider import install_json_provider  # Fournisseur JSON commun (NumPy / pandas, orjson si installé)
 
 warnings.filterwarnings("ignore")  # Ignore les avertissements
 
 app = Flask(__name__)  # Initialise l'application Flask
+install_json_provider(app)  # Sérialisation JSON des types NumPy / pandas (orjson si installé)
 Swagger(app)  # Initialise Swagger pour la documentation automatique des API
 logging.basicConfig(level=logging.INFO)  # Configure le logging au niveau INFO
 
-mlflow.set_tracking_uri("http://localhost:5000")  # Configure l'URI de tracking pour MLflow
-mlflow.set_experiment("train_experiment")  # Définit l'expérience MLflow
+MLFLOW_TRACKING_URI = "http://localhost:5000"  # URI de tracking MLflow
+MLFLOW_EXPERIMENT = "train_experiment"  # Expérience MLflow des entraînements
+configurer_mlflow(MLFLOW_TRACKING_URI, MLFLOW_EXPERIMENT)
 
 app.config['SECRET_KEY'] = 'd3a6e8b45f8e4c73a9a4f6e7a9c1b2d4e5f6a7b8c9d0e1f2g3h4i5j6k7l8m9n0'  # Clé secrète pour JWT
 DATABASE = 'tokens.db'  # Nom du fichier de base de données SQLite pour les tokens
+JOBS_DATABASE = 'jobs.db'  # Base SQLite des tâches d'entraînement (partagée entre workers)
+MAX_ENTRAINEMENTS = 1  # Entraînements exécutés en parallèle par worker
+
+init_db()  # Crée les tables de la base des tokens si besoin (aussi sous gunicorn, voir wsgi.py)
 
 # Ajoute un utilisateur dans la base de données au démarrage
 try:
@@ -35,6 +49,15 @@ try:
 except Exception as e:
     logging.error(f"Error adding user: {e}")  # Logue une erreur si l'ajout échoue
 
+# Les processus d'entraînement (lancés par 'spawn') réimportent le module principal :
+# les threads de fond et le pool ne sont démarrés que dans les processus de l'API.
+if multiprocessing.parent_process() is None:
+    token_purger = TokenPurger(purge_expired_tokens).start()  # Purge périodique des tokens expirés
+    model_cache.start()  # Chargement du modèle en production puis vérification périodique des nouvelles versions
+    # Pool de processus des entraînements : /train ne bloque plus les prédictions ni les autres utilisateurs
+    job_manager = JobManager(JOBS_DATABASE, max_workers=MAX_ENTRAINEMENTS,
+                             initializer=configurer_mlflow, initargs=(MLFLOW_TRACKING_URI, MLFLOW_EXPERIMENT))
+
 # Route pour l'authentification des utilisateurs
 @app.route('/login', methods=['POST'])
 def login():
@@ -66,10 +89,15 @@ def login():
               type: string
       401:
         description: Authentification échouée
+      503:
+        description: Base d'authentification momentanément indisponible
     """
     auth = request.json  # Récupère les données JSON envoyées avec la requête
     if auth:
-        token = authenticate_user(auth['username'], auth['password'], app.config['SECRET_KEY'])  # Authentifie l'utilisateur
+        try:
+            token = authenticate_user(auth['username'], auth['password'], app.config['SECRET_KEY'])  # Authentifie l'utilisateur
+        except sqlite3.OperationalError as e:
+            return base_indisponible(e)
         if token:
             return jsonify({'token': token})  # Retourne le token JWT si l'authentification est réussie
     return jsonify({'message': 'Authentification échouée'}), 401  # Retourne une erreur 401 si l'authentification échoue
@@ -79,6 +107,12 @@ def login():
 def index():
     return render_template('login.html')
 
+# Base SQLite saturée (pool de connexions épuisé, verrou trop long) : erreur passagère,
+# le client doit réessayer plutôt que se réauthentifier
+def base_indisponible(erreur):
+    logging.warning(f"Base SQLite indisponible : {erreur}")
+    return jsonify({'message': 'Service momentanément indisponible'}), 503, {'Retry-After': '1'}
+
 # Décorateur pour exiger un token pour accéder à certaines routes
 def token_required(f):
     @wraps(f)
@@ -87,31 +121,43 @@ def token_required(f):
         if not token:
             return jsonify({'message': 'Token manquant'}), 401  # Retourne une erreur 401 si le token est manquant
         try:
-            with sqlite3.connect(DATABASE) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM tokens WHERE token=?", (token,))
-                token_data = cursor.fetchone()
-                if not token_data:
-                    return jsonify({'message': 'Token invalide'}), 401  # Retourne une erreur 401 si le token est invalide
-                expiration = token_data[3]
-                if isinstance(expiration, str):
-                    expiration = datetime.datetime.strptime(expiration, '%Y-%m-%d %H:%M:%S.%f')
-                if expiration < datetime.datetime.utcnow():
-                    return jsonify({'message': 'Token expiré'}), 401  # Retourne une erreur 401 si le token a expiré
-                data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])  # Décode le token JWT
-        except jwt.ExpiredSignatureError:
-            return jsonify({'message': 'Token expiré'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'message': 'Token invalide'}), 401
+            erreur = validate_token(token, app.config['SECRET_KEY'])  # Vérifie le token (cache en mémoire, puis base SQLite)
+        except sqlite3.OperationalError as e:
+            return base_indisponible(e)  # Retourne une erreur 503 si la base est saturée
+        if erreur:
+            return jsonify({'message': erreur}), 401  # Retourne une erreur 401 si le token est invalide ou expiré
         return f(*args, **kwargs)  # Appelle la fonction décorée si tout est correct
     return decorated
 
-# Route pour entraîner un modèle
+# Route pour révoquer un token
+@app.route('/logout', methods=['POST'])
+@token_required  # Exige un token pour accéder à cette route
+def logout():
+    """
+    Révocation du token de l'utilisateur
+    ---
+    tags:
+      - Authentification
+    responses:
+      200:
+        description: Token révoqué
+      401:
+        description: Token manquant ou invalide
+      503:
+        description: Base d'authentification momentanément indisponible
+    """
+    try:
+        revoke_token(request.headers.get('x-access-tokens'))  # Supprime le token de la base et du cache
+    except sqlite3.OperationalError as e:
+        return base_indisponible(e)
+    return jsonify({'message': 'Token révoqué'})
+
+# Route pour entraîner un modèle (en tâche de fond)
 @app.route('/train', methods=['POST'])
 @token_required  # Exige un token pour accéder à cette route
 def train():
     """
-    Entraîner le modèle
+    Soumettre un entraînement du modèle
     ---
     tags:
       - Modèle
@@ -119,6 +165,7 @@ def train():
       - name: body
         in: body
         required: true
+        description: "Liste des mesures, ou objet {data, mode} / {data, search} (mode et search sont exclusifs)"
         schema:
           type: object
           properties:
@@ -126,28 +173,127 @@ def train():
               type: array
               items:
                 type: object
+            mode:
+              type: string
+              enum: [full, warm_start, append]
+              default: full
+              description: "full : réentraînement complet ; warm_start : optimisation partant des paramètres du modèle en production ; append : paramètres du modèle en production conservés, nouvelles observations ajoutées à son historique"
+            search:
+              type: object
+              description: "Recherche en parallèle (voir recherche.RECHERCHE_DEFAUT) : mode grid/random, listes p, d, q, P, D, Q, période s, n_iter, seed, budget (s), max_workers"
+              example: {"mode": "random", "n_iter": 6, "budget": 900}
     responses:
-      200:
-        description: Modèle entraîné avec succès
+      202:
+        description: Entraînement soumis, suivi avec GET /train/{job_id}
         schema:
           type: object
           properties:
-            message:
+            job_id:
               type: string
-            validation_rmse:
-              type: number
-            run_id:
+            status_url:
               type: string
-      500:
-        description: Erreur lors de l'entraînement du modèle
+      400:
+        description: Données d'entraînement manquantes, mode et search fournis ensemble ou configuration de recherche invalide
+      503:
+        description: Pool d'entraînement indisponible, réessayer plus tard (en-tête Retry-After)
     """
+    data = request.get_json(silent=True)  # Récupère les données JSON envoyées avec la requête
+    recherche, mode = None, 'full'
+    if isinstance(data, dict):  # {'data': [...], 'search': {...}} ou {'data': [...], 'mode': ...}
+        if 'mode' in data and 'search' in data:
+            return jsonify({'error': "'mode' et 'search' ne peuvent pas être utilisés ensemble"}), 400
+        data, recherche, mode = data.get('data'), data.get('search'), data.get('mode', 'full')
+    if not data:
+        return jsonify({'error': "Données d'entraînement manquantes"}), 400
+    if mode not in MODES_ENTRAINEMENT:
+        return jsonify({'error': f"'mode' doit valoir {', '.join(MODES_ENTRAINEMENT)}"}), 400
+
+    if recherche is None:
+        tache = (entrainer, data, mode)  # Entraînement exécuté par le pool de processus
+    else:
+        try:
+            parametres_recherche(recherche)  # Configuration vérifiée avant la soumission
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        tache = (rechercher, data, recherche)
     try:
-        data = request.json  # Récupère les données JSON envoyées avec la requête
-        predictions_json, validation_rmse, run_id = train_model(data)  # Entraîne le modèle avec les données fournies
-        return jsonify({'message': 'Model trained successfully', 'validation_rmse': validation_rmse, 'run_id': run_id,  'predictions': predictions_json})
-    except Exception as e:
-        logging.error(f"Error during training: {e}")
-        return jsonify({'message': 'Erreur lors de l\'entraînement du modèle', 'error': str(e)}), 500  # Retourne une erreur 500 si l'entraînement échoue
+        job_id = job_manager.submit(*tache)
+    except BrokenProcessPool as e:
+        # Pool d'entraînement inutilisable, même recréé : la tâche est passée en erreur
+        logging.error(f"Entraînement non soumis : {e}")
+        return jsonify({'message': 'Service momentanément indisponible'}), 503, {'Retry-After': '30'}
+    return jsonify({'job_id': job_id, 'status_url': f'/train/{job_id}'}), 202
+
+# Route pour suivre un entraînement
+@app.route('/train/<job_id>', methods=['GET'])
+@token_required  # Exige un token pour accéder à cette route
+def train_status(job_id):
+    """
+    État et résultat d'un entraînement
+    ---
+    tags:
+      - Modèle
+    parameters:
+      - name: job_id
+        in: path
+        type: string
+        required: true
+    responses:
+      200:
+        description: "État de la tâche (en_attente, en_cours, termine, annule, erreur) et, une fois terminée, son résultat"
+        schema:
+          type: object
+          properties:
+            job_id:
+              type: string
+            statut:
+              type: string
+            resultat:
+              type: object
+            erreur:
+              type: string
+            pid:
+              type: integer
+              description: Processus qui répond de la tâche (worker qui l'a soumise, puis processus qui l'exécute)
+            battement:
+              type: string
+              description: Dernier signe de ce processus ; sans signe depuis une minute, la tâche passe en erreur
+      404:
+        description: Tâche inconnue
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Tâche inconnue'}), 404
+    return jsonify(job)
+
+# Route pour annuler un entraînement
+@app.route('/train/<job_id>', methods=['DELETE'])
+@token_required  # Exige un token pour accéder à cette route
+def train_cancel(job_id):
+    """
+    Annuler un entraînement
+    ---
+    tags:
+      - Modèle
+    parameters:
+      - name: job_id
+        in: path
+        type: string
+        required: true
+    responses:
+      200:
+        description: Annulation effectuée (tâche en attente) ou demandée (tâche en cours)
+      404:
+        description: Tâche inconnue
+      409:
+        description: Tâche déjà terminée
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Tâche inconnue'}), 404
+    if job['statut'] in STATUTS_FINAUX:
+        return jsonify({'error': 'Tâche déjà terminée', 'statut': job['statut']}), 409
+    return jsonify(job_manager.cancel(job_id))
 
 # Route pour faire des prédictions avec un modèle existant
 @app.route('/predict', methods=['POST'])
@@ -299,5 +445,4 @@ def rmse_history():
         return jsonify({'message': 'Erreur lors de la récupération de l\'historique des RMSE', 'error': str(e)}), 500  # Retourne une erreur 500 si la récupération échoue
     
 if __name__ == '__main__':
-    init_db()  # Initialise la base de données au démarrage
     app.run(debug=False, port=5100)  # Démarre l'application Flask sur le port 5100
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark : nettoyage des données de /train et /predict (médiane par quart
+d'heure) sur une semaine de détections à la seconde.
+
+Compare l'ancienne version (regroupement sur des objets date / time, puis
+reconstruction des dates par concaténation de chaînes et nouvelle analyse) à
+DataCleaner.transform, qui regroupe directement les dates datetime64.
+
+Utilisation (depuis Projet/E3/api_flask) :
+    python benchmarks/bench_data_cleaner.py
+"""
+
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from models import DataCleaner
+
+NB_REPETITIONS = 3
+
+
+# Ancienne version, conservée ici comme référence ('15min' : alias '15T' retiré de pandas 3)
+def transform_reference(X):
+    df = X.copy()
+    df['date'] = pd.to_datetime(df['date'], errors='coerce')
+    df = df.dropna(subset=['date'])
+    df['jour'] = df['date'].dt.date
+    df['quart_heure'] = df['date'].dt.floor('15min').dt.time
+    grouped = df.groupby(['jour', 'quart_heure'])
+    df_aggregated = grouped[['Effectif couche', 'Effectif debout']].median().reset_index()
+    df_aggregated['ratio_debout'] = (df_aggregated['Effectif debout'] /
+                                     (df_aggregated['Effectif debout'] + df_aggregated['Effectif couche'])) * 100
+    df_aggregated['date'] = pd.to_datetime(df_aggregated['jour'].astype(str) + ' ' + df_aggregated['quart_heure'].astype(str))
+    return df_aggregated
+
+
+# Une semaine de détections à la seconde, effectifs en float32 comme envoyés par l'application
+def generer_detections(nb_jours=7, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2024-07-01', periods=nb_jours * 86400, freq='s')
+    return pd.DataFrame({'date': dates,
+                         'Effectif debout': rng.integers(0, 40, len(dates)).astype('float32'),
+                         'Effectif couche': rng.integers(0, 40, len(dates)).astype('float32')})
+
+
+if __name__ == '__main__':
+    detections = generer_detections()
+    cleaner = DataCleaner()
+
+    # Dates datetime64 (DataFrame déjà typé) puis chaînes (données JSON reçues par l'API)
+    for nom, X in [('datetime64', detections), ('chaînes', detections.assign(date=detections['date'].astype(str)))]:
+        t_reference = min(timeit.repeat(lambda: transform_reference(X), number=1, repeat=NB_REPETITIONS))
+        t_vectorise = min(timeit.repeat(lambda: cleaner.transform(X), number=1, repeat=NB_REPETITIONS))
+        # Part commune aux deux versions : conversion de la colonne 'date'
+        t_conversion = min(timeit.repeat(lambda: pd.to_datetime(X['date'], errors='coerce'), number=1, repeat=NB_REPETITIONS))
+
+        print(f"{len(X)} lignes, dates {nom:>10} : référence {1000 * t_reference:8.1f} ms | "
+              f"vectorisé {1000 * t_vectorise:8.1f} ms | gain x{t_reference / t_vectorise:.1f} "
+              f"(hors conversion des dates : x{(t_reference - t_conversion) / max(t_vectorise - t_conversion, 1e-9):.1f})")
+
+        # Vérification rapide de l'équivalence des résultats
+        a, b = transform_reference(X), cleaner.transform(X)
+        assert (a['date'].to_numpy() == b['date'].to_numpy()).all()
+        for colonne in ['Effectif couche', 'Effectif debout', 'ratio_debout']:
+            np.testing.assert_array_equal(a[colonne].to_numpy(), b[colonne].to_numpy())
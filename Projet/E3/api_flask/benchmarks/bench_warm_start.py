@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark : réentraînement quotidien du modèle SARIMAX, complet ('full'),
+à chaud à partir des paramètres du modèle précédent ('warm_start') ou par
+ajout des nouvelles observations à son historique ('append').
+
+Scénario : un modèle « en production » est ajusté sur une fenêtre de
+données ; un jour plus tard, la fenêtre a glissé d'un jour et le modèle est
+réentraîné selon chaque mode. Les données (ratio debout par quart d'heure,
+avec un cycle journalier et un bruit autocorrélé) sont générées.
+
+Utilisation (depuis Projet/E3/api_flask) :
+    python benchmarks/bench_warm_start.py              # ordres de production (3,1,3)x(1,1,1,96), plusieurs minutes
+    python benchmarks/bench_warm_start.py --rapide     # ordres réduits (1,0,1)x(0,1,1,96)
+"""
+
+import gc
+import logging
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_squared_error
+from sklearn.pipeline import Pipeline
+from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from logic import ajuster, decouper
+from models import DataCleaner, SARIMAXModel
+
+NB_JOURS = 7  # Fenêtre d'entraînement + validation (5 + 2 jours), comme depuis l'application
+
+
+# Effectifs par quart d'heure sur 'nb_jours' jours : cycle journalier + bruit AR(1)
+def generer_mesures(nb_jours, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2024-07-01', periods=nb_jours * 96, freq='15min')
+    heure = dates.hour + dates.minute / 60
+    bruit = np.zeros(len(dates))
+    for i in range(1, len(dates)):
+        bruit[i] = 0.8 * bruit[i - 1] + rng.normal(0, 3)
+    ratio = np.clip(40 + 25 * np.sin(2 * np.pi * (heure - 8) / 24) + bruit, 1, 99)
+    return pd.DataFrame({'date': dates, 'Effectif debout': ratio, 'Effectif couche': 100 - ratio})
+
+
+def rmse_validation(sarimax_model, validation_data):
+    predictions = sarimax_model.predict(validation_data)
+    return np.sqrt(mean_squared_error(validation_data.set_index('date')['ratio_debout'], predictions))
+
+
+if __name__ == '__main__':
+    warnings.filterwarnings('ignore')
+    logging.basicConfig(level=logging.WARNING)
+
+    if '--rapide' in sys.argv:
+        ordres = {'order': (1, 0, 1), 'seasonal_order': (0, 1, 1, 96)}
+    else:
+        ordres = {'order': (3, 1, 3), 'seasonal_order': (1, 1, 1, 96)}
+
+    mesures = DataCleaner().transform(generer_mesures(NB_JOURS + 1))
+
+    # Modèle en production : jours 0 à 4 (validation sur les jours 5 et 6) ; seuls ses paramètres sont gardés
+    veille = mesures[mesures['date'] < mesures['date'].min() + pd.Timedelta(days=NB_JOURS)]
+    train_veille, _ = decouper(veille)
+    debut = time.perf_counter()
+    sarimax_veille = SARIMAXModel(**ordres).fit(train_veille)
+    print(f"Modèle en production ajusté en {time.perf_counter() - debut:.1f} s "
+          f"({sarimax_veille.results_.mle_retvals['iterations']} itérations)")
+    params_production = sarimax_veille.results_.params
+    del sarimax_veille
+
+    def modele_production():
+        # Modèle en production reconstruit à partir de ses paramètres (filtrage seul, hors chronométrage)
+        sarimax_model = SARIMAXModel(**ordres)
+        sarimax_model.model_ = SARIMAX(train_veille.set_index('date')['ratio_debout'], **ordres)
+        sarimax_model.results_ = sarimax_model.model_.filter(params_production)
+        return Pipeline([('cleaner', DataCleaner()), ('sarimax', sarimax_model)])
+
+    # Lendemain : jours 1 à 5 pour l'entraînement, 6 et 7 pour la validation
+    jour = mesures[mesures['date'] >= mesures['date'].min() + pd.Timedelta(days=1)]
+    train_data, validation_data = decouper(jour)
+
+    resultats = {}
+    for mode in ['full', 'warm_start', 'append']:
+        production = modele_production() if mode != 'full' else None
+        gc.collect()
+
+        debut = time.perf_counter()
+        if mode == 'full':
+            # Même ajustement que ajuster(train_data, 'full'), avec les ordres du benchmark
+            sarimax_model, mode_applique = SARIMAXModel(**ordres), mode
+            Pipeline([('cleaner', DataCleaner()), ('sarimax', sarimax_model)]).fit(train_data)
+        else:
+            _, sarimax_model, mode_applique = ajuster(train_data, mode, production=production)
+        duree = time.perf_counter() - debut
+        rmse = rmse_validation(sarimax_model, validation_data)
+        retvals = getattr(sarimax_model.results_, 'mle_retvals', None) or {}
+        resultats[mode] = (duree, rmse)
+        print(f"{mode:>10} ({mode_applique}) : {duree:7.2f} s | {retvals.get('iterations', '-'):>4} itérations | "
+              f"RMSE validation {rmse:.3f}")
+
+        # Résultats SARIMAX volumineux (covariances d'état par date) : libérés avant l'ajustement suivant
+        del sarimax_model, production
+        gc.collect()
+
+    duree_full, rmse_full = resultats['full']
+    for mode in ['warm_start', 'append']:
+        duree, rmse = resultats[mode]
+        print(f"{mode:>10} : gain x{duree_full / max(duree, 1e-9):.1f} | écart RMSE {rmse - rmse_full:+.3f} "
+              f"({100 * (rmse - rmse_full) / rmse_full:+.1f} %)")
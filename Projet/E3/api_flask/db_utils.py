@@ -1,44 +1,30 @@
-import sqlite3
-import datetime
-import jwt
+import os
+import sys
+
+# Module commun aux API E3 et E4 : Projet/commun/auth_store.py
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'commun')))
+
+from auth_store import get_store, TokenPurger
 
 DATABASE = 'tokens.db'
 
+def store():
+    return get_store(DATABASE)
+
 def init_db():
-    with sqlite3.connect(DATABASE) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT NOT NULL UNIQUE,
-                password TEXT NOT NULL
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tokens (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                token TEXT NOT NULL,
-                username TEXT NOT NULL,
-                expiration DATETIME NOT NULL
-            )
-        ''')
-        conn.commit()
+    store().init_db()
 
 def add_user(username, password):
-    with sqlite3.connect(DATABASE) as conn:
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password))
-        conn.commit()
+    store().add_user(username, password)
 
 def authenticate_user(username, password, secret_key):
-    with sqlite3.connect(DATABASE) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE username=? AND password=?", (username, password))
-        user = cursor.fetchone()
-        if user:
-            expiration = datetime.datetime.utcnow() + datetime.timedelta(hours=12)
-            token = jwt.encode({'user': username, 'exp': expiration}, secret_key, algorithm="HS256")
-            cursor.execute("INSERT INTO tokens (token, username, expiration) VALUES (?, ?, ?)", (token, username, expiration))
-            conn.commit()
-            return token
-    return None
+    return store().authenticate_user(username, password, secret_key)
+
+def validate_token(token, secret_key):
+    return store().validate_token(token, secret_key)
+
+def revoke_token(token):
+    store().revoke_token(token)
+
+def purge_expired_tokens():
+    return store().purge_expired_tokens()
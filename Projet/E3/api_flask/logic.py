@@ -7,9 +7,91 @@ import mlflow
 import os
 import time
 import logging
+import threading
 from email_utils import send_email
 from models import DataCleaner, SARIMAXModel, CustomModel
 
+# Cache des modèles du registre MLflow, chargés une fois et gardés en mémoire.
+# Les modèles sont indexés par (nom, stage, version) ; un thread de fond
+# vérifie régulièrement la version en Production et, si elle a changé, charge
+# la nouvelle version puis la substitue à l'ancienne en une seule affectation :
+# une prédiction en cours garde le modèle qu'elle a obtenu.
+class ModelCache:
+    def __init__(self, name='SARIMAXModel', stage='Production', interval=60,
+                 client_factory=None, loader=None, max_models=2):
+        self.name = name
+        self.stage = stage
+        self.interval = interval  # Délai (secondes) entre deux vérifications du registre
+        self.max_models = max_models  # Versions gardées en mémoire (courante et précédente)
+        self.client_factory = client_factory or mlflow.tracking.MlflowClient
+        self.loader = loader or mlflow.pyfunc.load_model
+
+        self._models = {}  # (nom, stage, version) -> modèle chargé
+        self._courant = None  # (clé, modèle) du modèle servi
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()  # Un seul chargement à la fois
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='model-cache', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def version_registre(self):
+        """Version actuellement au stage surveillé dans le registre (None si aucune)."""
+        versions = self.client_factory().get_latest_versions(self.name, stages=[self.stage])
+        return versions[0].version if versions else None
+
+    def refresh(self):
+        """
+        Charge la version au stage surveillé si elle n'est pas déjà servie.
+        Renvoie (clé, modèle) du modèle servi.
+        """
+        with self._refresh_lock:
+            version = self.version_registre()
+            if version is None:
+                raise LookupError(f"Aucune version de {self.name} au stage {self.stage}")
+
+            cle = (self.name, self.stage, str(version))
+            with self._lock:
+                model = self._models.get(cle)
+            if model is None:
+                # Chargement de la version précise : le stage peut changer entre-temps
+                model = self.loader(f"models:/{self.name}/{version}")
+                logging.info(f"Modèle {self.name} version {version} chargé en cache")
+
+            with self._lock:
+                self._models.pop(cle, None)
+                self._models[cle] = model  # Version servie en dernière position
+                for ancienne in list(self._models)[:-self.max_models]:
+                    del self._models[ancienne]
+                self._courant = (cle, model)
+                return self._courant
+
+    def get(self):
+        """Renvoie (clé, modèle) du modèle servi ; le charge s'il ne l'est pas encore."""
+        courant = self._courant
+        if courant is None:
+            return self.refresh()
+        return courant
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.error(f"Échec de la vérification du modèle {self.name} en {self.stage} : {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+# Modèle servi par /predict, démarré par appjwt.py
+model_cache = ModelCache()
+
 # Fonction pour récupérer l'historique des RMSE (Root Mean Squared Error)
 def get_rmse_history(client, experiment_id, limit, version, include_artifacts):
     all_runs = []  # Liste pour stocker tous les runs
@@ -99,25 +181,89 @@ def get_rmse_history(client, experiment_id, limit, version, include_artifacts):
         "average_execute_time": average_time_values
     }
 
+# Modes d'entraînement de /train
+MODES_ENTRAINEMENT = ('full', 'warm_start', 'append')
+
+# Pipeline (nettoyeur + SARIMAX) du modèle au stage donné dans le registre MLflow
+def pipeline_registre(name='SARIMAXModel', stage='Production'):
+    model = mlflow.pyfunc.load_model(f"models:/{name}/{stage}")
+    return model.unwrap_python_model().pipeline
+
+# Ajuste le modèle SARIMAX sur les données de formation ; renvoie (pipeline, modèle SARIMAX, mode appliqué).
+# - 'full' : ajustement complet à partir des paramètres initiaux par défaut de statsmodels ;
+# - 'warm_start' : mêmes ordres que le modèle en production, optimisation partant de ses paramètres ;
+# - 'append' : paramètres du modèle en production conservés, seules les observations postérieures
+#   à son historique lui sont ajoutées (pas d'optimisation).
+# Sans modèle en production, ou si les données ne prolongent pas son historique, le mode suivant
+# ('append' -> 'warm_start' -> 'full') est appliqué.
+def ajuster(train_data, mode='full', verifier_annulation=None, production=None):
+    if mode not in MODES_ENTRAINEMENT:
+        raise ValueError(f"Mode d'entraînement inconnu : {mode}")
+
+    if mode != 'full' and production is None:
+        try:
+            production = pipeline_registre()
+        except Exception as e:
+            logging.warning(f"Modèle en production indisponible ({e}) : réentraînement complet")
+            mode = 'full'
+
+    if mode != 'full':
+        sarimax_production = production.named_steps['sarimax']
+        params_production = sarimax_production.results_.params  # Avant append, qui remplace les résultats
+
+    if mode == 'append':
+        try:
+            sarimax_model = sarimax_production.append(production.named_steps['cleaner'].transform(train_data))
+            return production, sarimax_model, mode
+        except ValueError as e:
+            logging.warning(f"Ajout impossible à l'historique du modèle en production ({e}) : démarrage à chaud")
+            mode = 'warm_start'
+
+    start_params = None
+    if mode == 'warm_start':
+        sarimax_model = SARIMAXModel(order=sarimax_production.order, seasonal_order=sarimax_production.seasonal_order)
+        start_params = params_production
+    else:
+        sarimax_model = SARIMAXModel()  # Initialise le modèle SARIMAX
+
+    pipeline = Pipeline([('cleaner', DataCleaner()), ('sarimax', sarimax_model)], verbose=True)  # Crée un pipeline avec le nettoyeur et le modèle SARIMAX
+    pipeline.fit(train_data, sarimax__callback=verifier_annulation, sarimax__start_params=start_params)
+    return pipeline, sarimax_model, mode
+
+# Configuration MLflow des processus d'entraînement (initialisation du pool de training_jobs)
+def configurer_mlflow(tracking_uri, experiment):
+    mlflow.set_tracking_uri(tracking_uri)
+    mlflow.set_experiment(experiment)
+
+# Sépare les données nettoyées : les deux derniers jours servent à la validation
+def decouper(df_cleaned, jours_validation=2):
+    max_date = df_cleaned['date'].max()  # Trouve la date maximale dans les données nettoyées
+    cutoff_date = max_date - pd.Timedelta(days=jours_validation)  # Définit la date de coupure pour séparer les données de formation et de validation
+    train_data = df_cleaned[df_cleaned['date'] <= cutoff_date]  # Données de formation
+    validation_data = df_cleaned[df_cleaned['date'] > cutoff_date]  # Données de validation
+    return train_data, validation_data
+
 # Fonction pour entraîner un modèle
-def train_model(data):
+# 'verifier_annulation' (facultatif) lève une exception si l'entraînement doit s'arrêter :
+# il est appelé entre les étapes et à chaque itération de l'optimiseur SARIMAX.
+# 'mode' : 'full' (réentraînement complet), 'warm_start' ou 'append' (voir ajuster)
+def train_model(data, verifier_annulation=None, mode='full'):
+    verifier = verifier_annulation or (lambda *_: None)
     df = pd.DataFrame(data)  # Convertit les données en DataFrame
     
     cleaner = DataCleaner()  # Initialise le nettoyeur de données
     df_cleaned = cleaner.transform(df)  # Nettoie les données
     
-    max_date = df_cleaned['date'].max()  # Trouve la date maximale dans les données nettoyées
-    cutoff_date = max_date - pd.Timedelta(days=2)  # Définit la date de coupure pour séparer les données de formation et de validation
-    train_data = df_cleaned[df_cleaned['date'] <= cutoff_date]  # Données de formation
-    validation_data = df_cleaned[df_cleaned['date'] > cutoff_date]  # Données de validation
+    train_data, validation_data = decouper(df_cleaned)  # Données de formation et de validation
     
     num_days_train = (train_data['date'].max() - train_data['date'].min()).days  # Nombre de jours dans les données de formation
     num_days_test = (validation_data['date'].max() - validation_data['date'].min()).days  # Nombre de jours dans les données de validation
     
-    sarimax_model = SARIMAXModel()  # Initialise le modèle SARIMAX
-    pipeline = Pipeline([('cleaner', cleaner), ('sarimax', sarimax_model)], verbose=True)  # Crée un pipeline avec le nettoyeur et le modèle SARIMAX
-    
-    pipeline.fit(train_data)  # Entraîne le pipeline sur les données de formation
+    verifier()
+    debut_ajustement = time.time()
+    pipeline, sarimax_model, mode = ajuster(train_data, mode, verifier_annulation)  # Entraîne le pipeline sur les données de formation
+    temps_ajustement = time.time() - debut_ajustement
+    verifier()
 
     custom_model = CustomModel(pipeline)  # Crée un modèle personnalisé avec le pipeline
     
@@ -147,6 +293,7 @@ def train_model(data):
     train_data.to_csv(train_data_file, index=False)  # Sauvegarde les données d'entraînement
     validation_data.to_csv(validation_data_file, index=False)  # Sauvegarde les données de validation
 
+    verifier()  # Dernière vérification : au-delà, le modèle est enregistré dans le registre
     with mlflow.start_run() as run:  # Démarre un nouveau run MLflow
         mlflow.pyfunc.log_model(
             artifact_path="model",
@@ -159,6 +306,8 @@ def train_model(data):
         mlflow.log_param("num_data_points", len(df_cleaned))
         mlflow.log_param("num_days_train", num_days_train)
         mlflow.log_param("num_days_test", num_days_test + 1)
+        mlflow.log_param("training_mode", mode)
+        mlflow.log_metric("fit_time", temps_ajustement)
         mlflow.log_metric("train_rmse", -sarimax_model.score(train_data, train_data['ratio_debout']))
         mlflow.log_metric("validation_rmse", validation_rmse)
         
@@ -193,7 +342,13 @@ def train_model(data):
     except Exception as e:    
         logging.error(f"Error during training: {e}")  # Logue l'erreur si elle se produit
 
-    return predictions_json, validation_rmse, run_id  # Retourne les prédictions, le RMSE et l'ID du run
+    return predictions_json, validation_rmse, run_id, mode  # Retourne les prédictions, le RMSE, l'ID du run et le mode d'entraînement appliqué
+
+# Tâche d'entraînement exécutée par le pool de training_jobs : résultat renvoyé par GET /train/<job_id>
+def entrainer(data, mode='full', verifier_annulation=None):
+    predictions_json, validation_rmse, run_id, mode = train_model(data, verifier_annulation, mode)
+    return {'message': 'Model trained successfully', 'validation_rmse': float(validation_rmse),
+            'run_id': run_id, 'predictions': predictions_json, 'mode': mode}
 
 # Fonction pour prédire à partir d'un modèle existant
 def predict_model(data):
@@ -205,15 +360,10 @@ def predict_model(data):
     cleaner = DataCleaner()  # Initialise le nettoyeur de données
     df_cleaned = cleaner.transform(df)  # Nettoie les données
     
-    model_name = 'SARIMAXModel'  # Nom du modèle enregistré
-    client = mlflow.tracking.MlflowClient()
-    logged_model = f"models:/{model_name}/Production"  # Récupère le modèle en production
-    
-    model = mlflow.pyfunc.load_model(logged_model)  # Charge le modèle
+    # Modèle en production déjà chargé en mémoire (voir ModelCache)
+    (model_name, _, model_version), model = model_cache.get()
     
     with mlflow.start_run() as run:  # Démarre un nouveau run MLflow
-        model_version = client.get_latest_versions(model_name, stages=["Production"])[0].version  # Récupère la version du modèle
-        
         predictions = model.predict(df_cleaned)  # Fait des prédictions sur les nouvelles données
         
         predictions_df = predictions.to_frame(name='Valeurs')  # Crée un DataFrame des prédictions
@@ -11,23 +11,25 @@ class DataCleaner(BaseEstimator, TransformerMixin):
         return self  # La méthode fit ne fait rien ici, car il n'y a pas de paramètres à ajuster
     
     def transform(self, X, y=None):
-        df = X.copy()  # Crée une copie des données pour éviter de modifier l'original
-        df['date'] = pd.to_datetime(df['date'], errors='coerce')  # Convertit la colonne 'date' en datetime
-        df = df.dropna(subset=['date'])  # Supprime les lignes où la date n'a pas pu être convertie
-        df['jour'] = df['date'].dt.date  # Extrait la date sans l'heure
-        df['quart_heure'] = df['date'].dt.floor('15T').dt.time  # Regroupe par quart d'heure
+        dates = pd.to_datetime(X['date'], errors='coerce')  # Convertit la colonne 'date' en datetime
+        if dates.dt.tz is not None:
+            dates = dates.dt.tz_localize(None)  # Heure locale conservée, sans fuseau
+        valides = dates.notna().to_numpy()  # Lignes dont la date a pu être convertie
 
-        # Regroupe les données par jour et quart d'heure et calcule la médiane
-        grouped = df.groupby(['jour', 'quart_heure'])
-        df_aggregated = grouped[['Effectif couche', 'Effectif debout']].median().reset_index()
+        # Médiane par quart d'heure, calculée sur les dates natives (datetime64) : seuls les
+        # quarts d'heure contenant des mesures sont conservés, dans l'ordre chronologique
+        df = X.loc[valides, ['Effectif couche', 'Effectif debout']]
+        quart_heure = pd.DatetimeIndex(dates[valides]).floor('15min').rename('date')
+        df_aggregated = df.groupby(quart_heure).median().reset_index()
 
         # Calcule le ratio des personnes debout par rapport à la somme des personnes couchées et debout
-        df_aggregated['ratio_debout'] = (df_aggregated['Effectif debout'] / 
+        df_aggregated['ratio_debout'] = (df_aggregated['Effectif debout'] /
                                          (df_aggregated['Effectif debout'] + df_aggregated['Effectif couche'])) * 100
 
-        # Reconstruit la colonne 'date' en combinant le jour et le quart d'heure
-        df_aggregated['date'] = pd.to_datetime(df_aggregated['jour'].astype(str) + ' ' + df_aggregated['quart_heure'].astype(str))
-        return df_aggregated  # Retourne le DataFrame transformé
+        # Jour (à minuit) et quart d'heure dans la journée (durée depuis minuit)
+        df_aggregated.insert(0, 'jour', df_aggregated['date'].dt.normalize())
+        df_aggregated.insert(1, 'quart_heure', df_aggregated['date'] - df_aggregated['jour'])
+        return df_aggregated[['jour', 'quart_heure', 'Effectif couche', 'Effectif debout', 'ratio_debout', 'date']]  # Retourne le DataFrame transformé
 
 # Classe pour le modèle SARIMAX
 class SARIMAXModel(BaseEstimator):
@@ -36,18 +38,49 @@ class SARIMAXModel(BaseEstimator):
         self.seasonal_order = seasonal_order  # Paramètres pour le modèle saisonnier
         self.model_ = None  # Variable pour stocker le modèle SARIMAX ajusté
     
-    def fit(self, X, y=None):
+    def fit(self, X, y=None, callback=None, start_params=None):
         # Extrait la série temporelle de 'ratio_debout' et la définit comme indexée par la date
         train_ratio = X.set_index('date')['ratio_debout']
 
         # Crée un modèle SARIMAX avec les ordres spécifiés
         self.model_ = SARIMAX(train_ratio, order=self.order, seasonal_order=self.seasonal_order)
 
-        # Ajuste le modèle aux données
-        self.results_ = self.model_.fit(disp=5, maxiter=200)
+        # Ajuste le modèle aux données ; 'callback' est appelé à chaque itération de l'optimiseur,
+        # 'start_params' (paramètres d'un modèle précédent) sert de point de départ à l'optimisation
+        self.results_ = self.model_.fit(start_params=start_params, disp=5, maxiter=200, callback=callback)
+        # statsmodels garde le callback dans les résultats : retiré pour que le modèle reste sérialisable
+        self.results_.mle_settings['callback'] = None
         
         return self  # Retourne l'objet ajusté
-    
+
+    def append(self, X):
+        """
+        Ajoute à l'historique du modèle ajusté les observations de X postérieures
+        à sa dernière date, sans réestimer les paramètres (un seul passage du
+        filtre de Kalman). Les observations antérieures à X sont retirées :
+        l'historique reste borné à la fenêtre courante. X doit commencer dans
+        l'historique et le prolonger sans trou ; sinon ValueError.
+        """
+        serie = X.set_index('date')['ratio_debout']
+        historique = self.results_.model.data.orig_endog
+        if serie.index.min() < historique.index[0]:
+            raise ValueError("Les données commencent avant l'historique du modèle")
+        nouvelles = serie[serie.index > historique.index[-1]]
+        if nouvelles.empty:
+            raise ValueError("Aucune observation postérieure à l'historique du modèle")
+        historique = historique[historique.index >= serie.index.min()]  # Fenêtre de X seulement
+        serie = pd.concat([historique, nouvelles])
+        if pd.infer_freq(serie.index) is None:
+            raise ValueError("Les nouvelles observations ne prolongent pas l'historique sans trou")
+
+        # Filtrage seul (prédictions et score n'utilisent pas le lissage) ; les anciens résultats,
+        # volumineux (covariances d'état par date), sont libérés avant le calcul des nouveaux
+        params = self.results_.params
+        self.results_ = None
+        self.model_ = SARIMAX(serie.rename('ratio_debout'), order=self.order, seasonal_order=self.seasonal_order)
+        self.results_ = self.model_.filter(params)
+        return self
+
     def predict(self, X):
         start_date = X['date'].min()  # Date de début des prédictions
         end_date = X['date'].max()  # Date de fin des prédictions
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+Recherche des ordres SARIMAX (order, seasonal_order) pour /train.
+
+Les combinaisons candidates (grille complète ou tirage aléatoire dans la
+grille) sont ajustées en parallèle dans un pool de processus, un par cœur par
+défaut. Chaque candidat est enregistré comme run MLflow imbriqué sous le run
+de la recherche (tag mlflow.parentRunId), avec son modèle ; le candidat de
+plus faible RMSE de validation est inscrit au registre.
+
+Un budget de temps (secondes) borne la recherche : les candidats non
+démarrés à l'échéance sont abandonnés et ceux en cours s'arrêtent à
+l'itération suivante de l'optimiseur. Un candidat dont les paramètres
+deviennent non finis ou démesurés pendant l'ajustement, ou dont les
+prédictions s'écartent trop des données, est abandonné comme divergent. Un
+candidat dont l'exécution échoue (erreur inattendue, processus arrêté) est
+enregistré en erreur sans interrompre la recherche.
+"""
+
+import itertools
+import logging
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+import pandas as pd
+import mlflow
+from mlflow.utils.mlflow_tags import MLFLOW_PARENT_RUN_ID
+from sklearn.metrics import mean_squared_error
+from sklearn.pipeline import Pipeline
+from threadpoolctl import threadpool_limits
+
+from logic import decouper
+from models import DataCleaner, SARIMAXModel, CustomModel
+
+# Grille par défaut : ordres non saisonniers et saisonniers (période 96 quarts d'heure = 1 jour)
+RECHERCHE_DEFAUT = {
+    'mode': 'grid',  # 'grid' : toutes les combinaisons, 'random' : n_iter combinaisons tirées au hasard
+    'p': [1, 2, 3],
+    'd': [1],
+    'q': [1, 2, 3],
+    'P': [0, 1],
+    'D': [1],
+    'Q': [1],
+    's': 96,
+    'n_iter': 8,
+    'seed': None,
+    'budget': 1800,  # Durée maximale de la recherche (secondes)
+    'max_workers': None,  # Processus en parallèle (par défaut : nombre de cœurs)
+    'max_param': 1e6,  # Au-delà (en valeur absolue), un paramètre est jugé divergent
+    'facteur_divergence': 10,  # RMSE de validation maximal, en écarts-types des données d'entraînement
+}
+
+TERMINE = 'termine'
+DIVERGE = 'diverge'
+HORS_BUDGET = 'hors_budget'
+ANNULE = 'annule'
+ERREUR = 'erreur'
+
+
+# Propres à chaque processus du pool (voir _initialiser)
+_ARRET = None  # Événement partagé : arrêt demandé (annulation de la tâche)
+_LIMITES = None
+
+
+class Divergence(Exception):
+    """Ajustement abandonné : paramètres non finis ou démesurés."""
+
+
+class Arret(Exception):
+    """Ajustement interrompu : budget dépassé ou recherche annulée."""
+
+
+def parametres_recherche(recherche):
+    """
+    Complète la configuration de recherche avec les valeurs par défaut et
+    renvoie (configuration, candidats). Lève ValueError si elle est invalide.
+    """
+    if not isinstance(recherche, dict):
+        raise ValueError("'search' doit être un objet")
+    inconnus = set(recherche) - set(RECHERCHE_DEFAUT)
+    if inconnus:
+        raise ValueError(f"Paramètres de recherche inconnus : {sorted(inconnus)}")
+    config = {**RECHERCHE_DEFAUT, **recherche}
+
+    if config['mode'] not in ('grid', 'random'):
+        raise ValueError("'mode' doit valoir 'grid' ou 'random'")
+    try:
+        axes = [[int(v) for v in config[cle]] for cle in ('p', 'd', 'q', 'P', 'D', 'Q')]
+        s = int(config['s'])
+        budget = float(config['budget'])
+        n_iter = int(config['n_iter'])
+        max_workers = int(config['max_workers']) if config['max_workers'] is not None else None
+    except (TypeError, ValueError):
+        raise ValueError("Ordres, période, budget, n_iter et max_workers doivent être numériques")
+    if not all(axes) or min(min(axe) for axe in axes) < 0 or s < 2 or budget <= 0:
+        raise ValueError("Ordres positifs, période >= 2 et budget > 0 attendus")
+    if n_iter < 1 or (max_workers is not None and max_workers < 1):
+        raise ValueError("n_iter et max_workers doivent valoir au moins 1")
+
+    candidats = [((p, d, q), (P, D, Q, s)) for p, d, q, P, D, Q in itertools.product(*axes)]
+    if config['mode'] == 'random':
+        candidats = random.Random(config['seed']).sample(candidats, min(n_iter, len(candidats)))
+    return config, candidats
+
+
+def _initialiser(tracking_uri, arret):
+    # Un seul thread BLAS par processus : le parallélisme vient du nombre de processus
+    global _ARRET, _LIMITES
+    _LIMITES = threadpool_limits(1)
+    _ARRET = arret
+    mlflow.set_tracking_uri(tracking_uri)
+
+
+def ajuster_candidat(train_data, validation_data, order, seasonal_order, experiment_id, parent_run_id,
+                     echeance, max_param, facteur_divergence):
+    """
+    Exécutée dans un processus du pool : ajuste un candidat, l'enregistre
+    comme run MLflow imbriqué et renvoie son résumé (et ses prédictions).
+    """
+    resume = {'order': list(order), 'seasonal_order': list(seasonal_order),
+              'validation_rmse': None, 'run_id': None, 'statut': None}
+    if _ARRET.is_set() or time.time() > echeance:
+        resume['statut'] = HORS_BUDGET if not _ARRET.is_set() else ANNULE
+        return resume, None
+
+    def surveiller(params):
+        # Appelée à chaque itération de l'optimiseur
+        if _ARRET.is_set() or time.time() > echeance:
+            raise Arret()
+        if not np.all(np.isfinite(params)) or np.max(np.abs(params)) > max_param:
+            raise Divergence()
+
+    debut = time.time()
+    run_name = f"sarimax_{'_'.join(map(str, order))}_{'_'.join(map(str, seasonal_order))}"
+    with mlflow.start_run(experiment_id=experiment_id, run_name=run_name,
+                          tags={MLFLOW_PARENT_RUN_ID: parent_run_id}) as run:
+        resume['run_id'] = run.info.run_id
+        mlflow.log_param("order", order)
+        mlflow.log_param("seasonal_order", seasonal_order)
+
+        sarimax_model = SARIMAXModel(order=order, seasonal_order=seasonal_order)
+        pipeline = Pipeline([('cleaner', DataCleaner()), ('sarimax', sarimax_model)])
+        predictions = None
+        try:
+            pipeline.fit(train_data, sarimax__callback=surveiller)
+            predictions = sarimax_model.predict(validation_data)
+            actuals = validation_data.set_index('date')['ratio_debout']
+            validation_rmse = float(np.sqrt(mean_squared_error(actuals, predictions)))
+            seuil = facteur_divergence * train_data['ratio_debout'].std()
+            if not np.isfinite(sarimax_model.results_.llf) or not np.isfinite(validation_rmse) or validation_rmse > seuil:
+                raise Divergence()
+        except Divergence:
+            resume['statut'] = DIVERGE
+        except Arret:
+            resume['statut'] = ANNULE if _ARRET.is_set() else HORS_BUDGET
+        except (ValueError, np.linalg.LinAlgError) as e:
+            # Ordres incompatibles avec les données (trop de paramètres, matrice singulière...)
+            logging.warning(f"Candidat {run_name} abandonné : {e}")
+            resume['statut'] = DIVERGE
+        else:
+            resume['statut'] = TERMINE
+            resume['validation_rmse'] = validation_rmse
+            mlflow.log_metric("validation_rmse", validation_rmse)
+            mlflow.log_metric("train_rmse", -sarimax_model.score(train_data, train_data['ratio_debout']))
+            mlflow.pyfunc.log_model(artifact_path="model", python_model=CustomModel(pipeline))
+
+        mlflow.set_tag("statut", resume['statut'])
+        mlflow.log_metric("temps_exec", time.time() - debut)
+
+    if resume['statut'] != TERMINE:
+        predictions = None
+    return resume, predictions
+
+
+def rechercher(data, recherche, verifier_annulation=None, model_name="SARIMAXModel"):
+    """
+    Recherche le meilleur candidat SARIMAX sur les données et l'inscrit au
+    registre. Renvoie le résultat de la tâche /train (voir logic.entrainer)
+    complété par la liste des candidats.
+    """
+    verifier = verifier_annulation or (lambda *_: None)
+    config, candidats = parametres_recherche(recherche)
+    echeance = time.time() + float(config['budget'])
+
+    df_cleaned = DataCleaner().transform(pd.DataFrame(data))
+    train_data, validation_data = decouper(df_cleaned)
+
+    max_workers = int(config['max_workers'] or os.cpu_count())
+    max_workers = max(1, min(max_workers, len(candidats)))
+    contexte = multiprocessing.get_context('spawn')
+    arret = contexte.Event()
+
+    resultats = []
+    with mlflow.start_run(run_name="recherche_sarimax") as parent:
+        mlflow.log_param("mode", config['mode'])
+        mlflow.log_param("num_candidats", len(candidats))
+        mlflow.log_param("budget", config['budget'])
+        mlflow.log_param("max_workers", max_workers)
+        mlflow.log_param("num_data_points", len(df_cleaned))
+
+        executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=contexte,
+                                       initializer=_initialiser, initargs=(mlflow.get_tracking_uri(), arret))
+        try:
+            candidat_de = {executor.submit(ajuster_candidat, train_data, validation_data, order, seasonal_order,
+                                           parent.info.experiment_id, parent.info.run_id, echeance,
+                                           float(config['max_param']), float(config['facteur_divergence'])):
+                           (order, seasonal_order)
+                           for order, seasonal_order in candidats}
+            en_cours = set(candidat_de)
+            while en_cours:
+                termines, en_cours = wait(en_cours, timeout=1.0, return_when=FIRST_COMPLETED)
+                for future in termines:
+                    try:
+                        resultats.append(future.result())
+                    except Exception as e:
+                        # Erreur inattendue ou processus du pool arrêté : les autres candidats continuent
+                        order, seasonal_order = candidat_de[future]
+                        logging.error(f"Candidat {order}x{seasonal_order} en erreur : {e!r}")
+                        resultats.append(({'order': list(order), 'seasonal_order': list(seasonal_order),
+                                           'validation_rmse': None, 'run_id': None, 'statut': ERREUR}, None))
+                try:
+                    verifier()
+                except Exception:
+                    arret.set()  # Les candidats en cours s'arrêtent à l'itération suivante
+                    raise
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        reussis = [(resume, predictions) for resume, predictions in resultats if resume['statut'] == TERMINE]
+        candidats_json = [resume for resume, _ in resultats]
+        mlflow.log_dict({'candidats': candidats_json}, "candidats.json")
+        for statut in (TERMINE, DIVERGE, HORS_BUDGET, ERREUR):
+            mlflow.log_metric(f"num_{statut}", sum(resume['statut'] == statut for resume in candidats_json))
+        if not reussis:
+            raise RuntimeError("Aucun candidat SARIMAX n'a abouti dans le budget imparti")
+
+        meilleur, predictions = min(reussis, key=lambda r: r[0]['validation_rmse'])
+        mlflow.log_metric("validation_rmse", meilleur['validation_rmse'])
+        mlflow.log_param("best_order", tuple(meilleur['order']))
+        mlflow.log_param("best_seasonal_order", tuple(meilleur['seasonal_order']))
+
+        verifier()  # Dernière vérification avant l'inscription au registre
+        mlflow.register_model(model_uri=f"runs:/{meilleur['run_id']}/model", name=model_name)
+
+    predictions_df = predictions.rename('Valeurs').rename_axis('Date').reset_index().reset_index()
+    predictions_df.columns = ['Index', 'Date', 'Valeurs']
+    return {'message': 'Model trained successfully', 'validation_rmse': meilleur['validation_rmse'],
+            'run_id': meilleur['run_id'], 'search_run_id': parent.info.run_id,
+            'predictions': predictions_df.to_json(orient='records', date_format='iso'),
+            'best': meilleur, 'candidats': candidats_json}
@@ -16,6 +16,7 @@ import pandas as pd
 from datetime import datetime, timedelta
 # from sklearn.metrics import mean_squared_error
 import random
+import time
 
 # Configurez le logger
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -155,8 +156,19 @@ def test_train_route(client):
     logging.info("Sending training data: %s", json.dumps(data, indent=2))
     response = client.post('/train', json=data, headers={'x-access-tokens': token})
     
-    assert response.status_code == 200
-    response_data = json.loads(response.data)
+    # L'entraînement est exécuté en tâche de fond : suivi jusqu'à sa fin
+    assert response.status_code == 202
+    job_id = json.loads(response.data)['job_id']
+    for _ in range(600):
+        response = client.get(f'/train/{job_id}', headers={'x-access-tokens': token})
+        assert response.status_code == 200
+        job = json.loads(response.data)
+        if job['statut'] in ('termine', 'erreur', 'annule'):
+            break
+        time.sleep(1)
+
+    assert job['statut'] == 'termine', job['erreur']
+    response_data = job['resultat']
     assert 'message' in response_data
     assert response_data['message'] == 'Model trained successfully'
     assert 'validation_rmse' in response_data
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Équivalence du nettoyage vectorisé (DataCleaner.transform) avec l'ancienne
+version (regroupement sur des objets date / time puis reconstruction des
+dates par concaténation de chaînes).
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from models import DataCleaner
+
+
+# Ancienne version, conservée comme référence ('15min' : alias '15T' retiré de pandas 3)
+def transform_reference(X):
+    df = X.copy()
+    df['date'] = pd.to_datetime(df['date'], errors='coerce')
+    df = df.dropna(subset=['date'])
+    df['jour'] = df['date'].dt.date
+    df['quart_heure'] = df['date'].dt.floor('15min').dt.time
+    grouped = df.groupby(['jour', 'quart_heure'])
+    df_aggregated = grouped[['Effectif couche', 'Effectif debout']].median().reset_index()
+    df_aggregated['ratio_debout'] = (df_aggregated['Effectif debout'] /
+                                     (df_aggregated['Effectif debout'] + df_aggregated['Effectif couche'])) * 100
+    df_aggregated['date'] = pd.to_datetime(df_aggregated['jour'].astype(str) + ' ' + df_aggregated['quart_heure'].astype(str))
+    return df_aggregated
+
+
+# Détections à la seconde (dates en chaînes, comme reçues par /train et /predict), avec des trous
+def detections(nb_heures=30, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2024-07-01 22:00:00', periods=nb_heures * 3600, freq='s')
+    dates = dates[rng.random(len(dates)) < 0.7]
+    dates = dates[(dates < '2024-07-02 03:10:00') | (dates >= '2024-07-02 05:00:00')]
+    debout = rng.integers(0, 40, len(dates)).astype('float32')
+    couche = rng.integers(0, 40, len(dates)).astype('float32')
+    return pd.DataFrame({'date': dates.astype(str), 'Effectif debout': debout, 'Effectif couche': couche})
+
+
+def comparer(resultat, reference):
+    assert list(resultat.columns) == list(reference.columns)
+    assert len(resultat) == len(reference)
+    assert (resultat['date'].to_numpy() == reference['date'].to_numpy()).all()
+    for colonne in ['Effectif couche', 'Effectif debout', 'ratio_debout']:
+        np.testing.assert_array_equal(resultat[colonne].to_numpy(), reference[colonne].to_numpy())
+        assert resultat[colonne].dtype == reference[colonne].dtype
+    # Jour et quart d'heure : datetime64 / timedelta64 au lieu d'objets date / time
+    assert (resultat['jour'].dt.date.to_numpy() == reference['jour'].to_numpy()).all()
+    assert ((resultat['jour'] + resultat['quart_heure']).to_numpy() == reference['date'].to_numpy()).all()
+
+
+def test_equivalence_detections():
+    X = detections()
+    comparer(DataCleaner().transform(X), transform_reference(X))
+
+
+def test_equivalence_dates_invalides_et_valeurs_manquantes():
+    X = detections(nb_heures=2, seed=1)
+    X.loc[X.index[::50], 'date'] = 'pas une date'
+    X.loc[X.index[::7], 'Effectif debout'] = np.nan
+    X = X.sample(frac=1, random_state=0).set_index(np.zeros(len(X), dtype=int))  # Désordre, index dupliqué
+    comparer(DataCleaner().transform(X), transform_reference(X))
+
+
+def test_donnees_deja_nettoyees():
+    # Le pipeline réapplique le nettoyage aux données nettoyées : le résultat est inchangé
+    nettoye = DataCleaner().transform(detections(nb_heures=3))
+    pd.testing.assert_frame_equal(DataCleaner().transform(nettoye), nettoye)
+
+
+def test_dates_avec_fuseau():
+    X = detections(nb_heures=1)
+    X['date'] = pd.to_datetime(X['date']).dt.tz_localize('Europe/Paris')
+    resultat = DataCleaner().transform(X)
+    assert resultat['date'].dt.tz is None
+    assert resultat['date'].min() == pd.Timestamp('2024-07-01 22:00:00')
+
+
+@pytest.mark.parametrize('colonne', ['Effectif couche', 'Effectif debout'])
+def test_colonne_manquante(colonne):
+    with pytest.raises(KeyError):
+        DataCleaner().transform(detections(nb_heures=1).drop(columns=colonne))
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Tests du cache de modèles du registre MLflow (logic.ModelCache), avec un
+registre simulé.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from logic import ModelCache
+
+
+class Version:
+    def __init__(self, version):
+        self.version = version
+
+
+class Registre:
+    def __init__(self):
+        self.production = '1'
+        self.chargements = []
+
+    def client(self):
+        return self
+
+    def get_latest_versions(self, name, stages):
+        return [Version(self.production)]
+
+    def load_model(self, uri):
+        self.chargements.append(uri)
+        return f"modele {uri}"
+
+
+def test_modele_charge_une_fois():
+    registre = Registre()
+    cache = ModelCache(client_factory=registre.client, loader=registre.load_model)
+
+    for _ in range(3):
+        cle, model = cache.get()
+    assert cle == ('SARIMAXModel', 'Production', '1')
+    assert model == "modele models:/SARIMAXModel/1"
+    assert registre.chargements == ["models:/SARIMAXModel/1"]
+
+
+def test_nouvelle_version_substituee():
+    registre = Registre()
+    cache = ModelCache(client_factory=registre.client, loader=registre.load_model, max_models=2)
+    cache.get()
+
+    # Vérification sans changement de version : pas de rechargement
+    cache.refresh()
+    assert len(registre.chargements) == 1
+
+    registre.production = '2'
+    cache.refresh()
+    assert cache.get()[0] == ('SARIMAXModel', 'Production', '2')
+
+    # Retour à la version précédente, encore en mémoire
+    registre.production = '1'
+    cache.refresh()
+    assert cache.get()[0][2] == '1'
+    assert len(registre.chargements) == 2
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Tests de la recherche des ordres SARIMAX : configuration (parametres_recherche)
+et recherche complète (rechercher) avec des ordres réduits et un suivi MLflow
+dans un répertoire temporaire.
+"""
+
+import os
+import sys
+import threading
+import warnings
+
+import mlflow
+import numpy as np
+import pandas as pd
+import pytest
+from mlflow.tracking import MlflowClient
+from mlflow.utils.mlflow_tags import MLFLOW_PARENT_RUN_ID
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import recherche
+from logic import configurer_mlflow, decouper
+from models import DataCleaner
+from recherche import parametres_recherche, rechercher, RECHERCHE_DEFAUT, TERMINE, DIVERGE, HORS_BUDGET, ERREUR
+
+# Grille réduite : 2 x 2 candidats, période de 6 heures
+PETITE_GRILLE = {'p': [1, 2], 'd': [0], 'q': [0, 1], 'P': [0], 'D': [0], 'Q': [0], 's': 24, 'max_workers': 2}
+
+
+@pytest.fixture
+def suivi(tmp_path, monkeypatch):
+    # Suivi et registre MLflow dans des fichiers (hérité par les processus du pool)
+    monkeypatch.setenv('MLFLOW_ALLOW_FILE_STORE', 'true')
+    configurer_mlflow((tmp_path / 'mlruns').as_uri(), 'test_recherche')
+    yield
+    mlflow.set_tracking_uri(None)
+
+
+def mesures(nb_jours=4, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2024-07-01', periods=nb_jours * 96, freq='15min')
+    bruit = np.zeros(len(dates))
+    for i in range(1, len(dates)):
+        bruit[i] = 0.7 * bruit[i - 1] + rng.normal(0, 2)
+    ratio = 50 + bruit
+    return pd.DataFrame({'date': dates.astype(str), 'Effectif debout': ratio,
+                         'Effectif couche': 100 - ratio}).to_dict(orient='records')
+
+
+# Exécutée dans les processus du pool à la place de ajuster_candidat (importable par nom)
+def ajuster_ou_echouer(train_data, validation_data, order, seasonal_order, *args):
+    if tuple(order) == (2, 0, 1):
+        raise RuntimeError('panne simulée')
+    return recherche.ajuster_candidat(train_data, validation_data, order, seasonal_order, *args)
+
+
+def test_grille_par_defaut():
+    config, candidats = parametres_recherche({})
+    assert config['budget'] == RECHERCHE_DEFAUT['budget']
+    assert len(candidats) == 3 * 3 * 2
+    assert ((1, 1, 1), (0, 1, 1, 96)) in candidats
+    assert len(set(candidats)) == len(candidats)
+
+
+def test_grille_personnalisee():
+    _, candidats = parametres_recherche({'p': [3], 'd': [1], 'q': [3], 'P': [1], 'D': [1], 'Q': [1], 's': 24})
+    assert candidats == [((3, 1, 3), (1, 1, 1, 24))]
+
+
+def test_tirage_aleatoire_reproductible():
+    _, tirage = parametres_recherche({'mode': 'random', 'n_iter': 5, 'seed': 7})
+    _, meme_tirage = parametres_recherche({'mode': 'random', 'n_iter': 5, 'seed': 7})
+    _, grille = parametres_recherche({})
+    assert tirage == meme_tirage
+    assert len(tirage) == 5
+    assert set(tirage) <= set(grille)
+
+    # Pas plus de candidats que la grille n'en contient
+    _, tirage = parametres_recherche({'mode': 'random', 'n_iter': 100})
+    assert sorted(tirage) == sorted(grille)
+
+
+@pytest.mark.parametrize('recherche', [
+    [1, 2],
+    {'mode': 'bayes'},
+    {'inconnu': 1},
+    {'p': []},
+    {'q': [-1]},
+    {'p': 'abc'},
+    {'s': 1},
+    {'budget': 0},
+    {'n_iter': 0},
+    {'mode': 'random', 'n_iter': -2},
+    {'n_iter': 'abc'},
+    {'max_workers': 'abc'},
+    {'max_workers': 0},
+])
+def test_configuration_invalide(recherche):
+    with pytest.raises(ValueError):
+        parametres_recherche(recherche)
+
+
+def test_recherche_complete(suivi, monkeypatch):
+    monkeypatch.setattr(recherche, 'ajuster_candidat', ajuster_ou_echouer)
+    resultat = rechercher(mesures(), PETITE_GRILLE)
+
+    # Un candidat en erreur n'interrompt pas la recherche
+    statuts = {tuple(c['order']): c['statut'] for c in resultat['candidats']}
+    assert statuts == {(1, 0, 0): TERMINE, (1, 0, 1): TERMINE, (2, 0, 0): TERMINE, (2, 0, 1): ERREUR}
+
+    # Meilleur candidat : plus faible RMSE de validation, inscrit au registre
+    termines = [c for c in resultat['candidats'] if c['statut'] == TERMINE]
+    assert resultat['best'] == min(termines, key=lambda c: c['validation_rmse'])
+    assert resultat['run_id'] == resultat['best']['run_id']
+    versions = MlflowClient().search_model_versions("name='SARIMAXModel'")
+    assert [v.run_id for v in versions] == [resultat['run_id']]
+
+    # Candidats enregistrés comme runs imbriqués sous le run de la recherche
+    for candidat in termines:
+        run = mlflow.get_run(candidat['run_id'])
+        assert run.data.tags[MLFLOW_PARENT_RUN_ID] == resultat['search_run_id']
+        assert run.data.tags['statut'] == TERMINE
+    parent = mlflow.get_run(resultat['search_run_id'])
+    assert parent.data.metrics['num_termine'] == 3
+    assert parent.data.metrics['num_erreur'] == 1
+
+
+def test_budget_epuise(suivi):
+    # Budget écoulé avant le démarrage des candidats : aucun n'aboutit
+    with pytest.raises(RuntimeError):
+        rechercher(mesures(), {**PETITE_GRILLE, 'budget': 1e-6})
+    parent = mlflow.search_runs(filter_string="attributes.run_name = 'recherche_sarimax'", output_format='list')[0]
+    assert parent.data.metrics['num_hors_budget'] == 4
+    assert MlflowClient().search_model_versions("name='SARIMAXModel'") == []
+
+
+def test_candidat_divergent(suivi, monkeypatch):
+    # Paramètres au-delà de max_param dès la première itération : candidat abandonné
+    monkeypatch.setattr(recherche, '_ARRET', threading.Event())
+    train_data, validation_data = decouper(DataCleaner().transform(pd.DataFrame(mesures())))
+    parent = MlflowClient().create_run(mlflow.get_experiment_by_name('test_recherche').experiment_id)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        resume, predictions = recherche.ajuster_candidat(
+            train_data, validation_data, (1, 0, 1), (0, 0, 0, 24), parent.info.experiment_id,
+            parent.info.run_id, float('inf'), 1e-9, 10.0)
+    assert resume['statut'] == DIVERGE
+    assert predictions is None
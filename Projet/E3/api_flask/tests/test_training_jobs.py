@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Tests des tâches d'entraînement en arrière-plan (training_jobs), avec des
+fonctions rapides à la place de l'entraînement SARIMAX.
+"""
+
+import os
+import pickle
+import sys
+import threading
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from models import SARIMAXModel
+from training_jobs import JobManager, JobStore, EN_ATTENTE, EN_COURS, TERMINE, ANNULE, ERREUR, STATUTS_FINAUX
+
+
+# Fonctions exécutées dans les processus du pool (importables par nom)
+def rapide(valeur, verifier_annulation=None):
+    verifier_annulation()
+    return {'valeur': valeur * 2}
+
+
+def echec(verifier_annulation=None):
+    raise ValueError('données invalides')
+
+
+def longue(duree, verifier_annulation=None):
+    fin = time.monotonic() + duree
+    while time.monotonic() < fin:
+        verifier_annulation()
+        time.sleep(0.05)
+    return {'valeur': 'fini'}
+
+
+def attendre(manager, job_id, statuts, timeout=60):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        job = manager.get(job_id)
+        if job['statut'] in statuts:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Tâche {job_id} toujours {job['statut']}")
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = JobManager(str(tmp_path / 'jobs.db'), max_workers=1)
+    yield manager
+    manager.shutdown()
+
+
+def test_resultat(manager):
+    job_id = manager.submit(rapide, 21)
+    assert manager.get(job_id)['statut'] in (EN_ATTENTE, EN_COURS, TERMINE)
+
+    job = attendre(manager, job_id, STATUTS_FINAUX)
+    assert job['statut'] == TERMINE
+    assert job['resultat'] == {'valeur': 42}
+    assert job['debut'] and job['fin']
+
+
+def test_erreur(manager):
+    job = attendre(manager, manager.submit(echec), STATUTS_FINAUX)
+    assert job['statut'] == ERREUR
+    assert 'données invalides' in job['erreur']
+
+
+def test_tache_inconnue(manager):
+    assert manager.get('inconnue') is None
+    assert manager.cancel('inconnue') is None
+
+
+def test_annulation_en_cours_et_en_attente(manager):
+    en_cours = manager.submit(longue, 30)
+    en_attente = manager.submit(longue, 30)  # Un seul processus : reste en attente
+    attendre(manager, en_cours, (EN_COURS,))
+
+    assert manager.cancel(en_attente)['statut'] == ANNULE
+    manager.cancel(en_cours)
+    debut = time.monotonic()
+    job = attendre(manager, en_cours, STATUTS_FINAUX, timeout=10)
+    assert job['statut'] == ANNULE
+    assert job['resultat'] is None
+    assert time.monotonic() - debut < 5
+
+    # Le processus est libéré pour les tâches suivantes
+    job = attendre(manager, manager.submit(rapide, 1), STATUTS_FINAUX)
+    assert job['resultat'] == {'valeur': 2}
+
+
+def test_etat_partage_entre_instances(manager, tmp_path):
+    # Un autre worker de l'API lit et annule les tâches via la même base
+    autre = JobManager(str(tmp_path / 'jobs.db'), max_workers=1)
+    try:
+        job_id = manager.submit(longue, 30)
+        attendre(autre, job_id, (EN_COURS,))
+        autre.cancel(job_id)
+        assert attendre(manager, job_id, STATUTS_FINAUX, timeout=10)['statut'] == ANNULE
+        # Une tâche terminée n'est plus modifiée par une nouvelle annulation
+        assert autre.cancel(job_id)['statut'] == ANNULE
+    finally:
+        autre.shutdown()
+
+
+def test_tache_abandonnee(manager, tmp_path):
+    # Tâches d'un worker arrêté brutalement : plus aucun battement depuis plus d'une minute
+    store = JobStore(str(tmp_path / 'jobs.db'))
+    en_cours, en_attente, recente = store.creer(), store.creer(), store.creer()
+    store.demarrer(en_cours)
+    assert store.get(en_cours)['pid'] == os.getpid()
+    with store.pool.connection() as conn:
+        conn.execute("UPDATE jobs SET battement='2024-07-01T00:00:00' WHERE id IN (?, ?)", (en_cours, en_attente))
+
+    # À la lecture
+    job = manager.get(en_cours)
+    assert job['statut'] == ERREUR
+    assert 'abandonnée' in job['erreur'] and job['fin']
+    assert store.get(en_attente)['statut'] == EN_ATTENTE
+
+    # Au démarrage d'un worker : seules les tâches sans battement récent
+    autre = JobManager(str(tmp_path / 'jobs.db'), max_workers=1)
+    autre.shutdown()
+    assert store.get(en_attente)['statut'] == ERREUR
+    assert store.get(recente)['statut'] == EN_ATTENTE
+
+
+def test_modele_serialisable_avec_callback():
+    # Le callback d'annulation référence des objets non sérialisables (verrous, connexions)
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'date': pd.date_range('2024-07-01', periods=96, freq='15min'),
+                       'ratio_debout': 50 + rng.normal(0, 2, 96)})
+    verrou = threading.Lock()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        modele = SARIMAXModel(order=(1, 0, 1), seasonal_order=(0, 0, 0, 0)).fit(df, callback=lambda params: verrou)
+    assert pickle.loads(pickle.dumps(modele)).results_.params.equals(modele.results_.params)
+
+
+def arret_brutal(verifier_annulation=None):
+    os._exit(1)  # Processus du pool tué (manque de mémoire...)
+
+
+def test_pool_recree_apres_arret_brutal(manager):
+    job = attendre(manager, manager.submit(arret_brutal), STATUTS_FINAUX)
+    assert job['statut'] == ERREUR
+
+    # Le pool est recréé : les tâches suivantes s'exécutent normalement
+    job = attendre(manager, manager.submit(rapide, 4), STATUTS_FINAUX)
+    assert job['statut'] == TERMINE
+    assert job['resultat'] == {'valeur': 8}
+
+
+def test_soumission_impossible(manager, monkeypatch):
+    # Pool recréé mais toujours inutilisable : tâche en erreur et BrokenProcessPool levée
+    def casse(*args, **kwargs):
+        raise BrokenProcessPool('pool cassé')
+
+    monkeypatch.setattr(ProcessPoolExecutor, 'submit', casse)
+    with pytest.raises(BrokenProcessPool):
+        manager.submit(rapide, 1)
+    with manager.store.pool.connection() as conn:
+        statuts = [ligne[0] for ligne in conn.execute('SELECT statut FROM jobs')]
+    assert statuts == [ERREUR]
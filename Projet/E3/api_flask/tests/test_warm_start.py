@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Tests du réentraînement à chaud (start_params) et de l'ajout d'observations
+(SARIMAXModel.append, logic.ajuster), avec des ordres réduits.
+"""
+
+import os
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.pipeline import Pipeline
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from logic import ajuster
+from models import DataCleaner, SARIMAXModel
+
+ORDRES = {'order': (1, 0, 1), 'seasonal_order': (0, 0, 0, 0)}
+
+
+@pytest.fixture(autouse=True)
+def sans_avertissements():
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        yield
+
+
+def mesures(nb_jours=4, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2024-07-01', periods=nb_jours * 96, freq='15min')
+    bruit = np.zeros(len(dates))
+    for i in range(1, len(dates)):
+        bruit[i] = 0.7 * bruit[i - 1] + rng.normal(0, 2)
+    ratio = 50 + bruit
+    df = pd.DataFrame({'date': dates, 'Effectif debout': ratio, 'Effectif couche': 100 - ratio})
+    return DataCleaner().transform(df)
+
+
+def jours(df, debut, fin):
+    origine = df['date'].min()
+    return df[(df['date'] >= origine + pd.Timedelta(days=debut)) & (df['date'] < origine + pd.Timedelta(days=fin))]
+
+
+def production(df):
+    return Pipeline([('cleaner', DataCleaner()), ('sarimax', SARIMAXModel(**ORDRES))]).fit(df)
+
+
+def test_demarrage_a_chaud():
+    df = mesures()
+    a_froid = SARIMAXModel(**ORDRES).fit(df)
+    a_chaud = SARIMAXModel(**ORDRES).fit(df, start_params=a_froid.results_.params)
+
+    assert np.allclose(a_chaud.results_.params, a_froid.results_.params, rtol=1e-2)
+    assert a_chaud.results_.mle_retvals['iterations'] <= a_froid.results_.mle_retvals['iterations']
+
+
+def test_append_conserve_les_parametres():
+    df = mesures()
+    modele = SARIMAXModel(**ORDRES).fit(jours(df, 0, 3))
+    params = modele.results_.params.copy()
+
+    modele.append(jours(df, 1, 4))
+    assert modele.results_.model.data.row_labels[-1] == df['date'].max()
+    # Historique limité à la fenêtre des données ajoutées
+    assert modele.results_.model.data.row_labels[0] == jours(df, 1, 4)['date'].min()
+    assert len(modele.results_.model.data.row_labels) == len(jours(df, 1, 4))
+    assert np.array_equal(modele.results_.params, params)
+
+    # Prévision au-delà de l'historique étendu
+    suite = pd.DataFrame({'date': pd.date_range(df['date'].max() + pd.Timedelta(minutes=15), periods=8, freq='15min')})
+    assert len(modele.predict(suite)) == 8
+
+
+@pytest.mark.parametrize('debut, fin', [(0, 2), (0, 4)])
+def test_append_refuse(debut, fin):
+    df = mesures()
+    modele = SARIMAXModel(**ORDRES).fit(jours(df, 1, 3))
+    # Aucune observation nouvelle, ou données commençant avant l'historique
+    with pytest.raises(ValueError):
+        modele.append(jours(df, debut, fin))
+
+
+def test_ajuster_append_et_repli():
+    df = mesures()
+
+    _, sarimax, mode = ajuster(jours(df, 1, 4), 'append', production=production(jours(df, 0, 3)))
+    assert mode == 'append'
+    assert sarimax.results_.model.data.row_labels[-1] == df['date'].max()
+
+    # Les données ne prolongent pas l'historique : démarrage à chaud avec les ordres du modèle en production
+    _, sarimax, mode = ajuster(jours(df, 0, 2), 'append', production=production(jours(df, 1, 3)))
+    assert mode == 'warm_start'
+    assert sarimax.order == ORDRES['order']
+    assert sarimax.results_.model.data.row_labels[-1] == jours(df, 0, 2)['date'].max()
+
+
+def test_ajuster_mode_inconnu():
+    with pytest.raises(ValueError):
+        ajuster(mesures(), 'incremental')
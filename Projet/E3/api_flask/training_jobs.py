@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+"""
+Exécution des entraînements (/train) en tâche de fond.
+
+Un entraînement SARIMAX dure plusieurs minutes : il est soumis à un pool de
+processus (ProcessPoolExecutor) et la requête HTTP renvoie immédiatement un
+identifiant de tâche. L'état des tâches (en attente, en cours, terminée,
+annulée, en erreur) et leur résultat sont enregistrés dans une base SQLite :
+ils sont lisibles par tous les workers de l'API et par le processus qui
+exécute l'entraînement.
+
+L'annulation d'une tâche en attente la retire du pool. Une tâche en cours
+est annulée de façon coopérative : la fonction d'entraînement appelle
+régulièrement verifier_annulation(), y compris à chaque itération de
+l'optimiseur SARIMAX, qui lève TacheAnnulee quand l'annulation est demandée.
+
+Chaque tâche non terminée porte le pid du processus qui en répond (worker qui
+l'a soumise, puis processus qui l'exécute) et un battement de cœur, mis à jour
+par ce processus toutes les BATTEMENT_INTERVALLE secondes. Si ce processus
+s'arrête brutalement, le battement n'est plus mis à jour : au-delà de
+DELAI_ABANDON, la tâche est passée en erreur à la lecture suivante et au
+démarrage de l'API.
+
+Un processus du pool arrêté brutalement (manque de mémoire...) rend le pool
+inutilisable (BrokenProcessPool) : il est alors recréé, et la soumission
+réessayée une fois. Si elle échoue encore, la tâche est passée en erreur et
+BrokenProcessPool est levée (503 côté API).
+"""
+
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Module commun aux API E3 et E4 : Projet/commun/auth_store.py
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'commun')))
+
+from auth_store import ConnectionPool
+
+EN_ATTENTE = 'en_attente'
+EN_COURS = 'en_cours'
+TERMINE = 'termine'
+ANNULE = 'annule'
+ERREUR = 'erreur'
+STATUTS_FINAUX = (TERMINE, ANNULE, ERREUR)
+
+SQL_CREATE_JOBS = '''
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        statut TEXT NOT NULL,
+        soumis TEXT NOT NULL,
+        debut TEXT,
+        fin TEXT,
+        resultat TEXT,
+        erreur TEXT,
+        annulation INTEGER NOT NULL DEFAULT 0,
+        pid INTEGER,
+        battement TEXT
+    )
+'''
+# Colonnes ajoutées aux bases créées avant le suivi des processus
+SQL_COLONNES_JOBS = "PRAGMA table_info(jobs)"
+COLONNES_AJOUTEES = {'pid': 'INTEGER', 'battement': 'TEXT'}
+SQL_INSERT_JOB = "INSERT INTO jobs (id, statut, soumis, pid, battement) VALUES (?, ?, ?, ?, ?)"
+SQL_SELECT_JOB = "SELECT id, statut, soumis, debut, fin, resultat, erreur, annulation, pid, battement FROM jobs WHERE id=?"
+SQL_SELECT_ANNULATION = "SELECT annulation FROM jobs WHERE id=?"
+SQL_DEMARRER_JOB = "UPDATE jobs SET statut=?, debut=?, pid=?, battement=? WHERE id=? AND statut=?"
+SQL_BATTEMENT = "UPDATE jobs SET battement=? WHERE id=? AND statut IN (?, ?)"
+SQL_ABANDONNER_JOBS = """
+    UPDATE jobs SET statut=?, fin=?, erreur=?
+    WHERE statut IN (?, ?) AND COALESCE(battement, soumis)<? AND (? IS NULL OR id=?)
+"""
+SQL_TERMINER_JOB = "UPDATE jobs SET statut=?, fin=?, resultat=?, erreur=? WHERE id=? AND statut NOT IN (?, ?, ?)"
+SQL_DEMANDER_ANNULATION = "UPDATE jobs SET annulation=1 WHERE id=?"
+SQL_ANNULER_EN_ATTENTE = "UPDATE jobs SET statut=?, fin=? WHERE id=? AND statut=?"
+SQL_PURGE_JOBS = "DELETE FROM jobs WHERE fin IS NOT NULL AND fin<?"
+
+# Délai minimal (secondes) entre deux lectures de la demande d'annulation en base
+DELAI_VERIFICATION = 1.0
+
+# Délai (secondes) entre deux battements de cœur d'une tâche, et délai sans
+# battement au-delà duquel son processus est considéré comme arrêté
+BATTEMENT_INTERVALLE = 10.0
+DELAI_ABANDON = datetime.timedelta(seconds=60)
+
+logger = logging.getLogger(__name__)
+
+
+class TacheAnnulee(Exception):
+    """Levée dans la fonction d'entraînement quand l'annulation a été demandée."""
+
+
+def _maintenant(decalage=datetime.timedelta(0)):
+    return (datetime.datetime.utcnow() - decalage).isoformat(timespec='seconds')
+
+
+class JobStore:
+    def __init__(self, database):
+        self.database = database
+        self.pool = ConnectionPool(database, size=4)
+        with self.pool.connection() as conn:
+            conn.execute(SQL_CREATE_JOBS)
+            existantes = {colonne[1] for colonne in conn.execute(SQL_COLONNES_JOBS)}
+            for colonne, type_ in COLONNES_AJOUTEES.items():
+                if colonne not in existantes:
+                    try:
+                        conn.execute(f"ALTER TABLE jobs ADD COLUMN {colonne} {type_}")
+                    except sqlite3.OperationalError:
+                        pass  # Ajoutée entre-temps par un autre worker
+
+    def creer(self):
+        job_id = uuid.uuid4().hex
+        maintenant = _maintenant()
+        with self.pool.connection() as conn:
+            conn.execute(SQL_INSERT_JOB, (job_id, EN_ATTENTE, maintenant, os.getpid(), maintenant))
+        return job_id
+
+    def get(self, job_id):
+        """Renvoie l'état de la tâche sous forme de dictionnaire, ou None si elle est inconnue."""
+        with self.pool.connection() as conn:
+            ligne = conn.execute(SQL_SELECT_JOB, (job_id,)).fetchone()
+        if ligne is None:
+            return None
+        job = dict(zip(['job_id', 'statut', 'soumis', 'debut', 'fin', 'resultat', 'erreur', 'annulation',
+                        'pid', 'battement'], ligne))
+        job['resultat'] = json.loads(job['resultat']) if job['resultat'] else None
+        job['annulation'] = bool(job['annulation'])
+        return job
+
+    def demarrer(self, job_id):
+        """Passe la tâche en cours ; renvoie False si elle n'est plus en attente (annulée)."""
+        maintenant = _maintenant()
+        with self.pool.connection() as conn:
+            return conn.execute(SQL_DEMARRER_JOB, (EN_COURS, maintenant, os.getpid(), maintenant,
+                                                   job_id, EN_ATTENTE)).rowcount == 1
+
+    def battre(self, job_ids):
+        """Met à jour le battement de cœur des tâches non terminées."""
+        maintenant = _maintenant()
+        with self.pool.connection() as conn:
+            conn.executemany(SQL_BATTEMENT, [(maintenant, job_id, EN_ATTENTE, EN_COURS) for job_id in job_ids])
+
+    def abandonner(self, job_id=None, delai=DELAI_ABANDON):
+        """
+        Passe en erreur les tâches (toutes, ou seulement 'job_id') en attente ou
+        en cours sans battement depuis 'delai' ; renvoie le nombre de tâches.
+        """
+        erreur = f"Tâche abandonnée : aucun signe de son processus depuis {int(delai.total_seconds())} s"
+        with self.pool.connection() as conn:
+            return conn.execute(SQL_ABANDONNER_JOBS, (ERREUR, _maintenant(), erreur, EN_ATTENTE, EN_COURS,
+                                                      _maintenant(delai), job_id, job_id)).rowcount
+
+    def terminer(self, job_id, statut, resultat=None, erreur=None):
+        resultat = json.dumps(resultat) if resultat is not None else None
+        with self.pool.connection() as conn:
+            conn.execute(SQL_TERMINER_JOB, (statut, _maintenant(), resultat, erreur, job_id) + STATUTS_FINAUX)
+
+    def demander_annulation(self, job_id):
+        with self.pool.connection() as conn:
+            conn.execute(SQL_DEMANDER_ANNULATION, (job_id,))
+
+    def annuler_en_attente(self, job_id):
+        """Annule la tâche si elle n'a pas démarré (elle ne démarrera plus, voir executer_tache)."""
+        with self.pool.connection() as conn:
+            conn.execute(SQL_ANNULER_EN_ATTENTE, (ANNULE, _maintenant(), job_id, EN_ATTENTE))
+
+    def annulation_demandee(self, job_id):
+        with self.pool.connection() as conn:
+            ligne = conn.execute(SQL_SELECT_ANNULATION, (job_id,)).fetchone()
+        return bool(ligne and ligne[0])
+
+    def purger(self, age=datetime.timedelta(days=7)):
+        """Supprime les tâches terminées depuis plus de 'age' ; renvoie le nombre de lignes supprimées."""
+        limite = (datetime.datetime.utcnow() - age).isoformat(timespec='seconds')
+        with self.pool.connection() as conn:
+            return conn.execute(SQL_PURGE_JOBS, (limite,)).rowcount
+
+
+def executer_tache(database, job_id, fonction, args):
+    """
+    Exécutée dans un processus du pool : appelle fonction(*args,
+    verifier_annulation=...) et enregistre son résultat (dictionnaire JSON).
+    """
+    store = JobStore(database)
+    if not store.demarrer(job_id):
+        return  # Annulée avant son démarrage
+
+    # Battement de cœur de la tâche tant que ce processus l'exécute
+    arret = threading.Event()
+
+    def battre():
+        while not arret.wait(BATTEMENT_INTERVALLE):
+            try:
+                store.battre([job_id])
+            except sqlite3.Error as e:
+                logger.warning(f"Battement de la tâche {job_id} non enregistré : {e}")
+
+    threading.Thread(target=battre, name=f'battement-{job_id}', daemon=True).start()
+
+    derniere_verification = [0.0]
+
+    def verifier_annulation(*_):
+        # Appelée aussi comme callback de l'optimiseur : lecture en base au plus une fois par seconde
+        if time.monotonic() - derniere_verification[0] < DELAI_VERIFICATION:
+            return
+        derniere_verification[0] = time.monotonic()
+        if store.annulation_demandee(job_id):
+            raise TacheAnnulee(job_id)
+
+    try:
+        resultat = fonction(*args, verifier_annulation=verifier_annulation)
+    except TacheAnnulee:
+        store.terminer(job_id, ANNULE)
+    except Exception as e:
+        logger.error(f"Échec de la tâche {job_id} : {e}")
+        store.terminer(job_id, ERREUR, erreur=str(e))
+    else:
+        store.terminer(job_id, TERMINE, resultat=resultat)
+    finally:
+        arret.set()
+
+
+class JobManager:
+    def __init__(self, database='jobs.db', max_workers=1, initializer=None, initargs=()):
+        self.store = JobStore(database)
+        self.store.purger()  # Tâches terminées depuis plus d'une semaine
+        abandonnees = self.store.abandonner()  # Tâches d'un worker ou d'un processus arrêté
+        if abandonnees:
+            logger.warning(f"{abandonnees} tâche(s) abandonnée(s) passée(s) en erreur")
+        self.max_workers = max_workers  # Entraînements exécutés en parallèle
+        self.initializer = initializer  # Initialisation de chaque processus du pool (MLflow...)
+        self.initargs = initargs
+        self._executor = self._nouveau_pool()
+        self._futures = {}  # job_id -> Future, tâches soumises par ce processus
+        self._lock = threading.Lock()
+
+        # Battement des tâches soumises par ce processus, en attente dans le pool
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._battre, name='jobs-battement', daemon=True)
+        self._thread.start()
+
+    def _nouveau_pool(self):
+        # Processus lancés par 'spawn' : pas de fork d'un processus qui a déjà des threads
+        return ProcessPoolExecutor(max_workers=self.max_workers,
+                                   mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=self.initializer, initargs=self.initargs)
+
+    def _reconstruire(self, executor):
+        """Remplace le pool 'executor', devenu inutilisable, s'il n'a pas déjà été remplacé."""
+        with self._lock:
+            if self._executor is executor:
+                logger.warning("Pool d'entraînement inutilisable (processus arrêté brutalement) : recréé")
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._nouveau_pool()
+            return self._executor
+
+    def submit(self, fonction, *args):
+        """
+        Soumet fonction(*args) ; renvoie l'identifiant de la tâche. Lève
+        BrokenProcessPool si le pool, même recréé, refuse la tâche.
+        """
+        job_id = self.store.creer()
+        with self._lock:
+            executor = self._executor
+        try:
+            try:
+                future = executor.submit(executer_tache, self.store.database, job_id, fonction, args)
+            except BrokenProcessPool:
+                executor = self._reconstruire(executor)
+                future = executor.submit(executer_tache, self.store.database, job_id, fonction, args)
+        except BrokenProcessPool as e:
+            self.store.terminer(job_id, ERREUR, erreur=f"Pool d'entraînement indisponible : {e}")
+            raise
+        with self._lock:
+            self._futures[job_id] = future
+        future.add_done_callback(lambda f: self._fin(job_id, executor, f))
+        return job_id
+
+    def _fin(self, job_id, executor, future):
+        with self._lock:
+            self._futures.pop(job_id, None)
+        if future.cancelled():
+            self.store.terminer(job_id, ANNULE)
+        elif future.exception() is not None:
+            # Processus du pool arrêté brutalement (mémoire...) : la tâche n'a pas pu s'enregistrer
+            self.store.terminer(job_id, ERREUR, erreur=str(future.exception()))
+            if isinstance(future.exception(), BrokenProcessPool):
+                self._reconstruire(executor)  # Pool prêt pour les tâches suivantes
+
+    def _battre(self):
+        while not self._stop.wait(BATTEMENT_INTERVALLE):
+            with self._lock:
+                job_ids = list(self._futures)
+            try:
+                self.store.battre(job_ids)
+            except sqlite3.Error as e:
+                logger.warning(f"Battement des tâches non enregistré : {e}")
+
+    def get(self, job_id):
+        job = self.store.get(job_id)
+        if (job is not None and job['statut'] not in STATUTS_FINAUX
+                and (job['battement'] or job['soumis']) < _maintenant(DELAI_ABANDON)):
+            # Processus responsable arrêté : la tâche ne se terminera plus
+            self.store.abandonner(job_id)
+            job = self.store.get(job_id)
+        return job
+
+    def cancel(self, job_id):
+        """
+        Demande l'annulation de la tâche ; renvoie son état, ou None si elle est
+        inconnue. Une tâche en attente est annulée immédiatement, une tâche en
+        cours l'est à la prochaine vérification.
+        """
+        job = self.store.get(job_id)
+        if job is None or job['statut'] in STATUTS_FINAUX:
+            return job
+
+        self.store.demander_annulation(job_id)
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            future.cancel()  # Retire la tâche du pool si elle n'a pas encore été transmise à un processus
+        # Tâche en attente, éventuellement soumise par un autre worker ou déjà transmise au pool
+        self.store.annuler_en_attente(job_id)
+        return self.store.get(job_id)
+
+    def shutdown(self):
+        self._stop.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+"""
+Point d'entrée de production de l'API E3 (port 5100) :
+
+    python wsgi.py                     # gunicorn (Linux) ou waitress (Windows)
+    gunicorn -w 4 -k gthread wsgi:app  # appel direct de gunicorn
+
+Nombre de workers : variable d'environnement WEB_CONCURRENCY, sinon nombre de cœurs.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'commun')))
+
+if __name__ == '__main__':
+    from serveur import servir
+
+    servir('appjwt', port=5100)
+else:
+    from appjwt import app  # Application servie par 'gunicorn wsgi:app'
@@ -11,6 +11,7 @@ import matplotlib.pyplot as plt
 from datetime import timedelta
 import warnings
 import json
+import time
 from sklearn.metrics import mean_squared_error
 import numpy as np
 import streamlit as st
@@ -59,64 +60,101 @@ def train(df):
     }
     url_train = 'http://localhost:5100/train'
     response_train = requests.post(url_train, headers=headers, json=data)
-    
-    if response_train.status_code == 200:
-        st.success("Entraînement réussi !")
 
-        col1, col2, col3 = st.columns([2,3, 2])
-        
-        with col2:
+    # L'API renvoie immédiatement l'identifiant de la tâche d'entraînement
+    if response_train.status_code != 202:
+        st.error(f"Erreur lors de la soumission de l'entraînement : {response_train.status_code}")
+        return
+
+    st.session_state.train_job = response_train.json()['job_id']
+    st.session_state.train_df = df
+    suivre_entrainement()
+
+def suivre_entrainement():
+    # Suivi de la tâche d'entraînement en cours (reprise à chaque exécution du script)
+    job_id = st.session_state.train_job
+    df = st.session_state.train_df
+    headers = {'x-access-tokens': st.session_state.token}
+    url_job = f'http://localhost:5100/train/{job_id}'
+
+    if st.button("Annuler l'entraînement", key='annuler_entrainement'):
+        requests.delete(url_job, headers=headers)
+        del st.session_state.train_job
+        st.warning("Entraînement annulé.")
+        return
+
+    # Une seule interrogation par exécution du script : entre deux exécutions, Streamlit
+    # traite les clics (bouton d'annulation), ignorés pendant une boucle sans appel st.*
+    response_job = requests.get(url_job, headers=headers)
+    if response_job.status_code != 200:
+        del st.session_state.train_job
+        st.error(f"Erreur lors du suivi de l'entraînement : {response_job.status_code}")
+        return
+    job = response_job.json()
+    if job['statut'] not in ('termine', 'erreur', 'annule'):
+        st.info(f"Entraînement en cours ({job['statut']})...")
+        time.sleep(2)
+        st.rerun()  # Nouvelle interrogation, reprise par la session (train_job)
+
+    del st.session_state.train_job
+    if job['statut'] == 'annule':
+        st.warning("Entraînement annulé.")
+    elif job['statut'] == 'erreur':
+        st.error(f"Erreur lors de l'entraînement du modèle : {job['erreur']}")
+    else:
+        afficher_entrainement(job['resultat'], df)
+
+def afficher_entrainement(data_response, df):
+    st.success("Entraînement réussi !")
+
+    col1, col2, col3 = st.columns([2,3, 2])
+
+    with col2:
+        if 'predictions' in data_response:
+            predictions_json = data_response['predictions']
+            
             try:
-                data_response = response_train.json()
-            except ValueError:
-                st.error("La réponse n'est pas un JSON valide.")
-                return
+                predictions_df = pd.read_json(predictions_json)
+                predictions_df['Date'] = pd.to_datetime(predictions_df['Date'])
 
-            if 'predictions' in data_response:
-                predictions_json = data_response['predictions']
-                
+                # Ajouter la colonne ratio
                 try:
-                    predictions_df = pd.read_json(predictions_json)
-                    predictions_df['Date'] = pd.to_datetime(predictions_df['Date'])
-
-                    # Ajouter la colonne ratio
-                    try:
-                        df['ratio'] = (df['Effectif debout'] / (df['Effectif couche'] + df['Effectif debout'])) * 100
-                    except KeyError as e:
-                        st.error(f"Erreur lors du calcul du ratio : colonne manquante {e}")
-                        return
-                    
-                    # Conversion en timestamp et mise en index
-                    df['timestamp'] = pd.to_datetime(df['date'], errors='coerce')
-                    df = df.set_index('timestamp')
-
-                    # Sélection des colonnes numériques et calcul de la médiane sur un échantillonnage de 15 minutes
-                    df_numeric = df.select_dtypes(include=[float, int])
-                    median_df = df_numeric.resample('15T').median()
-
-                    # Filtrage pour ne garder que les deux derniers jours
-                    last_two_days = median_df.loc[median_df.index >= (median_df.index.max() - pd.Timedelta(days=2))]
-
-                    # Tracer les courbes des valeurs et du ratio sur un seul graphique avec matplotlib
-                    plt.figure(figsize=(10, 6))
+                    df['ratio'] = (df['Effectif debout'] / (df['Effectif couche'] + df['Effectif debout'])) * 100
+                except KeyError as e:
+                    st.error(f"Erreur lors du calcul du ratio : colonne manquante {e}")
+                    return
+                
+                # Conversion en timestamp et mise en index
+                df['timestamp'] = pd.to_datetime(df['date'], errors='coerce')
+                df = df.set_index('timestamp')
 
-                    # Courbe des valeurs du modèle prédictif
-                    plt.plot(predictions_df.set_index('Date').index, predictions_df['Valeurs'], label='Prédiction', color='blue')
+                # Sélection des colonnes numériques et calcul de la médiane sur un échantillonnage de 15 minutes
+                df_numeric = df.select_dtypes(include=[float, int])
+                median_df = df_numeric.resample('15T').median()
 
-                    # Courbe du ratio
-                    plt.plot(last_two_days.index, last_two_days['ratio'], label='Verité terrain', color='orange', linestyle='--')
+                # Filtrage pour ne garder que les deux derniers jours
+                last_two_days = median_df.loc[median_df.index >= (median_df.index.max() - pd.Timedelta(days=2))]
 
-                    # Ajouter le titre et les légendes
-                    plt.title('Prédiction et Verité terrain sur le même graphique')
-                    plt.xlabel('Date')
-                    plt.legend()
+                # Tracer les courbes des valeurs et du ratio sur un seul graphique avec matplotlib
+                plt.figure(figsize=(10, 6))
 
-                    # Afficher le graphique dans Streamlit
-                    st.pyplot(plt)
+                # Courbe des valeurs du modèle prédictif
+                plt.plot(predictions_df.set_index('Date').index, predictions_df['Valeurs'], label='Prédiction', color='blue')
 
-                except ValueError as e:
-                    st.error(f"Erreur lors de la lecture du JSON : {e}")
-                    return
+                # Courbe du ratio
+                plt.plot(last_two_days.index, last_two_days['ratio'], label='Verité terrain', color='orange', linestyle='--')
+
+                # Ajouter le titre et les légendes
+                plt.title('Prédiction et Verité terrain sur le même graphique')
+                plt.xlabel('Date')
+                plt.legend()
+
+                # Afficher le graphique dans Streamlit
+                st.pyplot(plt)
+
+            except ValueError as e:
+                st.error(f"Erreur lors de la lecture du JSON : {e}")
+                return
 
 
 def prediction(filtered_df, ratio_df, median_df):
@@ -301,6 +339,11 @@ def training_form():
     # Supprimer les valeurs NaT
     df = df.dropna(subset=['date'])
 
+    # Entraînement soumis lors d'un affichage précédent : reprise du suivi
+    if st.session_state.get('train_job'):
+        suivre_entrainement()
+        return
+
     if st.button("Entraîner le modèle"):
         # Utiliser la date sélectionnée stockée dans la session
         selected_date = st.session_state.get('selected_date', None)
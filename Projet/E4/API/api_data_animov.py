@@ -1,26 +1,48 @@
-from flask import Flask, request, jsonify, render_template
-from datetime import datetime
+from flask import Flask, request, jsonify, render_template, Response
+from datetime import datetime, timedelta
 import pandas as pd
 import json
 import yaml
-from itertools import permutations
 import numpy as np
 import sqlalchemy
 from sqlalchemy.engine.url import URL
-from sqlalchemy import Table, Column, Integer, BigInteger, MetaData, Index, Text, DECIMAL, text
-import statistics
+from sqlalchemy import text, bindparam
 import tracemalloc
 import logging
-from db_utils import add_user, authenticate_user
-from functools import wraps
+import atexit
+import os
+import sys
 import sqlite3
-import jwt
+import threading
+from db_utils import init_db, add_user, authenticate_user, validate_token, revoke_token, purge_expired_tokens, TokenPurger
+from write_behind import WriteBehindQueue
+from frame_store import FrameStore
+from ingest_state import IngestState, Synchroniseur
+from frame_stats import stats_frames
+from response_cache import ResponseCache
+from source_registry import SourceRegistry
+from consolidation_job import ConsolidationJob
+from tabular_format import format_tabulaire
+from http_cache import install_compression, etag, parametres, validateurs, non_modifie
+from event_stream import EventBroker
+import schema
+from functools import wraps
+from contextlib import contextmanager
 from collections import defaultdict
 from flasgger import Swagger  # Importation de flasgger
 
+# Modules communs aux API E3 et E4 : Projet/commun/json_provider.py et serveur.py
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'commun')))
+
+from json_provider import install_json_provider
+from serveur import threads_par_processus
+
 # Création d'une instance de l'application Flask.
 app = Flask(__name__)
 
+# Sérialisation JSON des types NumPy / pandas (orjson si installé)
+install_json_provider(app)
+
 # Configuration de flasgger
 swagger = Swagger(app)
 
@@ -31,12 +53,18 @@ DATABASE = 'tokens.db'
 # Configuration de la journalisation
 logging.basicConfig(level=logging.INFO)
 
+# Création des tables et index de la base des tokens si besoin
+init_db()
+
 # Ajout d'un utilisateur de test, gestion des exceptions
 try:
     add_user('arscg', 'arscg')
 except Exception as e:
     logging.error(f"Error adding user: {e}")
 
+# Purge périodique des tokens expirés
+token_purger = TokenPurger(purge_expired_tokens).start()
+
 @app.route('/login', methods=['POST'])
 def login():
     """
@@ -70,10 +98,15 @@ def login():
               description: Token JWT
       401:
         description: Authentification échouée
+      503:
+        description: Base d'authentification momentanément indisponible
     """
     auth = request.json
     if auth:
-        token = authenticate_user(auth['username'], auth['password'], app.config['SECRET_KEY'])
+        try:
+            token = authenticate_user(auth['username'], auth['password'], app.config['SECRET_KEY'])
+        except sqlite3.OperationalError as e:
+            return base_indisponible(e)
         if token:
             return jsonify({'token': token})
     return jsonify({'message': 'Authentification échouée'}), 401
@@ -82,6 +115,12 @@ def login():
 def index():
     return render_template('login.html')
 
+# Base SQLite saturée (pool de connexions épuisé, verrou trop long) : l'erreur
+# est passagère, le client doit réessayer plutôt que se réauthentifier.
+def base_indisponible(erreur):
+    logging.warning(f"Base SQLite indisponible : {erreur}")
+    return jsonify({'message': 'Service momentanément indisponible'}), 503, {'Retry-After': '1'}
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -89,136 +128,117 @@ def token_required(f):
         if not token:
             return jsonify({'message': 'Token manquant'}), 401
         try:
-            with sqlite3.connect(DATABASE) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM tokens WHERE token=?", (token,))
-                token_data = cursor.fetchone()
-                if not token_data:
-                    return jsonify({'message': 'Token invalide'}), 401
-                expiration = token_data[3]
-                if isinstance(expiration, str):
-                    expiration = datetime.strptime(expiration, '%Y-%m-%d %H:%M:%S.%f')
-                if expiration < datetime.utcnow():
-                    return jsonify({'message': 'Token expiré'}), 401
-                data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-        except jwt.ExpiredSignatureError:
-            return jsonify({'message': 'Token expiré'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'message': 'Token invalide'}), 401
+            erreur = validate_token(token, app.config['SECRET_KEY'])
+        except sqlite3.OperationalError as e:
+            return base_indisponible(e)
+        if erreur:
+            return jsonify({'message': erreur}), 401
         return f(*args, **kwargs)
     return decorated
 
-# Lecture du fichier JSON et chargement des données dans une variable.
-with open('test.json', 'r') as fichier:
-    data_list_reception_INRA_animov = json.load(fichier)
-              
+@app.route('/logout', methods=['POST'])
+@token_required
+def logout():
+    """
+    Révocation du token de l'utilisateur
+    ---
+    tags:
+      - Authentification
+    responses:
+      200:
+        description: Token révoqué
+      401:
+        description: Token manquant ou invalide
+      503:
+        description: Base d'authentification momentanément indisponible
+    """
+    try:
+        revoke_token(request.headers.get('x-access-tokens'))
+    except sqlite3.OperationalError as e:
+        return base_indisponible(e)
+    return jsonify({'message': 'Token révoqué'})
+
+# Moyenne et écart type (échantillon) d'une colonne, en ignorant les valeurs manquantes
+def moyenne_ecart_type(valeurs):
+    valeurs = np.asarray(valeurs, dtype=float)
+    valeurs = valeurs[~np.isnan(valeurs)]
+    moyenne = round(float(valeurs.mean()), 3) if len(valeurs) > 0 else np.nan
+    ecart_type = round(float(valeurs.std(ddof=1)), 3) if len(valeurs) > 1 else np.nan
+    return moyenne, ecart_type
+
 # Fonction pour calculer et envoyer les statistiques globales.
 def global_stats_data_animov_send(json_, sources):
     try:
         sources = sources.split(',')
     except:
-        sources = list(set([item["source_id"] for item in data_list_reception_INRA_animov]))
+        sources = frame_store.sources()
 
-    colonnes = ['count', 'couche', 'debout', 'mean_score', 'std_score', 'source_id']
-    df = pd.DataFrame(columns=colonnes)
+    # Regroupement des colonnes par source en une seule passe
+    colonnes = defaultdict(lambda: {'count': [], 'couche': [], 'debout': [], 'mean_score': [], 'std_score': []})
+    avec_stats = False
 
     if isinstance(json_, list):
         for item in json_:
             if isinstance(item, dict) and 'stats' in item:
+                avec_stats = True
+                stats = item['stats']
+                colonne = colonnes[item['source_id']]
+                colonne['count'].append(stats['count'])
+                colonne['couche'].append(stats['couche'])
+                colonne['debout'].append(stats['debout'])
                 try:
-                    nouvelle_ligne = {
-                        'count': item['stats']['count'],
-                        'couche': item['stats']['couche'],
-                        'debout': item['stats']['debout'],
-                        'mean_score': item['stats']['mean']['score'],
-                        'std_score': item['stats']['std']['score'],
-                        'source_id': item['source_id']
-                    }
+                    colonne['mean_score'].append(stats['mean']['score'])
+                    colonne['std_score'].append(stats['std']['score'])
                 except:
-                    nouvelle_ligne = {
-                        'count': item['stats']['count'],
-                        'couche': item['stats']['couche'],
-                        'debout': item['stats']['debout'],
-                        'mean_score': np.NaN,
-                        'std_score': np.NaN,
-                        'source_id': item['source_id']
-                    }
-                df = pd.concat([df, pd.DataFrame([nouvelle_ligne])], ignore_index=True)
-
-    df['count'] = pd.to_numeric(df['count'], errors='coerce')
-    df['couche'] = pd.to_numeric(df['couche'], errors='coerce')
-    df['debout'] = pd.to_numeric(df['debout'], errors='coerce')
+                    colonne['mean_score'].append(np.nan)
+                    colonne['std_score'].append(np.nan)
 
     lst = []
 
     for src in sources:
-        df_filter = df[df['source_id'] == int(src)]
-        df_filter = df_filter.describe()
+        colonne = colonnes.get(int(src), {'count': [], 'couche': [], 'debout': [], 'mean_score': [], 'std_score': []})
 
-        try:
-            _general_stats = {
-                'avg_count': df_filter['count'].iloc[1].round(3),
-                'std_count': df_filter['count'].iloc[2].round(3),
-                'avg_couche': df_filter['couche'].iloc[1].round(3),
-                'std_couche': df_filter['couche'].iloc[2].round(3),
-                'avg_debout': df_filter['debout'].iloc[1].round(3),
-                'std_debout': df_filter['debout'].iloc[2].round(3),
-                'avg_all_score': df_filter['mean_score'].iloc[1].round(3),
-                'std_mean_all_score': df_filter['std_score'].iloc[1].round(3),
-            }
-        except:
-            _general_stats = {
-                'avg_count': df_filter['count'].iloc[1].round(3),
-                'std_count': df_filter['count'].iloc[2].round(3),
-                'avg_couche': df_filter['couche'].iloc[1].round(3),
-                'std_couche': df_filter['couche'].iloc[2].round(3),
-                'avg_debout': df_filter['debout'].iloc[1].round(3),
-                'std_debout': df_filter['debout'].iloc[2].round(3),
-            }
+        _general_stats = {}
+        for nom in ['count', 'couche', 'debout']:
+            _general_stats[f'avg_{nom}'], _general_stats[f'std_{nom}'] = moyenne_ecart_type(colonne[nom])
+
+        if avec_stats:
+            _general_stats['avg_all_score'] = moyenne_ecart_type(colonne['mean_score'])[0]
+            _general_stats['std_mean_all_score'] = moyenne_ecart_type(colonne['std_score'])[0]
 
         lst.append({f'source_{src}': _general_stats})
 
     return lst
 
+# Cache des réponses encodées de /get_data_animov_ch, invalidé à chaque lot reçu
+data_animov_cache = ResponseCache(max_entries=64)
+
+# Cache des statistiques globales, valable jusqu'à la réception du prochain lot
+# (partagé par les threads du worker : protégé par un verrou)
+global_stats_cache = {}
+global_stats_lock = threading.Lock()
+
+def global_stats_data_animov_cached(json_, sources, with_stats):
+    cle = (frame_store.generation, sources, with_stats)
+    with global_stats_lock:
+        resultat = global_stats_cache.get(cle)
+    if resultat is None:
+        resultat = global_stats_data_animov_send(json_, sources)
+        with global_stats_lock:
+            generations = {ancienne[0] for ancienne in global_stats_cache}
+            if any(generation > cle[0] for generation in generations):
+                # Calculé sur un lot déjà remplacé : non conservé
+                return resultat
+            # Les entrées des lots précédents sont devenues inutiles
+            if any(generation != cle[0] for generation in generations):
+                global_stats_cache.clear()
+            global_stats_cache[cle] = resultat
+    return resultat
+
 # Fonction pour calculer les statistiques des données d'animation des cadres.
+# Le calcul est vectorisé sur toutes les frames de la requête (voir frame_stats.py).
 def stats_data_animov_frames(json_):
-    if isinstance(json_, list):
-        for item in json_:
-            if isinstance(item, dict) and 'detect' in item:
-                df = pd.DataFrame(item['detect'], columns=['id', 'x_min', 'y_min', 'x_max', 'y_max', 'score', 'classe', 'brush', 'eat', 'drink'])
-                count_classe_1 = df[df['classe'] == 0].shape[0]
-                count_classe_0 = df[df['classe'] == 1].shape[0]
-
-                df['x_min'] = df['x_min'].astype(int)
-                df['y_min'] = df['y_min'].astype(int)
-                df['x_max'] = df['x_max'].astype(int)
-                df['y_max'] = df['y_max'].astype(int)
-                df['score'] = df['score'].round(3)
-
-                df = df.drop(columns=['id', 'brush', 'eat', 'drink'])
-                df = df.describe()
-                df = df.transpose()
-                df['std'] = df['std'].round(3)
-                df['mean'] = df['mean'].round(3)
-                df['25%'] = df['25%'].round(3)
-                df['50%'] = df['50%'].round(3)
-                df['75%'] = df['75%'].round(3)
-                df['count'] = df['count'].astype(int)
-
-                if not df.empty:
-                    try:
-                        item['stats'] = df.to_dict()
-                        cnt = item['stats']['count']['classe']
-                        item['stats'].pop("count")
-                        item['stats']["count"] = cnt
-                        item['stats']["debout"] = count_classe_1
-                        item['stats']["couche"] = count_classe_0
-                    except:
-                        item['stats']["count"] = np.NaN
-                        item['stats']["debout"] = np.NaN
-                        item['stats']["couche"] = np.NaN
-
-    return json_
+    return stats_frames(json_)
 
 def stats_data_animov_frames_lite(json_):
     if isinstance(json_, list):
@@ -243,47 +263,18 @@ def stats_data_animov_frames_lite(json_):
 
 # Fonction pour filtrer les données en fonction des sources spécifiées.
 def filter_data_anomov(sources):
-    global data_list_reception_INRA_animov
     try:
         sources = sources.split(',')
     except:
-        sources = list(set([item["source_id"] for item in data_list_reception_INRA_animov]))
-
-    filtered_data = []
+        sources = None
 
-    for src in sources:
-        for data in data_list_reception_INRA_animov:
-            if sources is not None and data.get('source_id') != int(src):
-                continue
-            filtered_data.append(data)
-
-    return filtered_data
+    return frame_store.latest(sources)
 
 # Fonction pour obtenir la minute actuelle à partir d'un timestamp
 def get_minute(timestamp):
     date_from_timestamp = datetime.fromtimestamp(timestamp)
     return date_from_timestamp.minute
 
-# Initialisation d'un dictionnaire pour stocker les agrégations
-dict_resultat = defaultdict(lambda: {
-                                        'total': 0, 
-                                        'couche': 0, 
-                                        'debout': 0, 
-                                        'nb_frames': 0, 
-                                        'max_total' : 0,
-                                        'max_couche' : 0,
-                                        'max_debout' : 0,
-                                        'min_total' : 10000,
-                                        'min_couche' : 10000,
-                                        'min_debout' : 10000,
-                                        'std_total' : 0,
-                                        'std_couche' : 0,
-                                        'std_debout' : 0,
-                                    })
-
-# Variable pour garder la trace de la dernière minute traitée
-last_minute = None
-
 lst_dict_resultat = []
 
 database = None
@@ -295,11 +286,84 @@ with open("config.yaml", "r") as file:
     app.config['SECRET_KEY'] = config["SECRET_KEY"]
     database = config['database']["database_name"]
 
+# Stockage des dernières frames reçues, indexé par source
+history_size = (config.get('frame_store') or {}).get('history_size', 10)
+frame_store = FrameStore(history_size=history_size)
+
+# État d'ingestion (lots, minute en cours) partagé entre les workers ; le
+# FrameStore de ce processus en est une copie mise à jour par ingest_sync.
+# Pool de connexions : une par thread de requête du processus, plus celle du Synchroniseur.
+ingest_state_config = config.get('ingest_state') or {}
+serveur_config = config.get('serveur') or {}
+threads_requetes = threads_par_processus(serveur_config.get('workers'), serveur_config.get('threads', 8))
+ingest_state = IngestState(ingest_state_config.get('database', 'ingest_state.db'),
+                           history_size=history_size, dumps=app.json.dumps, loads=app.json.loads,
+                           pool_size=threads_requetes + 1)
+
+# État d'ingestion saturé pendant une requête (lot, image, lecture) : 503 plutôt que 500
+@app.errorhandler(sqlite3.OperationalError)
+def etat_indisponible(erreur):
+    return base_indisponible(erreur)
+
+# Lecture du fichier JSON et chargement des données initiales (état vide uniquement).
+with ingest_state.transaction() as etat:
+    if etat.generation == 0:
+        with open('test.json', 'r') as fichier:
+            etat.ajouter_lot(json.load(fichier))
+
+ingest_sync = Synchroniseur(ingest_state, frame_store,
+                            on_lot=lambda frames: publier_lot(frames),
+                            on_image=lambda source_id: publier_image(source_id),
+                            on_minute=lambda evenement: event_broker.publish('minute', evenement),
+                            interval=ingest_state_config.get('sync_interval', 0.2))
+
+# Événements diffusés aux clients de /stream (lots reçus, minutes clôturées)
+# Chaque client occupe un thread : par défaut, deux threads restent libres pour les autres requêtes.
+stream_config = config.get('stream') or {}
+event_broker = EventBroker(max_queue=stream_config.get('max_queue', 100),
+                           keepalive=stream_config.get('keepalive', 15.0),
+                           dumps=app.json.dumps,
+                           max_subscribers=stream_config.get('max_subscribers', max(threads_requetes - 2, 1)))
+
+# Compression des réponses volumineuses (gzip, ou br si brotli est installé)
+compression_config = config.get('compression') or {}
+install_compression(app,
+                    seuil=compression_config.get('min_size', 1024),
+                    niveau_gzip=compression_config.get('gzip_level', 6),
+                    qualite_brotli=compression_config.get('brotli_quality', 4))
+
 # Classe pour la gestion de la base de données
 class DatabaseManager:
     def __init__(self):
         self.engine = sqlalchemy.create_engine(self.connection())
 
+        # Requêtes d'insertion construites une seule fois sur les tables du registre
+        self.insert_stat_minutes = schema.table_chevres_minute_serveur_v2.insert()
+        self.insert_stat_hours = schema.table_chevres_minute_serveur.insert()
+
+        self.schema_ready = False
+        self.rollups_ready = False
+        self.ensure_schema()
+
+    def ensure_schema(self):
+        # Création des tables une seule fois ; si MySQL n'est pas joignable au
+        # démarrage, nouvel essai lors de la prochaine écriture.
+        if self.schema_ready:
+            return
+        try:
+            schema.bootstrap_schema(self.engine)
+            self.schema_ready = True
+        except sqlalchemy.exc.SQLAlchemyError as e:
+            logging.error(f"Initialisation du schéma impossible : {e}")
+            return
+
+        # Tables de cumul de /chevres_heures et /chevres_minutes ; à défaut
+        # (droits TRIGGER manquants...), les requêtes agrègent les tables sources.
+        try:
+            self.rollups_ready = schema.bootstrap_rollups(self.engine)
+        except sqlalchemy.exc.SQLAlchemyError as e:
+            logging.error(f"Initialisation des tables de cumul impossible : {e}")
+
     def connection(self):
         with open('config.yaml', 'r') as file:
             config = yaml.safe_load(file)
@@ -339,77 +403,67 @@ class DatabaseManager:
 
         return df
 
-    def query_get_chevres_heure(self):
-        sql_query = f"""
-        SELECT jour, source, heure, avg(brush) as brush, avg(drink) as drink, avg(eat) as eat, avg(class_0) as class_0, avg(class_1) as class_1
-        FROM {database}.table_chevres_heures 
-        group by jour, source, heure
-        """
+    @staticmethod
+    def filtre_jours(start=None, end=None):
+        # Plage de jours [start, end] (dates incluses) en paramètres liés
+        conditions, params = [], {}
+        if start is not None:
+            conditions.append("jour >= :start")
+            params['start'] = start
+        if end is not None:
+            conditions.append("jour < :end")
+            params['end'] = end + timedelta(days=1)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return where, params
+
+    def query_chevres_rollup(self, table_source, cles, start=None, end=None):
+        self.ensure_schema()
+        where, params = self.filtre_jours(start, end)
+        colonnes = ', '.join(cles)
+
+        if self.rollups_ready:
+            rollup = schema.ROLLUPS[table_source][0].name
+            moyennes = ', '.join(f"somme_{c} / nb as {c}" for c in schema.COLONNES_ACTIVITE)
+            sql_query = f"""
+            SELECT {colonnes}, {moyennes}
+            FROM {database}.{rollup}
+            {where}
+            ORDER BY {', '.join(schema.ROLLUPS[table_source][1])}
+            """
+        else:
+            moyennes = ', '.join(f"avg({c}) as {c}" for c in schema.COLONNES_ACTIVITE)
+            sql_query = f"""
+            SELECT {colonnes}, {moyennes}
+            FROM {database}.{table_source}
+            {where}
+            group by {colonnes}
+            """
         with self.engine.connect() as connection:
-            df = pd.read_sql(sql_query, connection)
+            df = pd.read_sql(text(sql_query), connection, params=params)
         return df
 
-    def query_get_chevres_minutes(self):
-        sql_query = f"""
-        SELECT jour, source, minutes, heure, avg(brush) as brush, avg(drink) as drink, avg(eat) as eat, avg(class_0) as class_0, avg(class_1) as class_1
-        FROM {database}.table_chevres_minute 
-        group by jour, source, minutes, heure
-        """
-        with self.engine.connect() as connection:
-            df = pd.read_sql(sql_query, connection)
-        return df
+    def query_get_chevres_heure(self, start=None, end=None):
+        return self.query_chevres_rollup('table_chevres_heures', ['jour', 'source', 'heure'], start, end)
+
+    def query_get_chevres_minutes(self, start=None, end=None):
+        return self.query_chevres_rollup('table_chevres_minute', ['jour', 'source', 'minutes', 'heure'], start, end)
     
     def query_set_stat_minutes(self, data):
+        self.query_set_stat_minutes_batch([self.build_stat_minutes_row(data)])
 
-        metadata = MetaData()
-
-        ma_table_stats = Table('table_chevres_minute_serveur_v2', metadata,
-            Column('id', Integer, primary_key=True, autoincrement=True),
-            Column('timestamp', BigInteger, nullable=False),
-            Column('source', Integer, nullable=False),
-            Column('total', Integer, nullable=False),
-            Column('couche', Integer, nullable=False),
-            Column('debout', Integer, nullable=False),
-
-            Column('max_total', Integer, nullable=False),
-            Column('max_couche', Integer, nullable=False),
-            Column('max_debout', Integer, nullable=False),
-
-            Column('min_total', Integer, nullable=False),
-            Column('min_couche', Integer, nullable=False),
-            Column('min_debout', Integer, nullable=False),
-
-            Column('std_total', DECIMAL(6, 3), nullable=False),
-            Column('std_couche', DECIMAL(6, 3), nullable=False),
-            Column('std_debout', DECIMAL(6, 3), nullable=False),
-
-            Column('Q1_total', Integer, nullable=False),
-            Column('Q1_couche', Integer, nullable=False),
-            Column('Q1_debout', Integer, nullable=False),
-
-            Column('Q2_total', Integer, nullable=False),
-            Column('Q2_couche', Integer, nullable=False),
-            Column('Q2_debout', Integer, nullable=False),
-
-            Column('Q3_total', Integer, nullable=False),
-            Column('Q3_couche', Integer, nullable=False),
-            Column('Q3_debout', Integer, nullable=False),
-
-            Column('mode_total', Text, nullable=True),
-            Column('mode_couche', Text, nullable=True),
-            Column('mode_debout', Text, nullable=True),
-
-            Column('nb_frames', Integer, nullable=False)
-        )
+    def query_set_stat_minutes_batch(self, rows):
+        self.ensure_schema()
 
-        Index('idx_timestamp', ma_table_stats.c.timestamp)
-        Index('idx_source', ma_table_stats.c.source)
-
-        metadata.create_all(self.engine)
+        # Insertion de toutes les lignes en attente en un seul executemany
+        with self.engine.connect() as connection:
+            connection.execute(self.insert_stat_minutes, rows)
+            connection.commit()
+            print(f"Send data minutes {len(rows)} lignes !!!")
 
+    def build_stat_minutes_row(self, data):
         timestamp_entier = int(data['timestamp'])
 
-        insert_data = {
+        return {
             'timestamp': timestamp_entier,
             'source': data['source'],
             'total': data['result']['total'],
@@ -447,30 +501,9 @@ class DatabaseManager:
             'nb_frames': data['result']['nb_frames']
         }
 
-        with self.engine.connect() as connection:
-            connection.execute(ma_table_stats.insert(), insert_data)
-            connection.commit()
-            print(f"Send data minutes source {data['source']}!!!")
-
     
     def query_set_stat_hours(self, data):
-        
-        metadata = MetaData()
-
-        ma_table_stats = Table('table_chevres_minute_serveur', metadata,
-            Column('id', Integer, primary_key=True, autoincrement=True),
-            Column('timestamp', BigInteger, nullable=False),
-            Column('source', Integer, nullable=False),
-            Column('total', Integer, nullable=False),
-            Column('couche', Integer, nullable=False),
-            Column('debout', Integer, nullable=False),
-            Column('nb_frames', Integer, nullable=False)
-        )
-
-        Index('idx_timestamp', ma_table_stats.c.timestamp)
-        Index('idx_source', ma_table_stats.c.source)
-
-        metadata.create_all(self.engine)
+        self.ensure_schema()
 
         timestamp_entier = int(data['timestamp'])
 
@@ -484,7 +517,7 @@ class DatabaseManager:
         }
 
         with self.engine.connect() as connection:
-            connection.execute(ma_table_stats.insert(), insert_data)
+            connection.execute(self.insert_stat_hours, insert_data)
             connection.commit()
             print(f"Send data minutes source {data['source']}!!!")
 
@@ -497,177 +530,207 @@ class DatabaseManager:
         return df
     
     def query_get_stats_heure(self):
+        # Appelée par stats_heure_job, une fois par période : en cas d'échec
+        # l'exception remonte et le job garde le dernier résultat consolidé.
         sql_query_procedure = text("CALL `ANIMOV`.`ConsoliderResultatsEcartType`();")
-        try:
-            with self.engine.begin() as conn:
-                conn.execute(sql_query_procedure)
-        except Exception as e:
-            print(f"Erreur lors de l'exécution de la procédure stockée: {e}")
-            return pd.DataFrame()
+        with self.engine.begin() as conn:
+            conn.execute(sql_query_procedure)
         
+        return self.query_read_stats_heure()
+
+    def query_read_stats_heure(self):
+        # Lecture seule du résultat de la dernière consolidation (faite par un autre worker)
         sql_query_results = "SELECT * FROM `ANIMOV`.`ResultatsConsolides`;"
-        df = pd.read_sql(sql_query_results, self.engine)
-        
-        return df
+        return pd.read_sql(sql_query_results, self.engine)
     
-    def query_get_serie_jour(self):
-        sql_query = """
-        select * from ANIMOV.vue_chevres_serie_jour
+    def query_get_serie(self, vue, sources=None, start=None, end=None, limit=None):
+        # Les vues des séries sont de simples filtres sur table_chevres_minute_serveur_v2 :
+        # MySQL fusionne ces conditions avec celles de la vue et utilise l'index (source, timestamp).
+        conditions, params = [], {}
+        if sources:
+            conditions.append("source IN :sources")
+            params['sources'] = list(sources)
+        if start is not None:
+            conditions.append("timestamp >= :start")
+            params['start'] = start
+        if end is not None:
+            conditions.append("timestamp <= :end")
+            params['end'] = end
+        where = f"where {' and '.join(conditions)}" if conditions else ""
+
+        sql_query = f"""
+        select * from ANIMOV.{vue} {where}
         """
+        if limit is not None:
+            # Les `limit` points les plus récents
+            sql_query += " order by timestamp desc limit :limit"
+            params['limit'] = limit
+
+        query = text(sql_query)
+        if sources:
+            query = query.bindparams(bindparam('sources', expanding=True))
+
         with self.engine.connect() as connection:
-            df = pd.read_sql(sql_query, connection)
+            df = pd.read_sql(query, connection, params=params)
+        if limit is not None:
+            df = df.sort_values('timestamp', kind='stable').reset_index(drop=True)
         return df
+
+    def query_get_serie_jour(self, **filtres):
+        return self.query_get_serie('vue_chevres_serie_jour', **filtres)
     
-    def query_get_serie_heure(self):
-        sql_query = """
-        select * from ANIMOV.vue_chevres_serie_heure
-        """
-        with self.engine.connect() as connection:
-            df = pd.read_sql(sql_query, connection)
-        return df
+    def query_get_serie_heure(self, **filtres):
+        return self.query_get_serie('vue_chevres_serie_heure', **filtres)
     
-    def query_get_serie_last_jour(self):
-        sql_query = """
-        select * from ANIMOV.vue_chevre_derniere_jour_last
-        """
-        with self.engine.connect() as connection:
-            df = pd.read_sql(sql_query, connection)
-        return df
+    def query_get_serie_last_jour(self, **filtres):
+        return self.query_get_serie('vue_chevre_derniere_jour_last', **filtres)
     
-    def query_get_serie_last_heure(self):
-        sql_query = """
-        select * from ANIMOV.vue_chevre_derniere_heure_last
-        """
-        with self.engine.connect() as connection:
-            df = pd.read_sql(sql_query, connection)
-        return df
+    def query_get_serie_last_heure(self, **filtres):
+        return self.query_get_serie('vue_chevre_derniere_heure_last', **filtres)
 
 db_manager = DatabaseManager()
 
+# Registre des sources valides : base de données, sinon liste de config.yaml
+source_registry = SourceRegistry()
+source_registry.load(lambda: db_manager.query_get_sources()['source'].tolist(),
+                     sources_defaut=config.get('sources', [1, 2, 3, 4]))
+for source_id in frame_store.sources():
+    source_registry.add(source_id)
+
+# File d'écriture différée des statistiques par minute : les insertions MySQL
+# sont faites par un thread de fond, hors du thread de la requête HTTP.
+write_behind_config = config.get('write_behind') or {}
+stats_minute_writer = WriteBehindQueue(
+    db_manager.query_set_stat_minutes_batch,
+    max_rows=write_behind_config.get('max_rows', 10000),
+    flush_interval=write_behind_config.get('flush_interval', 1.0),
+    max_retry_delay=write_behind_config.get('max_retry_delay', 60.0),
+    retry_on=(sqlalchemy.exc.OperationalError, sqlalchemy.exc.InterfaceError),
+    name='stats-minute-writer',
+).start()
+atexit.register(stats_minute_writer.close)
+
+# Une seule consolidation à la fois pour tous les workers (et toutes les instances de l'API) :
+# verrou nommé MySQL, libéré par MySQL si le processus qui le détient s'arrête.
+stats_heure_config = config.get('stats_heure') or {}
+
+@contextmanager
+def verrou_consolidation():
+    with db_manager.engine.connect() as connection, \
+            schema.verrou_nomme(connection, 'animov_consolidation', stats_heure_config.get('lock_timeout', 60)) as obtenu:
+        yield obtenu
+
+# Consolidation des statistiques horaires (/stats_heure) par un thread de fond ; la génération
+# et la date de consolidation sont partagées par les workers (état d'ingestion).
+stats_heure_job = ConsolidationJob(
+    db_manager.query_get_stats_heure,
+    interval=stats_heure_config.get('interval', 3600),
+    name='stats-heure',
+    load_fn=db_manager.query_read_stats_heure,
+    partage=ingest_state,
+    verrou=verrou_consolidation,
+).start()
+
 # Définition d'une route Flask '/receive_data_animov' avec la méthode POST.
 @app.route('/receive_data_animov', methods=['POST'])
 def receive_data_animov():
    
-    global data_list_reception_INRA_animov  # Référence à la variable globale.
-    global last_minute, lst_dict_resultat
+    global lst_dict_resultat
 
     timestamp = datetime.now().isoformat()
     data_list_reception_INRA_animov = request.json
+    lignes_minute = []
 
-    for frm in data_list_reception_INRA_animov:
-        if 'date' in frm:
-            datehour = datetime.strptime(frm['date'][0], "%Y-%m-%d %H:%M:%S.%f")
-            timestamp = datehour.timestamp()
+    # Lot et minute en cours traités dans une transaction de l'état partagé :
+    # un seul worker à la fois, chaque minute n'est clôturée qu'une fois.
+    with ingest_state.transaction() as etat:
+        etat.ajouter_lot(data_list_reception_INRA_animov)
 
-            current_minute = get_minute(timestamp)
+        for frm in data_list_reception_INRA_animov:
+            if 'date' in frm:
+                datehour = datetime.strptime(frm['date'][0], "%Y-%m-%d %H:%M:%S.%f")
+                timestamp = datehour.timestamp()
 
-            id = frm['source_id']
-            smm = sum(int(chv[6]) for chv in frm['detect'])
-            total = len(frm['detect'])
-            
-            if 'lst_totals' not in dict_resultat[id]:
-                dict_resultat[id]['lst_totals'] = []
-            if 'lst_couches' not in dict_resultat[id]:
-                dict_resultat[id]['lst_couches'] = []
-            if 'lst_debouts' not in dict_resultat[id]:
-                dict_resultat[id]['lst_debouts'] = []
-
-            dict_resultat[id]['lst_totals'].append(total)
-            dict_resultat[id]['lst_couches'].append(smm)
-            dict_resultat[id]['lst_debouts'].append(total - smm)
-
-            if last_minute is not None and current_minute != last_minute:    
-                for key in dict_resultat.keys():
-                    
-                    try:
-                        ecart_type_total = statistics.stdev(dict_resultat[key]['lst_totals'])
-                        ecart_type_couche = statistics.stdev(dict_resultat[key]['lst_couches'])
-                        ecart_type_debout = statistics.stdev(dict_resultat[key]['lst_debouts'])
-                        quartiles_total = statistics.quantiles(dict_resultat[key]['lst_totals'], n=4, method='inclusive')
-                        quartiles_couche = statistics.quantiles(dict_resultat[key]['lst_couches'], n=4, method='inclusive')
-                        quartiles_debout = statistics.quantiles(dict_resultat[key]['lst_debouts'], n=4, method='inclusive')
-                        mode_total = statistics.multimode(dict_resultat[key]['lst_totals'])
-                        mode_couche = statistics.multimode(dict_resultat[key]['lst_couches'])
-                        mode_debout = statistics.multimode(dict_resultat[key]['lst_debouts'])
-                    except:
-                        ecart_type_total = 0
-                        ecart_type_couche = 0
-                        ecart_type_debout = 0
-                        quartiles_total = [0, 0, 0]
-                        quartiles_couche = [0, 0, 0]
-                        quartiles_debout = [0, 0, 0]
-                        mode_total = None
-                        mode_couche = None
-                        mode_debout = None
-
-                        if 'lst_totals' not in dict_resultat[id]:
-                            dict_resultat[id]['lst_totals'] = []
-                        if 'lst_couches' not in dict_resultat[id]:
-                            dict_resultat[id]['lst_couches'] = []
-                        if 'lst_debouts' not in dict_resultat[id]:
-                            dict_resultat[id]['lst_debouts'] = []
-
-                    print(ecart_type_total, ecart_type_couche, ecart_type_debout)
-
-                    dict_resultat[key]['std_total'] = ecart_type_total
-                    dict_resultat[key]['std_couche'] = ecart_type_couche
-                    dict_resultat[key]['std_debout'] = ecart_type_debout
-
-                    dict_resultat[key]['quartiles_total'] = quartiles_total
-                    dict_resultat[key]['quartiles_couche'] = quartiles_couche
-                    dict_resultat[key]['quartiles_debout'] = quartiles_debout
-
-                    dict_resultat[key]['mode_total'] = mode_total
-                    dict_resultat[key]['mode_couche'] = mode_couche
-                    dict_resultat[key]['mode_debout'] = mode_debout
-                         
-                    db_manager.query_set_stat_minutes({'timestamp':timestamp, 'source': key, 'result':dict_resultat[key]})
-                    
-                    print()
-
-                    dict_resultat[key]['lst_totals'] = []
-                    dict_resultat[key]['lst_couches'] = []
-                    dict_resultat[key]['lst_debouts'] = []
-
-                    dict_resultat[key] = {
-                                            'total': 0, 
-                                            'couche': 0, 
-                                            'debout': 0, 
-                                            'nb_frames': 0, 
-                                            'max_total' : 0,
-                                            'max_couche' : 0,
-                                            'max_debout' : 0,
-                                            'min_total' : 10000,
-                                            'min_couche' : 10000,
-                                            'min_debout' : 10000,
-                                            'std_total' : 0,
-                                            'std_couche' : 0,
-                                            'std_debout' : 0,
-                                          }
-
-            dict_resultat[id]['total'] += total
-            dict_resultat[id]['couche'] += smm
-            dict_resultat[id]['debout'] += total - smm
-            dict_resultat[id]['nb_frames'] += 1
-            dict_resultat[id]['max_total'] = max(dict_resultat[id]['max_total'], total)
-            dict_resultat[id]['max_couche'] = max(dict_resultat[id]['max_couche'], smm)
-            dict_resultat[id]['max_debout'] = max(dict_resultat[id]['max_debout'], total - smm)
-            dict_resultat[id]['min_total'] = min(dict_resultat[id]['min_total'], total)
-            dict_resultat[id]['min_couche'] = min(dict_resultat[id]['min_couche'], smm)
-            dict_resultat[id]['min_debout'] = min(dict_resultat[id]['min_debout'], total - smm)
-            
-            last_minute = current_minute
+                current_minute = get_minute(timestamp)
 
-        else:
-            print("Champ 'timestamp' manquant dans l'un des éléments de la liste.")
-            # Gestion d'erreur ou logique alternative ici
+                id = frm['source_id']
+                source_registry.add(id)
+                smm = sum(int(chv[6]) for chv in frm['detect'])
+                total = len(frm['detect'])
+
+                # Changement de minute : envoi des statistiques de chaque source
+                # puis remise à zéro des accumulateurs.
+                if etat.last_minute is not None and current_minute != etat.last_minute:
+                    resultats_minute = etat.cloturer_minute()
+                    for key, resultat in resultats_minute.items():
+                        print(resultat['std_total'], resultat['std_couche'], resultat['std_debout'])
+
+                        lignes_minute.append(db_manager.build_stat_minutes_row({'timestamp':timestamp, 'source': key, 'result':resultat}))
+
+                    etat.publier_minute({'timestamp': timestamp, 'minute': etat.last_minute, 'sources': resultats_minute})
+
+                etat.add_frame(id, total, smm)
+
+                etat.last_minute = current_minute
+
+            else:
+                print("Champ 'timestamp' manquant dans l'un des éléments de la liste.")
+                # Gestion d'erreur ou logique alternative ici
+
+    # Envoi en base après validation de la transaction
+    for ligne in lignes_minute:
+        stats_minute_writer.put(ligne)
+
+    ingest_sync.synchroniser()
 
     return f'Reçu {timestamp}!!'
 
+# Événement 'frames' de /stream : statistiques de la dernière frame de chaque
+# source du lot (mêmes champs que with_stats=Lite) et image disponible.
+def evenement_frames(batch):
+    sources = {}
+    for frm in batch:
+        if not isinstance(frm, dict) or 'source_id' not in frm:
+            continue
+        source = {'frame_id': frm.get('frame_id'), 'date': FrameStore._date_key(frm)}
+        detect = frm.get('detect') or []
+        if detect:
+            debout = sum(1 for chv in detect if chv[6] == 0)
+            couche = sum(1 for chv in detect if chv[6] == 1)
+            source['stats'] = {'count': debout + couche, 'debout': debout, 'couche': couche}
+        sources[frm['source_id']] = source
+
+    for source_id, source in sources.items():
+        image = frame_store.image(source_id)
+        if image is not None:
+            source['frame_url'] = f'/frames/{source_id}'
+            source['etag'] = image['etag']
+
+    return {'generation': frame_store.generation, 'sources': sources}
+
+# Diffusion aux clients de /stream des lots et images reçus par n'importe quel worker
+def publier_lot(frames):
+    for frm in frames:
+        if isinstance(frm, dict) and 'source_id' in frm:
+            source_registry.add(frm['source_id'])
+    if event_broker.subscribers():
+        event_broker.publish('frames', evenement_frames(frames))
+
+def publier_image(source_id):
+    source_registry.add(source_id)
+    image = frame_store.image(source_id)
+    event_broker.publish('frames', {'generation': frame_store.generation,
+                                    'sources': {source_id: {'frame_id': image['frame_id'],
+                                                            'frame_url': f'/frames/{source_id}',
+                                                            'etag': image['etag']}}})
+
+# Synchronisation périodique avec les lots reçus par les autres workers
+ingest_sync.start()
+
 @app.route('/get_data_animov_ch_minutes', methods=['GET'])
 @token_required
 def get_data_animov_ch_minutes():
-    global data_list_reception_INRA_animov
+    pass
 
 # Définition d'une route Flask pour obtenir des données spécifiques avec la méthode HTTP GET.
 @app.route('/get_data_animov_ch', methods=['GET'])
@@ -679,6 +742,8 @@ Exemple d'endpoint qui renvoie des données détaillées sur les activités avec
 tags:
   - Activités
 responses:
+  304:
+    description: Aucun lot reçu depuis la réponse identifiée par If-None-Match / If-Modified-Since.
   200:
     description: Une liste de données d'activités avec des scores et des statistiques détaillées.
     content: 
@@ -1019,8 +1084,6 @@ responses:
                         example: 237.496
 """
 
-    global data_list_reception_INRA_animov  # Référence à la variable globale pour les données.
-
     required_params = ['sources', 'with_images', 'with_detect', 'with_stats', 'with_global_stats']
     params_present = all(param in request.args for param in required_params)
 
@@ -1030,7 +1093,7 @@ responses:
         pass
 
     valid_values = {
-        'with_images': ['True', 'False','Single'],
+        'with_images': ['True', 'False','Single', 'Ref'],
         'with_detect': ['True', 'False'],
         'with_stats': ['True', 'False', 'Lite'],
         'with_global_stats': ['True', 'False']
@@ -1043,41 +1106,55 @@ responses:
         if param in request.args and request.args[param] not in values:
             return jsonify({'error': f'La valeur du paramètre {param} est invalide'}), 400
         
-    sources_possibles = ['1', '2', '3', '4']
-    all_permutations = []
-    for r in range(1, len(sources_possibles) + 1):
-        for perm in permutations(sources_possibles, r):
-            all_permutations.append(perm)
-    all_permutations_strings = [','.join(perm) for perm in all_permutations]
-
     try:
-        sources_list = request.args.get('sources')
-        numbers_list = [int(num) for num in sources_list.split(',')]
-        numbers_list = sorted(numbers_list)
-        numbers_list = list(set(numbers_list))
-        sorted_permutations = ','.join([str(num) for num in numbers_list])
-
-        if sorted_permutations not in all_permutations_strings:
-            return jsonify({'error': 'La requête ne contient aucune combinaison valide de sources'}), 400
+        numbers_list = source_registry.parse(request.args.get('sources'))
     except:
         return jsonify({'error': "Le champs sources de la requête n'est la valide"}), 400
+
+    if source_registry.inconnues(numbers_list):
+        return jsonify({'error': 'La requête ne contient aucune combinaison valide de sources'}), 400
+
+    sources_normalisees = ','.join([str(num) for num in numbers_list])
+
+    # Réponse déjà calculée pour ces paramètres depuis la réception du dernier lot
+    cle = (sources_normalisees,) + tuple(request.args.get(param) for param in required_params[1:])
+    generation, date = frame_store.version()
+
+    # Aucun lot reçu depuis la réponse que possède le client : 304 sans corps
+    etag_ = etag('data_animov_ch', ingest_state.instance, cle, generation)
+    inchangee = non_modifie(etag_, date)
+    if inchangee is not None:
+        return inchangee
+
+    corps = data_animov_cache.get(cle, generation)
+    if corps is not None:
+        return app.response_class(corps, status=200, mimetype='application/json',
+                                  headers=validateurs(etag_, date))
+
+    reponse, status = construire_data_animov_ch(sources_normalisees, request.args)
+    if status == 200:
+        data_animov_cache.put(cle, generation, reponse.get_data())
+        reponse.headers.update(validateurs(etag_, date))
+    return reponse, status
+
+# Construction de la réponse de /get_data_animov_ch à partir des dernières frames reçues.
+def construire_data_animov_ch(sources, params):
+    json_ = filter_data_anomov(sources)
     
-    json_ = filter_data_anomov(sorted_permutations)
-    
-    if request.args.get('with_stats')=='Lite':
+    if params.get('with_stats')=='Lite':
         json_ = stats_data_animov_frames_lite(json_)
-    elif request.args.get('with_stats')=='True':   
+    elif params.get('with_stats')=='True':   
         json_ = stats_data_animov_frames(json_)
     
-    if request.args.get('with_global_stats') == 'True':
-        json_g_stats = global_stats_data_animov_send(json_, sorted_permutations)
+    if params.get('with_global_stats') == 'True':
+        json_g_stats = global_stats_data_animov_cached(json_, sources, params.get('with_stats'))
 
-    if request.args.get('with_stats') == 'False':
+    if params.get('with_stats') == 'False':
         for entry in json_:
             if "stats" in entry:
                 del entry["stats"]
 
-    if request.args.get('with_images') != 'True' and request.args.get('with_images') != 'Single':
+    if params.get('with_images') != 'True' and params.get('with_images') != 'Single':
         for entry in json_:
             if "frame" in entry:
                 del entry["frame"]
@@ -1099,7 +1176,7 @@ responses:
             if json_data == {}:
                 json_.remove(json_data)
         try:
-            if request.args.get('with_images') == 'Single' :
+            if params.get('with_images') == 'Single' :
                 filtered_data = {}
                 for entry in json_:
                     try:
@@ -1111,10 +1188,23 @@ responses:
             return jsonify({'erreur':'error !!!!' , 'json':json_}), 200 
             pass
     
+    if params.get('with_images') == 'Ref':
+        # Une entrée par source ; l'image est servie en binaire par /frames/<source_id>
+        filtered_data = {}
+        for entry in json_:
+            if 'source_id' in entry:
+                filtered_data[entry['source_id']] = entry
+        json_ = list(filtered_data.values())
+        for entry in json_:
+            image = frame_store.image(entry['source_id'])
+            if image is not None:
+                entry['frame_url'] = f"/frames/{entry['source_id']}"
+                entry['frame_etag'] = image['etag']
+
     current_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     
     try:
-        if request.args.get('with_images') == 'False' and request.args.get('with_stats') == 'False' and request.args.get('with_detect') == 'False':
+        if params.get('with_images') == 'False' and params.get('with_stats') == 'False' and params.get('with_detect') == 'False':
             del entry["data"]
     except:
         try:
@@ -1130,15 +1220,232 @@ responses:
         except:
             return jsonify({"data": json_, '_send_date': current_date}), 200 
 
+@app.route('/get_data_animov_ch_history', methods=['GET'])
+@token_required
+def get_data_animov_ch_history():
+    """
+    Exemple d'endpoint qui renvoie les derniers lots de frames reçus pour une source.
+    ---
+    tags:
+      - Activités
+    parameters:
+      - name: source
+        in: query
+        type: integer
+        required: true
+      - name: n
+        in: query
+        type: integer
+        required: false
+        description: Nombre de lots à renvoyer (par défaut tout l'historique conservé).
+      - name: with_images
+        in: query
+        type: string
+        required: false
+        default: "False"
+    responses:
+      200:
+        description: Liste des lots, du plus ancien au plus récent.
+      400:
+        description: Paramètres invalides.
+    """
+    source = request.args.get('source', type=int)
+    n = request.args.get('n', default=None, type=int)
+
+    if source is None:
+        return jsonify({'error': "Le paramètre source est manquant ou invalide"}), 400
+
+    lots = frame_store.recent(source, n)
+
+    if request.args.get('with_images', 'False') != 'True':
+        for lot in lots:
+            for entry in lot:
+                entry.pop('frame', None)
+
+    current_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return jsonify({'data': lots, '_send_date': current_date}), 200
+
+# Réponse binaire d'une image JPEG, avec ETag et réponse 304 si inchangée
+def reponse_image(image):
+    response = app.response_class(image['jpeg'], mimetype='image/jpeg')
+    response.set_etag(image['etag'])
+    response.headers['Cache-Control'] = 'no-cache'
+    if image['frame_id'] is not None:
+        response.headers['X-Frame-Id'] = str(image['frame_id'])
+    return response.make_conditional(request)
+
+@app.route('/frames/<int:source_id>', methods=['GET'])
+@token_required
+def get_frame(source_id):
+    """
+    Exemple d'endpoint qui renvoie la dernière image JPEG d'une source.
+    ---
+    tags:
+      - Images
+    produces:
+      - image/jpeg
+    parameters:
+      - name: source_id
+        in: path
+        type: integer
+        required: true
+      - name: If-None-Match
+        in: header
+        type: string
+        required: false
+    responses:
+      200:
+        description: Dernière image de la source (octets JPEG).
+      304:
+        description: L'image n'a pas changé depuis l'ETag fourni.
+      404:
+        description: Aucune image pour cette source.
+    """
+    image = frame_store.image(source_id)
+    if image is None:
+        return jsonify({'error': f'Aucune image pour la source {source_id}'}), 404
+    return reponse_image(image)
+
+@app.route('/frames', methods=['GET'])
+@token_required
+def get_frames():
+    """
+    Exemple d'endpoint qui renvoie les dernières images de plusieurs sources (multipart/mixed).
+    ---
+    tags:
+      - Images
+    parameters:
+      - name: sources
+        in: query
+        type: string
+        required: true
+        example: "1,2,3,4"
+    responses:
+      200:
+        description: Une partie image/jpeg par source (en-têtes X-Source-Id et ETag).
+      400:
+        description: Le champ sources est invalide.
+    """
+    try:
+        sources = source_registry.parse(request.args.get('sources'))
+    except:
+        return jsonify({'error': "Le champs sources de la requête n'est la valide"}), 400
+
+    boundary = 'frame-animov'
+    parties = []
+    for source_id in sources:
+        image = frame_store.image(source_id)
+        if image is None:
+            continue
+        entete = (f'--{boundary}\r\n'
+                  f'Content-Type: image/jpeg\r\n'
+                  f'X-Source-Id: {source_id}\r\n'
+                  f'ETag: "{image["etag"]}"\r\n'
+                  f'Content-Length: {len(image["jpeg"])}\r\n\r\n')
+        parties.append(entete.encode('ascii') + image['jpeg'] + b'\r\n')
+    parties.append(f'--{boundary}--\r\n'.encode('ascii'))
+
+    return app.response_class(b''.join(parties), mimetype=f'multipart/mixed; boundary={boundary}')
+
+@app.route('/frames/<int:source_id>', methods=['POST'])
+def receive_frame(source_id):
+    """
+    Réception d'une image JPEG brute (corps de la requête) pour une source.
+    ---
+    tags:
+      - Images
+    consumes:
+      - image/jpeg
+    parameters:
+      - name: source_id
+        in: path
+        type: integer
+        required: true
+      - name: X-Frame-Id
+        in: header
+        type: integer
+        required: false
+    responses:
+      200:
+        description: Image enregistrée.
+      400:
+        description: Corps de la requête vide.
+    """
+    contenu = request.get_data()
+    if not contenu:
+        return jsonify({'error': 'Image manquante'}), 400
+
+    source_registry.add(source_id)
+    with ingest_state.transaction() as etat:
+        etat.ajouter_image(source_id, contenu, frame_id=request.headers.get('X-Frame-Id', type=int))
+    ingest_sync.synchroniser()
+    return jsonify({'source_id': source_id, 'etag': FrameStore.etag_image(contenu)}), 200
+
+@app.route('/stream', methods=['GET'])
+@token_required
+def stream():
+    """
+    Flux d'événements (Server-Sent Events) de la page temps réel.
+    ---
+    tags:
+      - Activités
+    produces:
+      - text/event-stream
+    responses:
+      200:
+        description: |
+          Événements 'frames' (à chaque lot reçu - statistiques de la dernière frame
+          et image disponible par source) et 'minute' (à chaque changement de minute -
+          statistiques de la minute écoulée par source). Données au format JSON.
+      503:
+        description: Nombre maximal de clients connectés au flux atteint sur ce worker.
+    """
+    abonnement = event_broker.subscribe()
+    if abonnement is None:
+        # Threads du worker réservés à l'ingestion et aux autres requêtes
+        return jsonify({'message': 'Trop de clients connectés au flux'}), 503, {'Retry-After': '30'}
+    return Response(event_broker.stream(abonnement), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Lecture des paramètres optionnels start / end (jours inclus) de la requête
+def plage_jours():
+    jours = []
+    for param in ['start', 'end']:
+        valeur = request.args.get(param)
+        jours.append(datetime.strptime(valeur, '%Y-%m-%d') if valeur else None)
+    return tuple(jours)
+
 @app.route('/chevres_heures', methods=['GET'])
 @token_required
+@format_tabulaire
 def get_chevres_heures():
     """
 Exemple d'endpoint qui renvoie des données d'activités à haute précision.
 ---
 tags:
   - Activités
+parameters:
+  - name: format
+    in: query
+    type: string
+    required: false
+    enum: ['records', 'columnar', 'arrow', 'parquet']
+    description: Format de la réponse (columnar - colonnes JSON et dates en timestamps Unix ; arrow et parquet - binaires, pyarrow requis).
+  - name: start
+    in: query
+    type: string
+    required: false
+    description: Premier jour inclus (AAAA-MM-JJ).
+    example: "2023-09-27"
+  - name: end
+    in: query
+    type: string
+    required: false
+    description: Dernier jour inclus (AAAA-MM-JJ).
+    example: "2023-09-30"
 responses:
+  400:
+    description: Plage de dates invalide.
   200:
     description: Une liste de données sur les activités avec des valeurs à haute précision.
     content:
@@ -1186,18 +1493,45 @@ responses:
             example: 1
 """
 
-    df = db_manager.query_get_chevres_heure()
-    return jsonify(df.to_dict(orient='records'))
+    try:
+        start, end = plage_jours()
+    except ValueError:
+        return jsonify({'error': "Les paramètres start et end doivent être au format AAAA-MM-JJ"}), 400
+
+    df = db_manager.query_get_chevres_heure(start, end)
+    return df
 
 @app.route('/chevres_minutes', methods=['GET'])
 @token_required
+@format_tabulaire
 def get_chevres_minutes():
     """
 Exemple d'endpoint qui renvoie des données détaillées sur des activités à différentes heures.
 ---
 tags:
   - Activités
+parameters:
+  - name: format
+    in: query
+    type: string
+    required: false
+    enum: ['records', 'columnar', 'arrow', 'parquet']
+    description: Format de la réponse (columnar - colonnes JSON et dates en timestamps Unix ; arrow et parquet - binaires, pyarrow requis).
+  - name: start
+    in: query
+    type: string
+    required: false
+    description: Premier jour inclus (AAAA-MM-JJ).
+    example: "2023-09-27"
+  - name: end
+    in: query
+    type: string
+    required: false
+    description: Dernier jour inclus (AAAA-MM-JJ).
+    example: "2023-09-30"
 responses:
+  400:
+    description: Plage de dates invalide.
   200:
     description: Une liste de données sur les activités.
     content: 
@@ -1245,8 +1579,13 @@ responses:
             example: 1
 """
 
-    df = db_manager.query_get_chevres_minutes()
-    return jsonify(df.to_dict(orient='records'))
+    try:
+        start, end = plage_jours()
+    except ValueError:
+        return jsonify({'error': "Les paramètres start et end doivent être au format AAAA-MM-JJ"}), 400
+
+    df = db_manager.query_get_chevres_minutes(start, end)
+    return df
 
 @app.route('/sources', methods=['GET'])
 @token_required
@@ -1302,25 +1641,145 @@ def get_dates():
 
 @app.route('/stats_minute', methods=['GET'])
 @token_required
+@format_tabulaire
 def get_stats_minute():
+    """
+    Statistiques de la dernière minute de chaque source.
+    ---
+    tags:
+      - Statistiques
+    parameters:
+      - name: format
+        in: query
+        type: string
+        required: false
+        enum: ['records', 'columnar', 'arrow', 'parquet']
+        description: Format de la réponse.
+    responses:
+      200:
+        description: Dernière minute de chaque source (en-têtes ETag et Last-Modified).
+      304:
+        description: Aucune nouvelle minute depuis la réponse identifiée par If-None-Match / If-Modified-Since.
+    """
     df = db_manager.query_get_stats_minute()
-    return jsonify(df.to_dict(orient='records'))
+
+    # Validateurs dérivés du dernier timestamp en base
+    dernier = None
+    if not df.empty and 'timestamp' in df.columns:
+        dernier = pd.to_datetime(df['timestamp'], unit='s').max()  # Timestamps Unix en secondes
+        dernier = None if pd.isna(dernier) else dernier.to_pydatetime()
+    etag_ = etag('stats_minute', str(dernier), len(df), parametres())
+    inchangee = non_modifie(etag_, dernier)
+    if inchangee is not None:
+        return inchangee
+    return df, validateurs(etag_, dernier)
 
 @app.route('/stats_heure', methods=['GET'])
 @token_required
+@format_tabulaire
 def get_stats_heure():
-    df = db_manager.query_get_stats_heure()
-    return jsonify(df.to_dict(orient='records'))
+    """
+    Statistiques horaires consolidées, servies depuis la mémoire.
+    ---
+    tags:
+      - Statistiques
+    parameters:
+      - name: format
+        in: query
+        type: string
+        required: false
+        enum: ['records', 'columnar', 'arrow', 'parquet']
+        description: Format de la réponse (columnar - colonnes JSON et dates en timestamps Unix ; arrow et parquet - binaires, pyarrow requis).
+      - name: refresh
+        in: query
+        type: string
+        required: false
+        enum: ['True', 'False']
+        description: Force une nouvelle consolidation (regroupée avec celle en cours s'il y en a une).
+    responses:
+      200:
+        description: Contenu de ResultatsConsolides lors de la dernière consolidation (en-têtes X-Generation, X-Consolidated-At, ETag et Last-Modified).
+      304:
+        description: Pas de nouvelle consolidation depuis la réponse identifiée par If-None-Match / If-Modified-Since.
+    """
+    try:
+        if request.args.get('refresh') == 'True':
+            df, generation, date = stats_heure_job.refresh()
+        else:
+            df, generation, date = stats_heure_job.get()
+    except Exception as e:
+        logging.error(f"Erreur lors de la consolidation des statistiques horaires : {e}")
+        df, generation, date = stats_heure_job.snapshot()
+
+    if df is None:
+        df = pd.DataFrame()
+
+    etag_ = etag('stats_heure', ingest_state.instance, generation, parametres())
+    inchangee = non_modifie(etag_, date)
+    if inchangee is not None:
+        return inchangee
+
+    entetes = validateurs(etag_, date)
+    entetes['X-Generation'] = str(generation)
+    if date is not None:
+        entetes['X-Consolidated-At'] = datetime.utcfromtimestamp(date).strftime('%Y-%m-%dT%H:%M:%SZ')
+    return df, entetes
+
+# Lecture des filtres optionnels des séries : source, start, end (timestamps Unix) et limit
+def filtres_serie():
+    filtres = {}
+    if request.args.get('source'):
+        filtres['sources'] = SourceRegistry.parse(request.args['source'])
+    for param in ['start', 'end', 'limit']:
+        if request.args.get(param):
+            filtres[param] = int(request.args[param])
+    if filtres.get('limit', 1) <= 0:
+        raise ValueError("limit doit être positif")
+    return filtres
 
 @app.route('/get_serie_heure', methods=['GET'])
 @token_required
+@format_tabulaire
 def get_serie_heure():
     """
     Exemple d'endpoint qui renvoie les données sur les chèvres heures.
     ---
     tags:
       - Chevres Heures
+    parameters:
+      - name: format
+        in: query
+        type: string
+        required: false
+        enum: ['records', 'columnar', 'arrow', 'parquet']
+        description: Format de la réponse (columnar - colonnes JSON et dates en timestamps Unix ; arrow et parquet - binaires, pyarrow requis).
+      - name: source
+        in: query
+        type: string
+        required: false
+        description: Source(s) à renvoyer, séparées par des virgules.
+        example: "1"
+      - name: start
+        in: query
+        type: integer
+        required: false
+        description: Timestamp Unix minimal (inclus).
+        example: 1712990000
+      - name: end
+        in: query
+        type: integer
+        required: false
+        description: Timestamp Unix maximal (inclus).
+        example: 1712994000
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Nombre maximal de points renvoyés (les plus récents).
+        example: 60
     responses:
+      400:
+        description: Paramètre source, start, end ou limit invalide.
       200:
         description: Une liste de données sur les chèvres heures.
         content: 
@@ -1430,16 +1889,55 @@ def get_serie_heure():
                 description: Comptage total mesuré.
                 example: 4218
    """
-    df = db_manager.query_get_serie_heure()
-    return jsonify(df.to_dict(orient='records'))
+    try:
+        filtres = filtres_serie()
+    except ValueError:
+        return jsonify({'error': "Les paramètres source, start, end ou limit sont invalides"}), 400
+
+    df = db_manager.query_get_serie_heure(**filtres)
+    return df
 
 @app.route('/get_serie_jour', methods=['GET'])
 @token_required
+@format_tabulaire
 def get_serie_jour():
     """
    tags:
      - Chevres Heures
+   parameters:
+     - name: format
+       in: query
+       type: string
+       required: false
+       enum: ['records', 'columnar', 'arrow', 'parquet']
+       description: Format de la réponse (columnar - colonnes JSON et dates en timestamps Unix ; arrow et parquet - binaires, pyarrow requis).
+     - name: source
+       in: query
+       type: string
+       required: false
+       description: Source(s) à renvoyer, séparées par des virgules.
+       example: "1"
+     - name: start
+       in: query
+       type: integer
+       required: false
+       description: Timestamp Unix minimal (inclus).
+       example: 1712990000
+     - name: end
+       in: query
+       type: integer
+       required: false
+       description: Timestamp Unix maximal (inclus).
+       example: 1712994000
+     - name: limit
+       in: query
+       type: integer
+       required: false
+       description: Nombre maximal de points renvoyés (les plus récents).
+       example: 60
    responses:
+     400:
+       description: Paramètre source, start, end ou limit invalide.
      200:
        description: Une time série sur la dernière journée enregistrée dans la base de données concernant les chèvres.
        schema:
@@ -1508,18 +2006,57 @@ def get_serie_jour():
                description: Comptage total mesuré.
                example: 4218
    """
-    df = db_manager.query_get_serie_jour()
-    return jsonify(df.to_dict(orient='records'))
+    try:
+        filtres = filtres_serie()
+    except ValueError:
+        return jsonify({'error': "Les paramètres source, start, end ou limit sont invalides"}), 400
+
+    df = db_manager.query_get_serie_jour(**filtres)
+    return df
 
 @app.route('/get_serie_last_heure', methods=['GET'])
 @token_required
+@format_tabulaire
 def get_serie_last_heure():
     """
     Exemple d'endpoint qui renvoie les données sur les chèvres heures.
     ---
     tags:
       - Chevres Heures
+    parameters:
+      - name: format
+        in: query
+        type: string
+        required: false
+        enum: ['records', 'columnar', 'arrow', 'parquet']
+        description: Format de la réponse (columnar - colonnes JSON et dates en timestamps Unix ; arrow et parquet - binaires, pyarrow requis).
+      - name: source
+        in: query
+        type: string
+        required: false
+        description: Source(s) à renvoyer, séparées par des virgules.
+        example: "1"
+      - name: start
+        in: query
+        type: integer
+        required: false
+        description: Timestamp Unix minimal (inclus).
+        example: 1712990000
+      - name: end
+        in: query
+        type: integer
+        required: false
+        description: Timestamp Unix maximal (inclus).
+        example: 1712994000
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Nombre maximal de points renvoyés (les plus récents).
+        example: 60
     responses:
+      400:
+        description: Paramètre source, start, end ou limit invalide.
       200:
         description: Une liste de données sur les chèvres heures.
         content:      
@@ -1630,16 +2167,55 @@ def get_serie_last_heure():
                 example: 4218
    """
 
-    df = db_manager.query_get_serie_last_heure()
-    return jsonify(df.to_dict(orient='records'))
+    try:
+        filtres = filtres_serie()
+    except ValueError:
+        return jsonify({'error': "Les paramètres source, start, end ou limit sont invalides"}), 400
+
+    df = db_manager.query_get_serie_last_heure(**filtres)
+    return df
 
 @app.route('/get_serie_last_jour', methods=['GET'])
 @token_required
+@format_tabulaire
 def get_serie_last_jour():
     """
 tags:
   - Chevres Heures
+parameters:
+  - name: format
+    in: query
+    type: string
+    required: false
+    enum: ['records', 'columnar', 'arrow', 'parquet']
+    description: Format de la réponse (columnar - colonnes JSON et dates en timestamps Unix ; arrow et parquet - binaires, pyarrow requis).
+  - name: source
+    in: query
+    type: string
+    required: false
+    description: Source(s) à renvoyer, séparées par des virgules.
+    example: "1"
+  - name: start
+    in: query
+    type: integer
+    required: false
+    description: Timestamp Unix minimal (inclus).
+    example: 1712990000
+  - name: end
+    in: query
+    type: integer
+    required: false
+    description: Timestamp Unix maximal (inclus).
+    example: 1712994000
+  - name: limit
+    in: query
+    type: integer
+    required: false
+    description: Nombre maximal de points renvoyés (les plus récents).
+    example: 60
 responses:
+  400:
+    description: Paramètre source, start, end ou limit invalide.
   200:
     description: Une time série sur la dernière journée enregistrée dans la base de données concernant les chèvres.
     content:
@@ -1710,8 +2286,13 @@ responses:
             example: 4218
 """
 
-    df = db_manager.query_get_serie_last_jour()
-    return jsonify(df.to_dict(orient='records'))
+    try:
+        filtres = filtres_serie()
+    except ValueError:
+        return jsonify({'error': "Les paramètres source, start, end ou limit sont invalides"}), 400
+
+    df = db_manager.query_get_serie_last_jour(**filtres)
+    return df
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port='5500', debug=False)
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark : accès concurrents à la base d'authentification.
+
+Plusieurs threads enchaînent logins et validations de tokens (hors cache
+mémoire), comme des tableaux de bord ouverts en parallèle. Compare l'ancienne
+version (sqlite3.connect à chaque appel, journal par défaut) au pool de
+connexions de auth_store (WAL, busy timeout, requêtes préparées en cache) :
+débit total et nombre d'erreurs « database is locked ».
+
+Utilisation (depuis Projet/E4/API) :
+    python benchmarks/bench_auth_store.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+import sqlite3
+import datetime
+import threading
+
+import jwt
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'commun')))
+
+from auth_store import AuthStore
+
+SECRET_KEY = 'bench_secret_key_pour_les_acces_concurrents'
+NB_THREADS = 16
+NB_OPERATIONS = 500  # Par thread
+NB_UTILISATEURS = 50
+
+
+# Ancienne version de db_utils, conservée ici comme référence
+class AncienneBase:
+    def __init__(self, database):
+        self.database = database
+
+    def init_db(self):
+        with sqlite3.connect(self.database) as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT NOT NULL UNIQUE, password TEXT NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS tokens (id INTEGER PRIMARY KEY AUTOINCREMENT, token TEXT NOT NULL, username TEXT NOT NULL, expiration DATETIME NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tokens_token ON tokens (token)")
+
+    def add_user(self, username, password):
+        with sqlite3.connect(self.database) as conn:
+            conn.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password))
+
+    def authenticate_user(self, username, password, secret_key):
+        with sqlite3.connect(self.database) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM users WHERE username=? AND password=?", (username, password))
+            if cursor.fetchone():
+                expiration = datetime.datetime.utcnow() + datetime.timedelta(hours=12)
+                token = jwt.encode({'user': username, 'exp': expiration}, secret_key, algorithm="HS256")
+                cursor.execute("INSERT INTO tokens (token, username, expiration) VALUES (?, ?, ?)", (token, username, expiration))
+                conn.commit()
+                return token
+        return None
+
+    def validate_token(self, token, secret_key):
+        with sqlite3.connect(self.database) as conn:
+            token_data = conn.execute("SELECT * FROM tokens WHERE token=?", (token,)).fetchone()
+        if not token_data:
+            return 'Token invalide'
+        jwt.decode(token, secret_key, algorithms=["HS256"])
+        return None
+
+
+def charge(base, vider_cache):
+    erreurs = []
+    tokens = {}
+
+    def travail(numero):
+        username = f'user{numero % NB_UTILISATEURS}'
+        for i in range(NB_OPERATIONS):
+            try:
+                # Un login pour dix validations
+                if i % 10 == 0 or username not in tokens:
+                    tokens[username] = base.authenticate_user(username, 'mdp', SECRET_KEY)
+                vider_cache()
+                assert base.validate_token(tokens[username], SECRET_KEY) is None
+            except sqlite3.OperationalError as e:
+                erreurs.append(str(e))
+
+    threads = [threading.Thread(target=travail, args=(n,)) for n in range(NB_THREADS)]
+    debut = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duree = time.perf_counter() - debut
+    return NB_THREADS * NB_OPERATIONS / duree, len(erreurs)
+
+
+def preparer(base):
+    base.init_db()
+    for u in range(NB_UTILISATEURS):
+        base.add_user(f'user{u}', 'mdp')
+    return base
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as repertoire:
+        ancienne = preparer(AncienneBase(os.path.join(repertoire, 'ancienne.db')))
+        debit, erreurs = charge(ancienne, lambda: None)
+        print(f"Avant (connexion par appel)     : {debit:8.0f} opérations/s, {erreurs} erreur(s) de verrou")
+
+        store = preparer(AuthStore(os.path.join(repertoire, 'auth_store.db')))
+        debit, erreurs = charge(store, store.token_cache.clear)
+        print(f"Après (pool, WAL, busy timeout) : {debit:8.0f} opérations/s, {erreurs} erreur(s) de verrou")
+        store.pool.close()
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark : statistiques par frame de /get_data_animov_ch?with_stats=True.
+
+Compare l'ancien calcul (un DataFrame pandas et un describe() par frame) au
+calcul vectorisé de frame_stats.stats_frames.
+
+Utilisation (depuis Projet/E4/API) :
+    python benchmarks/bench_frame_stats.py
+"""
+
+import copy
+import os
+import random
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from frame_stats import stats_frames
+
+
+# Ancien calcul, conservé ici comme référence
+def stats_data_animov_frames_pandas(json_):
+    for item in json_:
+        if isinstance(item, dict) and 'detect' in item:
+            df = pd.DataFrame(item['detect'], columns=['id', 'x_min', 'y_min', 'x_max', 'y_max', 'score', 'classe', 'brush', 'eat', 'drink'])
+            count_classe_1 = df[df['classe'] == 0].shape[0]
+            count_classe_0 = df[df['classe'] == 1].shape[0]
+
+            df['x_min'] = df['x_min'].astype(int)
+            df['y_min'] = df['y_min'].astype(int)
+            df['x_max'] = df['x_max'].astype(int)
+            df['y_max'] = df['y_max'].astype(int)
+            df['score'] = df['score'].round(3)
+
+            df = df.drop(columns=['id', 'brush', 'eat', 'drink'])
+            df = df.describe()
+            df = df.transpose()
+            df['std'] = df['std'].round(3)
+            df['mean'] = df['mean'].round(3)
+            df['25%'] = df['25%'].round(3)
+            df['50%'] = df['50%'].round(3)
+            df['75%'] = df['75%'].round(3)
+            df['count'] = df['count'].astype(int)
+
+            item['stats'] = df.to_dict()
+            cnt = item['stats']['count']['classe']
+            item['stats'].pop("count")
+            item['stats']["count"] = cnt
+            item['stats']["debout"] = count_classe_1
+            item['stats']["couche"] = count_classe_0
+    return json_
+
+
+# Lot réaliste : 4 caméras, 25 frames par caméra, 5 à 30 chèvres par frame
+def generer_lot(nb_sources=4, nb_frames=25, seed=0):
+    random.seed(seed)
+    lot = []
+    for source in range(1, nb_sources + 1):
+        for frame_id in range(nb_frames):
+            detect = []
+            for i in range(random.randint(5, 30)):
+                x, y = random.uniform(0, 1200), random.uniform(0, 600)
+                detect.append([i, x, y, x + random.uniform(50, 200), y + random.uniform(50, 200),
+                               random.uniform(0.3, 0.99), random.randint(0, 1), False, False, False])
+            lot.append({'source_id': source, 'frame_id': frame_id,
+                        'date': ['2024-07-31 13:45:00.000'], 'detect': detect})
+    return lot
+
+
+if __name__ == '__main__':
+    for nb_frames in [1, 25, 250]:
+        lot = generer_lot(nb_frames=nb_frames)
+        repetitions = 5
+
+        t_pandas = min(timeit.repeat(lambda: stats_data_animov_frames_pandas(copy.deepcopy(lot)), number=1, repeat=repetitions))
+        t_numpy = min(timeit.repeat(lambda: stats_frames(copy.deepcopy(lot)), number=1, repeat=repetitions))
+        t_copie = min(timeit.repeat(lambda: copy.deepcopy(lot), number=1, repeat=repetitions))
+
+        print(f"{len(lot):5d} frames : pandas {1000 * (t_pandas - t_copie):8.2f} ms | "
+              f"vectorisé {1000 * (t_numpy - t_copie):8.2f} ms | "
+              f"gain x{(t_pandas - t_copie) / max(t_numpy - t_copie, 1e-9):.1f}")
+
+        # Vérification rapide de l'équivalence des résultats
+        a = stats_data_animov_frames_pandas(copy.deepcopy(lot))
+        b = stats_frames(copy.deepcopy(lot))
+        for item_a, item_b in zip(a, b):
+            for nom in ['mean', 'std', 'min', '25%', '50%', '75%', 'max']:
+                assert np.allclose(list(item_a['stats'][nom].values()), list(item_b['stats'][nom].values()), atol=1e-3, equal_nan=True)
+            assert item_a['stats']['count'] == item_b['stats']['count']
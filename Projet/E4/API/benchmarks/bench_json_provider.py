@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark : sérialisation JSON des plus grosses réponses des API.
+
+- /get_data_animov_ch avec images (base64) et statistiques par frame ;
+- /rmse_history avec artefacts (métriques MLflow et prédictions en
+  scalaires NumPy).
+
+Compare le fournisseur par défaut de Flask, le fournisseur commun sans
+orjson et le fournisseur commun avec orjson. Le fournisseur par défaut
+échoue sur les scalaires NumPy : les réponses sont alors d'abord converties
+en types Python, comme le faisaient les routes.
+
+Utilisation (depuis Projet/E4/API) :
+    python benchmarks/bench_json_provider.py
+"""
+
+import base64
+import os
+import random
+import sys
+import timeit
+
+import numpy as np
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'commun')))
+
+import json_provider
+from json_provider import AnimovJSONProvider
+from frame_stats import stats_frames
+from benchmarks.bench_frame_stats import generer_lot
+
+REPETITIONS = 5
+
+
+def reponse_data_animov_ch():
+    lot = generer_lot(nb_sources=4, nb_frames=25)
+    image = base64.b64encode(random.Random(0).randbytes(150000)).decode('utf-8')
+    for frame in lot:
+        frame['frame'] = image
+    stats_frames(lot)
+    return {'data': lot, '_general_stats': [{f'source_{s}': {'avg_count': 12.667, 'avg_couche': 5.667}} for s in range(1, 5)]}
+
+
+def reponse_rmse_history(nb_runs=50, nb_points=2000):
+    rng = np.random.default_rng(0)
+    runs = []
+    for i in range(nb_runs):
+        predictions = rng.random(nb_points) * 30
+        runs.append({
+            'run_id': f'{i:032x}',
+            'start_time': 1712990000000 + i,
+            'end_time': 1712990060000 + i,
+            'metrics': {'rmse': np.float64(rng.random()), 'temps_exec': np.float64(rng.random() * 10)},
+            'params': {'model_version': str(i % 3), 'order': '(1, 1, 1)'},
+            'artifacts': {'predictions.csv': [{'date': f'2024-07-{1 + j % 28:02d} {j % 24:02d}:00:00',
+                                                'Effectif debout': predictions[j],
+                                                'Effectif couche': np.nan if j % 97 == 0 else predictions[j] / 2}
+                                               for j in range(nb_points)]},
+        })
+    return {'rmse_history': runs, 'rmse_values': [run['metrics']['rmse'] for run in runs]}
+
+
+def en_types_python(o):
+    # Conversion préalable nécessaire avec le fournisseur par défaut de Flask
+    if isinstance(o, dict):
+        return {cle: en_types_python(valeur) for cle, valeur in o.items()}
+    if isinstance(o, list):
+        return [en_types_python(valeur) for valeur in o]
+    if isinstance(o, np.generic):
+        valeur = o.item()
+        return None if valeur != valeur else valeur
+    return o
+
+
+def mesurer(app, provider, corps, preparation=None):
+    app.json = provider
+    with app.app_context():
+        if preparation is None:
+            return min(timeit.repeat(lambda: provider.response(corps), number=1, repeat=REPETITIONS))
+        return min(timeit.repeat(lambda: provider.response(preparation(corps)), number=1, repeat=REPETITIONS))
+
+
+if __name__ == '__main__':
+    app = Flask(__name__)
+    orjson = json_provider.orjson
+
+    for nom, corps in [('/get_data_animov_ch', reponse_data_animov_ch()), ('/rmse_history', reponse_rmse_history())]:
+        with app.app_context():
+            taille = len(AnimovJSONProvider(app).response(corps).get_data())
+        print(f"{nom} ({taille / 1e6:.1f} Mo)")
+
+        resultats = [('Flask par défaut (+ conversion)', mesurer(app, DefaultJSONProvider(app), corps, en_types_python))]
+        json_provider.orjson = None
+        resultats.append(('commun, json standard', mesurer(app, AnimovJSONProvider(app), corps)))
+        json_provider.orjson = orjson
+        if orjson is not None:
+            resultats.append(('commun, orjson', mesurer(app, AnimovJSONProvider(app), corps)))
+        for libelle, duree in resultats:
+            print(f"  {libelle:32s} {1000 * duree:8.1f} ms")
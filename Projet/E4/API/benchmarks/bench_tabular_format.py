@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark : taille des réponses et temps de relecture côté client pour
+/chevres_minutes selon le paramètre format (records, columnar, arrow, parquet).
+
+Les données sont générées avec la forme de table_chevres_minute agrégée
+(jour, source, minutes, heure et cinq moyennes), sur plusieurs mois.
+
+Utilisation (depuis Projet/E4/API) :
+    python benchmarks/bench_tabular_format.py
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from flask import Flask
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Streamlit')))
+
+import tabular_format
+from tabular_format import reponse_tabulaire
+from model.api_tabulaire import dataframe_depuis_reponse
+
+NB_JOURS = 30
+NB_REPETITIONS = 5
+
+
+class ReponseClient:
+    # Interface minimale de requests.Response utilisée par dataframe_depuis_reponse
+    def __init__(self, response):
+        self.headers = {'Content-Type': response.headers['Content-Type']}
+        self.content = response.get_data()
+
+    def json(self):
+        import json
+        return json.loads(self.content)
+
+
+def generer_chevres_minutes():
+    rng = np.random.default_rng(0)
+    jours = pd.date_range('2023-09-01', periods=NB_JOURS, freq='D')
+    index = pd.MultiIndex.from_product([jours, [1, 2, 3, 4], range(24), range(60)],
+                                       names=['jour', 'source', 'heure', 'minutes'])
+    df = index.to_frame(index=False)[['jour', 'source', 'minutes', 'heure']]
+    for colonne in ['brush', 'drink', 'eat', 'class_0', 'class_1']:
+        df[colonne] = rng.random(len(df)) * 10
+    return df
+
+
+def relecture_records(reponse):
+    # Relecture faite auparavant par les pages Streamlit
+    df = pd.DataFrame(reponse.json())
+    df['jour'] = pd.to_datetime(df['jour'], format='%a, %d %b %Y %H:%M:%S GMT')
+    return df
+
+
+def mesurer(fonction, *args):
+    debut = time.perf_counter()
+    for _ in range(NB_REPETITIONS):
+        resultat = fonction(*args)
+    return (time.perf_counter() - debut) / NB_REPETITIONS, resultat
+
+
+if __name__ == '__main__':
+    df = generer_chevres_minutes()
+    print(f"{len(df)} lignes")
+    formats = ['records', 'columnar'] + (['arrow', 'parquet'] if tabular_format.pa is not None else [])
+
+    with Flask(__name__).app_context():
+        print(f"{'format':>9} {'taille (Mo)':>12} {'encodage (s)':>13} {'relecture (s)':>14}")
+        for format_ in formats:
+            duree_encodage, response = mesurer(reponse_tabulaire, df, format_)
+            reponse = ReponseClient(response)
+            relecture = relecture_records if format_ == 'records' else dataframe_depuis_reponse
+            duree_relecture, relu = mesurer(relecture, reponse)
+            assert len(relu) == len(df)
+            print(f"{format_:>9} {len(reponse.content) / 1e6:>12.2f} {duree_encodage:>13.3f} {duree_relecture:>14.3f}")
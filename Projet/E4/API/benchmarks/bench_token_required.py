@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark : requêtes par seconde sur une route protégée par token_required.
+
+Compare l'ancienne vérification (connexion SQLite, SELECT sur la table tokens,
+décodage JWT à chaque requête) à db_utils.validate_token avec le cache de
+tokens en mémoire. La base de tokens est créée dans un répertoire temporaire
+et remplie avec de nombreux tokens pour se rapprocher d'une base de production.
+
+Utilisation (depuis Projet/E4/API) :
+    python benchmarks/bench_token_required.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+import sqlite3
+import datetime
+from functools import wraps
+
+import jwt
+from flask import Flask, request, jsonify
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import db_utils
+
+SECRET_KEY = 'bench_secret_key'
+NB_REQUETES = 2000
+NB_TOKENS_EN_BASE = 50000
+
+
+# Ancienne vérification, conservée ici comme référence
+def token_required_sqlite(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = request.headers.get('x-access-tokens')
+        if not token:
+            return jsonify({'message': 'Token manquant'}), 401
+        try:
+            with sqlite3.connect(db_utils.DATABASE) as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT * FROM tokens WHERE token=?", (token,))
+                token_data = cursor.fetchone()
+                if not token_data:
+                    return jsonify({'message': 'Token invalide'}), 401
+                expiration = token_data[3]
+                if isinstance(expiration, str):
+                    expiration = datetime.datetime.strptime(expiration, '%Y-%m-%d %H:%M:%S.%f')
+                if expiration < datetime.datetime.utcnow():
+                    return jsonify({'message': 'Token expiré'}), 401
+                jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+        except jwt.InvalidTokenError:
+            return jsonify({'message': 'Token invalide'}), 401
+        return f(*args, **kwargs)
+    return decorated
+
+
+def token_required_cache(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = request.headers.get('x-access-tokens')
+        if not token:
+            return jsonify({'message': 'Token manquant'}), 401
+        erreur = db_utils.validate_token(token, SECRET_KEY)
+        if erreur:
+            return jsonify({'message': erreur}), 401
+        return f(*args, **kwargs)
+    return decorated
+
+
+def creer_app():
+    app = Flask(__name__)
+
+    @app.route('/avant')
+    @token_required_sqlite
+    def avant():
+        return jsonify({'ok': True})
+
+    @app.route('/apres')
+    @token_required_cache
+    def apres():
+        return jsonify({'ok': True})
+
+    return app
+
+
+def remplir_base(avec_index):
+    # Fermeture des connexions du pool avant de recréer le fichier
+    db_utils.store().pool.close()
+    for suffixe in ['', '-wal', '-shm']:
+        if os.path.exists(db_utils.DATABASE + suffixe):
+            os.remove(db_utils.DATABASE + suffixe)
+    db_utils.init_db()
+    with sqlite3.connect(db_utils.DATABASE) as conn:
+        if not avec_index:
+            conn.execute("DROP INDEX IF EXISTS idx_tokens_token")
+        expiration = datetime.datetime.utcnow() + datetime.timedelta(hours=12)
+        conn.executemany("INSERT INTO tokens (token, username, expiration) VALUES (?, ?, ?)",
+                         ((f'ancien-token-{i}', 'bench', expiration) for i in range(NB_TOKENS_EN_BASE)))
+        conn.commit()
+    db_utils.add_user('bench', 'bench')
+    return db_utils.authenticate_user('bench', 'bench', SECRET_KEY)
+
+
+def mesurer(client, route, token):
+    debut = time.perf_counter()
+    for _ in range(NB_REQUETES):
+        response = client.get(route, headers={'x-access-tokens': token})
+        assert response.status_code == 200
+    return NB_REQUETES / (time.perf_counter() - debut)
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as repertoire:
+        db_utils.DATABASE = os.path.join(repertoire, 'tokens.db')
+        client = creer_app().test_client()
+
+        token = remplir_base(avec_index=False)
+        print(f"Avant (SQLite + JWT, sans index)  : {mesurer(client, '/avant', token):8.0f} requêtes/s")
+
+        token = remplir_base(avec_index=True)
+        print(f"Avant (SQLite + JWT, avec index)  : {mesurer(client, '/avant', token):8.0f} requêtes/s")
+
+        db_utils.store().token_cache.clear()
+        print(f"Après (cache de tokens en mémoire) : {mesurer(client, '/apres', token):8.0f} requêtes/s")
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Test de charge de la base des tokens : des milliers de logins successifs.
+
+Avant, chaque login ajoutait une ligne à la table tokens, jamais supprimée.
+Avec la réutilisation du token encore valide et la purge des tokens expirés,
+la table reste de taille constante et le temps de validation d'un token
+(hors cache mémoire) ne doit pas augmenter avec le nombre de logins.
+
+Utilisation (depuis Projet/E4/API) :
+    python benchmarks/bench_token_store.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+import sqlite3
+import datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import db_utils
+
+SECRET_KEY = 'bench_secret_key_pour_le_test_de_charge'
+NB_LOGINS = 5000
+PALIER = 1000
+NB_VALIDATIONS = 500
+NB_UTILISATEURS = 20
+
+
+def latence_validation(token):
+    # Mesure hors cache : chaque validation interroge SQLite
+    debut = time.perf_counter()
+    for _ in range(NB_VALIDATIONS):
+        db_utils.store().token_cache.clear()
+        assert db_utils.validate_token(token, SECRET_KEY) is None
+    return (time.perf_counter() - debut) / NB_VALIDATIONS * 1e6
+
+
+def nb_tokens():
+    with sqlite3.connect(db_utils.DATABASE) as conn:
+        return conn.execute("SELECT COUNT(*) FROM tokens").fetchone()[0]
+
+
+def inserer_tokens_expires(n):
+    # Simule des mois de logins passés : tokens expirés restés en base
+    expiration = datetime.datetime.utcnow() - datetime.timedelta(days=1)
+    with sqlite3.connect(db_utils.DATABASE) as conn:
+        conn.executemany("INSERT INTO tokens (token, username, expiration) VALUES (?, ?, ?)",
+                         ((f'expire-{i}', 'ancien', expiration) for i in range(n)))
+        conn.commit()
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as repertoire:
+        db_utils.DATABASE = os.path.join(repertoire, 'tokens.db')
+        db_utils.init_db()
+        for u in range(NB_UTILISATEURS):
+            db_utils.add_user(f'user{u}', 'mdp')
+
+        inserer_tokens_expires(100000)
+        print(f"Tokens en base avant purge : {nb_tokens()}")
+        print(f"Purge : {db_utils.purge_expired_tokens()} token(s) supprimé(s)")
+
+        token = db_utils.authenticate_user('user0', 'mdp', SECRET_KEY)
+        latences = []
+        print(f"{'logins':>8} {'tokens en base':>15} {'login (µs)':>11} {'validation (µs)':>16}")
+        for palier in range(0, NB_LOGINS, PALIER):
+            debut = time.perf_counter()
+            for i in range(PALIER):
+                token_login = db_utils.authenticate_user(f'user{i % NB_UTILISATEURS}', 'mdp', SECRET_KEY)
+                assert token_login
+            duree_login = (time.perf_counter() - debut) / PALIER * 1e6
+            latences.append(latence_validation(token))
+            print(f"{palier + PALIER:>8} {nb_tokens():>15} {duree_login:>11.1f} {latences[-1]:>16.1f}")
+
+        assert nb_tokens() == NB_UTILISATEURS
+        print(f"Rapport latence dernier / premier palier : {latences[-1] / latences[0]:.2f}")
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Consolidation périodique des statistiques horaires servies par /stats_heure.
+
+La procédure stockée ConsoliderResultatsEcartType réécrit ResultatsConsolides :
+elle n'est plus appelée à chaque requête mais par un thread de fond, une fois
+par période. Le dernier résultat est gardé en mémoire avec un numéro de
+génération. Les rafraîchissements forcés simultanés sont regroupés : un seul
+calcul tourne à la fois et les appels en attente reçoivent son résultat.
+
+Avec plusieurs workers, le numéro de génération et la date de la dernière
+consolidation sont partagés (état d'ingestion, voir ingest_state.py) et la
+consolidation est protégée par un verrou commun aux processus : un seul
+worker appelle la procédure, les autres relisent ResultatsConsolides quand
+une nouvelle génération est publiée.
+"""
+
+import logging
+import threading
+import time
+from contextlib import nullcontext
+
+logger = logging.getLogger(__name__)
+
+
+class ConsolidationJob:
+    def __init__(self, compute_fn, interval=3600, name='consolidation', load_fn=None, partage=None, verrou=None):
+        self.compute_fn = compute_fn  # Fonction de consolidation, renvoie le résultat à servir
+        self.interval = interval  # Délai entre deux consolidations (secondes)
+        self.load_fn = load_fn or compute_fn  # Lecture seule du résultat consolidé par un autre worker
+        self.partage = partage  # État commun aux workers : consolidation() et publier_consolidation(date)
+        self.verrou = verrou or (lambda: nullcontext(True))  # Verrou entre processus, True s'il est obtenu
+        self.generation = 0  # Incrémenté à chaque consolidation réussie
+        self.updated_at = None  # Date (epoch) de la dernière consolidation réussie
+
+        self._result = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()  # Un seul calcul à la fois
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def snapshot(self):
+        """Renvoie (résultat, génération, date de consolidation) sans calcul."""
+        with self._lock:
+            return self._result, self.generation, self.updated_at
+
+    def _installer(self, result, generation, updated_at):
+        with self._lock:
+            self._result = result
+            self.generation = generation
+            self.updated_at = updated_at
+
+    def refresh(self):
+        """
+        Lance une consolidation, ou attend celle déjà en cours et renvoie son
+        résultat. Lève l'exception du calcul en cas d'échec ; le dernier
+        résultat valide est conservé.
+        """
+        generation = self.snapshot()[1]
+        with self._refresh_lock:
+            if self.snapshot()[1] != generation:
+                # Consolidation terminée pendant l'attente du verrou
+                return self.snapshot()
+
+            if self.partage is None:
+                result = self.compute_fn()
+                self._installer(result, self.generation + 1, time.time())
+                return self.snapshot()
+
+            publiee = self.partage.consolidation()[0]
+            with self.verrou() as obtenu:
+                generation, date = self.partage.consolidation()
+                if generation != publiee:
+                    # Consolidation terminée par un autre worker pendant l'attente du verrou
+                    self._installer(self.load_fn(), generation, date)
+                elif not obtenu:
+                    raise TimeoutError("Consolidation en cours dans un autre worker")
+                else:
+                    result = self.compute_fn()
+                    self._installer(result, *self.partage.publier_consolidation(time.time()))
+        return self.snapshot()
+
+    def synchroniser(self):
+        """Reprend le dernier résultat publié par un autre worker s'il diffère du résultat en mémoire."""
+        with self._refresh_lock:
+            generation, date = self.partage.consolidation()
+            if generation not in (0, self.snapshot()[1]):
+                self._installer(self.load_fn(), generation, date)
+        return self.snapshot()
+
+    def get(self):
+        """Renvoie le dernier résultat ; consolide d'abord si aucun n'est disponible."""
+        snapshot = self.snapshot()
+        if self.partage is not None and self.partage.consolidation()[0] not in (0, snapshot[1]):
+            return self.synchroniser()
+        if snapshot[1] == 0:
+            return self.refresh()
+        return snapshot
+
+    def _a_consolider(self):
+        if self.partage is None:
+            return True
+        # Consolidation de moins d'une période publiée par un autre worker : simple relecture
+        date = self.partage.consolidation()[1]
+        return date is None or time.time() - date >= self.interval
+
+    def _run(self):
+        while True:
+            try:
+                if self._a_consolider():
+                    self.refresh()
+                else:
+                    self.synchroniser()
+            except Exception as e:
+                logger.error(f"Échec de la consolidation, dernier résultat conservé : {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
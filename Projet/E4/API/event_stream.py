@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Diffusion d'événements aux clients de /stream (Server-Sent Events).
+
+/receive_data_animov publie un événement à chaque lot reçu (statistiques de
+la dernière frame de chaque source, image disponible) et à chaque changement
+de minute (statistiques de la minute écoulée). Chaque client abonné dispose
+d'une file bornée : un client lent perd les événements les plus anciens sans
+ralentir l'ingestion. Le message est sérialisé une seule fois, quel que soit
+le nombre d'abonnés.
+
+Chaque client connecté occupe un thread du worker pendant toute la durée de
+la connexion : le nombre d'abonnés est borné pour garder des threads libres
+pour l'ingestion et les autres requêtes.
+"""
+
+import itertools
+import json
+import queue
+import threading
+
+# Délai de reconnexion conseillé aux clients (millisecondes)
+RETRY_MS = 3000
+
+
+def format_sse(event, data, id_=None):
+    """Message SSE : champs 'id', 'event' et 'data' (une ligne par ligne de données)."""
+    lignes = []
+    if id_ is not None:
+        lignes.append(f'id: {id_}')
+    lignes.append(f'event: {event}')
+    lignes.extend(f'data: {ligne}' for ligne in data.split('\n'))
+    return '\n'.join(lignes) + '\n\n'
+
+
+class Abonnement:
+    def __init__(self, broker, max_queue):
+        self._broker = broker
+        self._queue = queue.Queue(maxsize=max_queue)
+
+    def put(self, message):
+        while True:
+            try:
+                self._queue.put_nowait(message)
+                return
+            except queue.Full:
+                # File pleine : l'événement le plus ancien est abandonné
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        """Renvoie le prochain message, ou None après 'timeout' secondes sans événement."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._broker.unsubscribe(self)
+
+
+class EventBroker:
+    def __init__(self, max_queue=100, keepalive=15.0, dumps=json.dumps, max_subscribers=None):
+        self.max_queue = max_queue  # Événements gardés en attente par client
+        self.max_subscribers = max_subscribers  # Abonnés simultanés (None : pas de limite)
+        self.keepalive = keepalive  # Délai (secondes) entre deux commentaires de maintien de connexion
+        self.dumps = dumps  # Sérialisation JSON des données (fournisseur JSON de l'application)
+
+        self._lock = threading.Lock()
+        self._abonnements = set()
+        self._ids = itertools.count(1)
+
+    def subscribe(self):
+        """Renvoie un nouvel abonnement, ou None si le nombre maximal d'abonnés est atteint."""
+        abonnement = Abonnement(self, self.max_queue)
+        with self._lock:
+            if self.max_subscribers is not None and len(self._abonnements) >= self.max_subscribers:
+                return None
+            self._abonnements.add(abonnement)
+        return abonnement
+
+    def unsubscribe(self, abonnement):
+        with self._lock:
+            self._abonnements.discard(abonnement)
+
+    def subscribers(self):
+        with self._lock:
+            return len(self._abonnements)
+
+    def publish(self, event, data):
+        """Envoie un événement à tous les abonnés ; sans abonné, rien n'est sérialisé."""
+        with self._lock:
+            abonnements = list(self._abonnements)
+            id_ = next(self._ids)
+        if not abonnements:
+            return
+        message = format_sse(event, self.dumps(data), id_)
+        for abonnement in abonnements:
+            abonnement.put(message)
+
+    def stream(self, abonnement):
+        """
+        Générateur du corps de la réponse /stream. Un commentaire est envoyé
+        en l'absence d'événement pour maintenir la connexion ; l'abonnement est
+        fermé quand le client se déconnecte (fermeture du générateur).
+        """
+        try:
+            yield f'retry: {RETRY_MS}\n\n'
+            while True:
+                message = abonnement.get(timeout=self.keepalive)
+                yield message if message is not None else ': keepalive\n\n'
+        finally:
+            abonnement.close()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Stockage en mémoire des frames reçues par /receive_data_animov.
+
+Le dernier lot de chaque source est indexé par source_id, par frame_id et par
+date au moment de l'ingestion : la lecture par /get_data_animov_ch se fait par
+accès direct au dictionnaire, sans parcourir toutes les frames. Un historique
+circulaire des N derniers lots est conservé pour chaque source.
+
+La dernière image de chaque source est aussi conservée décodée (octets JPEG),
+avec un ETag, pour être servie directement par /frames/<source_id>.
+"""
+
+import base64
+import binascii
+import hashlib
+import threading
+import time
+from collections import deque
+
+
+class FrameStore:
+    def __init__(self, history_size=10):
+        self.history_size = history_size
+        self.generation = 0  # Incrémenté à chaque lot reçu
+        self.updated_at = None  # Date (epoch) de la dernière réception
+
+        self._lock = threading.Lock()
+        self._by_source = {}  # source_id -> frames du dernier lot
+        self._by_frame_id = {}  # (source_id, frame_id) -> frame
+        self._by_date = {}  # (source_id, date) -> frame
+        self._history = {}  # source_id -> deque des derniers lots
+        self._images = {}  # source_id -> dernière image JPEG décodée
+
+    def ingest(self, batch, generation=None, updated_at=None):
+        """
+        Indexe un lot de frames ; seules les sources présentes dans le lot sont
+        remplacées. La génération et la date sont celles de l'état partagé
+        quand le lot vient de la synchronisation (ingest_state.py).
+        """
+        by_source = {}
+        for frame in batch:
+            if isinstance(frame, dict) and 'source_id' in frame:
+                by_source.setdefault(frame['source_id'], []).append(frame)
+
+        images = self._decode_images(by_source)
+
+        with self._lock:
+            for source_id, frames in by_source.items():
+                # Désindexation des frames précédentes de la source
+                for ancienne in self._by_source.get(source_id, []):
+                    self._by_frame_id.pop((source_id, ancienne.get('frame_id')), None)
+                    self._by_date.pop((source_id, self._date_key(ancienne)), None)
+
+                self._by_source[source_id] = frames
+                for frame in frames:
+                    self._by_frame_id[(source_id, frame.get('frame_id'))] = frame
+                    self._by_date[(source_id, self._date_key(frame))] = frame
+
+                if source_id not in self._history:
+                    self._history[source_id] = deque(maxlen=self.history_size)
+                self._history[source_id].append(frames)
+
+            for source_id, image in images.items():
+                self._images[source_id] = image
+
+            self._nouvelle_generation(generation, updated_at)
+
+    def _nouvelle_generation(self, generation, updated_at):
+        self.generation = generation if generation is not None else self.generation + 1
+        self.updated_at = updated_at if updated_at is not None else time.time()
+
+    @staticmethod
+    def etag_image(contenu):
+        return hashlib.sha1(contenu).hexdigest()
+
+    @staticmethod
+    def _image(contenu, frame_id=None, date=None):
+        return {
+            'jpeg': contenu,
+            'etag': FrameStore.etag_image(contenu),
+            'frame_id': frame_id,
+            'date': date,
+        }
+
+    def _decode_images(self, by_source):
+        # Décodage base64 de la dernière image de chaque source, hors verrou
+        images = {}
+        for source_id, frames in by_source.items():
+            for frame in reversed(frames):
+                if frame.get('frame'):
+                    try:
+                        contenu = base64.b64decode(frame['frame'])
+                    except (binascii.Error, TypeError, ValueError):
+                        continue
+                    images[source_id] = self._image(contenu, frame.get('frame_id'), self._date_key(frame))
+                    break
+        return images
+
+    def set_image(self, source_id, contenu, frame_id=None, date=None, generation=None, updated_at=None):
+        """Enregistre une image JPEG envoyée directement en binaire."""
+        image = self._image(contenu, frame_id, date)
+        with self._lock:
+            self._images[source_id] = image
+            self._nouvelle_generation(generation, updated_at)
+        return image
+
+    def version(self):
+        """Renvoie (génération, date de la dernière réception), lus ensemble."""
+        with self._lock:
+            return self.generation, self.updated_at
+
+    def image(self, source_id):
+        with self._lock:
+            return self._images.get(source_id)
+
+    @staticmethod
+    def _date_key(frame):
+        date = frame.get('date')
+        if isinstance(date, list):
+            return date[0] if date else None
+        return date
+
+    def sources(self):
+        with self._lock:
+            return list(self._by_source.keys())
+
+    def latest(self, sources=None):
+        """
+        Renvoie les frames du dernier lot des sources demandées, dans l'ordre
+        des sources. Les frames sont des copies superficielles : les routes
+        peuvent ajouter ou supprimer des clés sans modifier le stockage.
+        """
+        with self._lock:
+            if sources is None:
+                sources = list(self._by_source.keys())
+            frames = []
+            for source_id in sources:
+                frames.extend(self._by_source.get(int(source_id), []))
+        return [dict(frame) for frame in frames]
+
+    def frame(self, source_id, frame_id=None, date=None):
+        with self._lock:
+            if frame_id is not None:
+                frame = self._by_frame_id.get((source_id, frame_id))
+            else:
+                frame = self._by_date.get((source_id, date))
+        return dict(frame) if frame is not None else None
+
+    def recent(self, source_id, n=None):
+        """Renvoie les n derniers lots d'une source, du plus ancien au plus récent."""
+        with self._lock:
+            lots = list(self._history.get(source_id, []))
+        if n is not None:
+            lots = lots[-n:] if n > 0 else []
+        return [[dict(frame) for frame in lot] for lot in lots]
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Réponses conditionnelles et compression des réponses de l'API.
+
+Les routes interrogées en boucle par la page temps réel (/get_data_animov_ch,
+/stats_minute, /stats_heure) portent un ETag et un Last-Modified calculés à
+partir de ce qui fait évoluer leur contenu (génération d'ingestion, date de
+consolidation, dernier timestamp en base). Si le client renvoie ces valeurs
+(If-None-Match / If-Modified-Since) et que rien n'a changé, l'API répond 304
+sans construire ni envoyer le corps.
+
+Les réponses dépassant un seuil sont compressées (br si le module brotli est
+installé et accepté par le client, sinon gzip). Les ETag sont faibles (W/) :
+ils désignent le contenu, quel que soit l'encodage utilisé pour l'envoyer.
+"""
+
+import datetime
+import gzip
+import hashlib
+import uuid
+
+from flask import Response, request
+from werkzeug.http import http_date
+
+try:
+    import brotli
+except ImportError:  # brotli absent : compression gzip uniquement
+    brotli = None
+
+# Identifiant du processus, à inclure dans les ETag calculés à partir d'un
+# compteur propre au processus (repart de 0 au démarrage, diffère entre workers).
+INSTANCE = uuid.uuid4().hex
+
+ENCODAGES = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+# Types de contenu compressés ; les images JPEG et les fichiers Parquet le sont déjà.
+MIMETYPES_COMPRESSIBLES = {
+    'application/json',
+    'application/vnd.apache.arrow.stream',
+    'text/html',
+    'text/plain',
+    'text/csv',
+}
+
+
+def etag(*parties):
+    """ETag calculé à partir des éléments qui identifient le contenu (génération, paramètres...)."""
+    return hashlib.sha1(repr(parties).encode('utf-8')).hexdigest()
+
+
+def parametres():
+    """Paramètres de la requête, triés, à inclure dans l'ETag (format, sources...)."""
+    return tuple(sorted(request.args.items(multi=True)))
+
+
+def _date(last_modified):
+    # Date HTTP à la seconde (epoch, datetime naïf UTC ou datetime avec fuseau)
+    if last_modified is None:
+        return None
+    if isinstance(last_modified, (int, float)):
+        last_modified = datetime.datetime.fromtimestamp(last_modified, datetime.timezone.utc)
+    elif last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=datetime.timezone.utc)
+    return last_modified.replace(microsecond=0)
+
+
+def validateurs(etag_, last_modified=None):
+    """En-têtes ETag, Last-Modified et Cache-Control d'une réponse conditionnelle."""
+    entetes = {'ETag': f'W/"{etag_}"', 'Cache-Control': 'no-cache'}
+    date = _date(last_modified)
+    if date is not None:
+        entetes['Last-Modified'] = http_date(date)
+    return entetes
+
+
+def non_modifie(etag_, last_modified=None):
+    """
+    Renvoie une réponse 304 si les en-têtes conditionnels de la requête
+    correspondent au contenu courant, sinon None. If-None-Match est prioritaire
+    sur If-Modified-Since (RFC 9110).
+    """
+    if request.if_none_match:
+        inchange = request.if_none_match.contains_weak(etag_)
+    elif request.if_modified_since is not None and last_modified is not None:
+        inchange = _date(last_modified) <= request.if_modified_since
+    else:
+        inchange = False
+
+    if not inchange:
+        return None
+    return Response(status=304, headers=validateurs(etag_, last_modified))
+
+
+def compresser(response, seuil=1024, niveau_gzip=6, qualite_brotli=4):
+    """Compresse le corps de la réponse si le client l'accepte et qu'il dépasse le seuil."""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in MIMETYPES_COMPRESSIBLES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    encodage = request.accept_encodings.best_match(ENCODAGES)
+    if encodage is None:
+        return response
+
+    corps = response.get_data()
+    if len(corps) < seuil:
+        return response
+
+    if encodage == 'br':
+        corps = brotli.compress(corps, quality=qualite_brotli)
+    else:
+        corps = gzip.compress(corps, compresslevel=niveau_gzip, mtime=0)
+
+    response.set_data(corps)
+    response.headers['Content-Encoding'] = encodage
+
+    # Le corps envoyé change : un ETag fort (route /frames...) devient faible
+    valeur, faible = response.get_etag()
+    if valeur is not None and not faible:
+        response.set_etag(valeur, weak=True)
+    return response
+
+
+def install_compression(app, seuil=1024, niveau_gzip=6, qualite_brotli=4):
+    """Compresse les réponses de l'application après chaque requête."""
+    @app.after_request
+    def compression(response):
+        return compresser(response, seuil, niveau_gzip, qualite_brotli)
+    return app
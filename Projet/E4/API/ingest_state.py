@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+État d'ingestion partagé entre les processus (workers) de l'API.
+
+Avec plusieurs workers, un lot reçu par /receive_data_animov n'arrive que dans
+l'un d'eux : les dernières frames, les accumulateurs de la minute en cours et
+la dernière minute traitée ne peuvent plus rester dans des variables globales.
+Ils sont conservés dans une base SQLite locale (mode WAL), commune à tous les
+workers :
+
+- journal : un numéro de génération par lot ou image reçu ;
+- lots / images : derniers lots de chaque source (N par source) et dernière
+  image envoyée en binaire ;
+- comptages / sources_vues / meta : comptages de la minute en cours, sources
+  déjà vues et dernière minute traitée ;
+- minutes : statistiques des dernières minutes clôturées ;
+- meta : génération et date de la dernière consolidation de /stats_heure.
+
+Chaque lot est traité dans une transaction BEGIN IMMEDIATE : les changements de
+minute sont détectés et clôturés une seule fois, quel que soit le worker.
+Chaque worker garde une copie en mémoire (FrameStore) qu'un Synchroniseur
+met à jour à partir du journal ; les lectures restent des accès mémoire.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Module commun aux API E3 et E4 : Projet/commun/auth_store.py
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'commun')))
+
+from auth_store import ConnectionPool
+from minute_stats import MinuteAccumulator
+
+logger = logging.getLogger(__name__)
+
+SQL_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS meta (cle TEXT PRIMARY KEY, valeur TEXT)",
+    "CREATE TABLE IF NOT EXISTS journal (generation INTEGER PRIMARY KEY AUTOINCREMENT, recu REAL NOT NULL)",
+    """CREATE TABLE IF NOT EXISTS lots (
+        generation INTEGER NOT NULL,
+        source_id INTEGER NOT NULL,
+        recu REAL NOT NULL,
+        frames TEXT NOT NULL,
+        PRIMARY KEY (source_id, generation)
+    )""",
+    """CREATE TABLE IF NOT EXISTS images (
+        generation INTEGER PRIMARY KEY,
+        source_id INTEGER NOT NULL,
+        recu REAL NOT NULL,
+        jpeg BLOB NOT NULL,
+        frame_id INTEGER
+    )""",
+    """CREATE TABLE IF NOT EXISTS comptages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        source_id INTEGER NOT NULL,
+        total INTEGER NOT NULL,
+        couche INTEGER NOT NULL
+    )""",
+    "CREATE TABLE IF NOT EXISTS sources_vues (source_id INTEGER PRIMARY KEY)",
+    "CREATE TABLE IF NOT EXISTS minutes (id INTEGER PRIMARY KEY AUTOINCREMENT, evenement TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS idx_lots_generation ON lots (generation)",
+    "CREATE INDEX IF NOT EXISTS idx_images_source ON images (source_id)",
+]
+SQL_INSERT_JOURNAL = "INSERT INTO journal (recu) VALUES (?)"
+SQL_INSERT_LOT = "INSERT INTO lots (generation, source_id, recu, frames) VALUES (?, ?, ?, ?)"
+SQL_PURGE_LOTS = """
+    DELETE FROM lots WHERE source_id=? AND generation <= (
+        SELECT generation FROM lots WHERE source_id=? ORDER BY generation DESC LIMIT 1 OFFSET ?)
+"""
+SQL_INSERT_IMAGE = "INSERT INTO images (generation, source_id, recu, jpeg, frame_id) VALUES (?, ?, ?, ?, ?)"
+SQL_PURGE_IMAGES = "DELETE FROM images WHERE source_id=? AND generation<?"
+SQL_PURGE_JOURNAL = "DELETE FROM journal WHERE generation<?"
+SQL_GENERATION = "SELECT MAX(generation) FROM journal"
+SQL_LOTS_DEPUIS = "SELECT generation, recu, frames FROM lots WHERE generation>? ORDER BY generation, source_id"
+SQL_IMAGES_DEPUIS = "SELECT generation, recu, source_id, jpeg, frame_id FROM images WHERE generation>? ORDER BY generation"
+SQL_SELECT_META = "SELECT valeur FROM meta WHERE cle=?"
+SQL_UPSERT_META = "INSERT INTO meta (cle, valeur) VALUES (?, ?) ON CONFLICT(cle) DO UPDATE SET valeur=excluded.valeur"
+SQL_INSERT_META = "INSERT OR IGNORE INTO meta (cle, valeur) VALUES (?, ?)"
+SQL_INSERT_SOURCE = "INSERT OR IGNORE INTO sources_vues (source_id) VALUES (?)"
+SQL_SELECT_SOURCES = "SELECT source_id FROM sources_vues ORDER BY source_id"
+SQL_INSERT_COMPTAGE = "INSERT INTO comptages (source_id, total, couche) VALUES (?, ?, ?)"
+SQL_SELECT_COMPTAGES = "SELECT source_id, total, couche FROM comptages ORDER BY id"
+SQL_DELETE_COMPTAGES = "DELETE FROM comptages"
+SQL_INSERT_MINUTE = "INSERT INTO minutes (evenement) VALUES (?)"
+SQL_PURGE_MINUTES = "DELETE FROM minutes WHERE id<?"
+SQL_DERNIERE_MINUTE = "SELECT MAX(id) FROM minutes"
+SQL_MINUTES_DEPUIS = "SELECT id, evenement FROM minutes WHERE id>? ORDER BY id"
+SQL_SELECT_CONSOLIDATION = "SELECT cle, valeur FROM meta WHERE cle IN ('consolidation_generation', 'consolidation_date')"
+
+# Nombre de générations gardées dans le journal (seul le dernier numéro sert)
+# et de minutes clôturées conservées
+JOURNAL_MAX = 10000
+MINUTES_MAX = 100
+
+
+class TransactionIngestion:
+    """
+    État de la minute en cours pendant le traitement d'un lot ; remplace les
+    variables globales dict_resultat et last_minute de /receive_data_animov.
+    """
+
+    def __init__(self, state, conn):
+        self._state = state
+        self._conn = conn
+        ligne = conn.execute(SQL_SELECT_META, ('last_minute',)).fetchone()
+        self.last_minute = int(ligne[0]) if ligne and ligne[0] is not None else None
+        self.generation = conn.execute(SQL_GENERATION).fetchone()[0] or 0
+
+    def ajouter_lot(self, batch):
+        """Enregistre un lot de frames ; renvoie sa génération."""
+        by_source = {}
+        for frame in batch:
+            if isinstance(frame, dict) and 'source_id' in frame:
+                by_source.setdefault(frame['source_id'], []).append(frame)
+
+        if not by_source:
+            return self.generation
+
+        recu = time.time()
+        self.generation = self._conn.execute(SQL_INSERT_JOURNAL, (recu,)).lastrowid
+        for source_id, frames in by_source.items():
+            self._conn.execute(SQL_INSERT_LOT, (self.generation, source_id, recu, self._state.dumps(frames)))
+            self._conn.execute(SQL_PURGE_LOTS, (source_id, source_id, self._state.history_size))
+        self._conn.execute(SQL_PURGE_JOURNAL, (self.generation - JOURNAL_MAX,))
+        return self.generation
+
+    def ajouter_image(self, source_id, contenu, frame_id=None):
+        """Enregistre une image JPEG envoyée en binaire ; renvoie sa génération."""
+        recu = time.time()
+        self.generation = self._conn.execute(SQL_INSERT_JOURNAL, (recu,)).lastrowid
+        self._conn.execute(SQL_INSERT_IMAGE, (self.generation, source_id, recu, contenu, frame_id))
+        self._conn.execute(SQL_PURGE_IMAGES, (source_id, self.generation))
+        return self.generation
+
+    def add_frame(self, source_id, total, couche):
+        """Ajoute les comptages d'une frame à la minute en cours."""
+        self._conn.execute(SQL_INSERT_SOURCE, (source_id,))
+        self._conn.execute(SQL_INSERT_COMPTAGE, (source_id, total, couche))
+
+    def cloturer_minute(self):
+        """
+        Calcule les statistiques de la minute en cours pour chaque source déjà
+        vue (accumulateur vide si la source n'a rien envoyé), puis remet les
+        comptages à zéro. Renvoie {source_id: résultat}.
+        """
+        accumulateurs = {source_id: MinuteAccumulator()
+                         for (source_id,) in self._conn.execute(SQL_SELECT_SOURCES)}
+        for source_id, total, couche in self._conn.execute(SQL_SELECT_COMPTAGES):
+            accumulateurs[source_id].add_frame(total, couche)
+        self._conn.execute(SQL_DELETE_COMPTAGES)
+        return {source_id: accumulateur.result() for source_id, accumulateur in accumulateurs.items()}
+
+    def publier_minute(self, evenement):
+        """Conserve l'événement de fin de minute, diffusé par le Synchroniseur de chaque worker."""
+        id_ = self._conn.execute(SQL_INSERT_MINUTE, (self._state.dumps(evenement),)).lastrowid
+        self._conn.execute(SQL_PURGE_MINUTES, (id_ - MINUTES_MAX,))
+
+    def _enregistrer(self):
+        valeur = str(self.last_minute) if self.last_minute is not None else None
+        self._conn.execute(SQL_UPSERT_META, ('last_minute', valeur))
+
+
+class IngestState:
+    def __init__(self, database, history_size=10, dumps=json.dumps, loads=json.loads, pool_size=9):
+        self.database = database
+        self.history_size = history_size  # Nombre de lots conservés par source
+        self.dumps = dumps
+        self.loads = loads
+        # Une connexion par thread de requête, plus celle du Synchroniseur
+        self.pool = ConnectionPool(database, size=pool_size)
+
+        with self.pool.connection() as conn:
+            for sql in SQL_SCHEMA:
+                conn.execute(sql)
+            # Identifiant de la base, commun à tous les workers : inclus dans
+            # les ETag calculés à partir des numéros de génération.
+            conn.execute(SQL_INSERT_META, ('instance', uuid.uuid4().hex))
+            self.instance = conn.execute(SQL_SELECT_META, ('instance',)).fetchone()[0]
+
+    @contextmanager
+    def transaction(self):
+        """
+        Contexte de traitement d'un lot : verrou d'écriture SQLite pris dès le
+        début (les autres workers attendent), validation en sortie.
+        """
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            transaction = TransactionIngestion(self, conn)
+            yield transaction
+            transaction._enregistrer()
+
+    def generation(self):
+        with self.pool.connection() as conn:
+            return conn.execute(SQL_GENERATION).fetchone()[0] or 0
+
+    def derniere_minute(self):
+        with self.pool.connection() as conn:
+            return conn.execute(SQL_DERNIERE_MINUTE).fetchone()[0] or 0
+
+    def changements(self, generation):
+        """
+        Lots et images enregistrés après la génération donnée, par génération
+        croissante : ('lot', génération, date, frames) ou ('image', génération,
+        date, (source_id, jpeg, frame_id)).
+        """
+        with self.pool.connection() as conn:
+            lots = conn.execute(SQL_LOTS_DEPUIS, (generation,)).fetchall()
+            images = conn.execute(SQL_IMAGES_DEPUIS, (generation,)).fetchall()
+
+        changements = []
+        for generation_lot, recu, frames in lots:
+            if changements and changements[-1][0] == 'lot' and changements[-1][1] == generation_lot:
+                changements[-1][3].extend(self.loads(frames))  # Lot contenant plusieurs sources
+            else:
+                changements.append(('lot', generation_lot, recu, self.loads(frames)))
+        for generation_image, recu, source_id, jpeg, frame_id in images:
+            changements.append(('image', generation_image, recu, (source_id, bytes(jpeg), frame_id)))
+        changements.sort(key=lambda changement: changement[1])
+        return changements
+
+    def minutes(self, depuis):
+        """Événements de fin de minute d'identifiant supérieur à 'depuis' : [(id, événement)]."""
+        with self.pool.connection() as conn:
+            lignes = conn.execute(SQL_MINUTES_DEPUIS, (depuis,)).fetchall()
+        return [(id_, self.loads(evenement)) for id_, evenement in lignes]
+
+    def sources(self):
+        with self.pool.connection() as conn:
+            return [source_id for (source_id,) in conn.execute(SQL_SELECT_SOURCES)]
+
+    def consolidation(self):
+        """Génération (0 si aucune) et date (epoch) de la dernière consolidation publiée."""
+        with self.pool.connection() as conn:
+            valeurs = dict(conn.execute(SQL_SELECT_CONSOLIDATION).fetchall())
+        date = valeurs.get('consolidation_date')
+        return int(valeurs.get('consolidation_generation') or 0), float(date) if date else None
+
+    def publier_consolidation(self, date):
+        """Publie une nouvelle consolidation ; renvoie sa génération et sa date."""
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            ligne = conn.execute(SQL_SELECT_META, ('consolidation_generation',)).fetchone()
+            generation = int(ligne[0]) + 1 if ligne and ligne[0] else 1
+            conn.execute(SQL_UPSERT_META, ('consolidation_generation', str(generation)))
+            conn.execute(SQL_UPSERT_META, ('consolidation_date', repr(date)))
+        return generation, date
+
+
+class Synchroniseur:
+    """
+    Met à jour le FrameStore du worker à partir de l'état partagé, et signale
+    les nouveaux lots et minutes clôturées (diffusion aux clients de /stream).
+    Appelé après chaque ingestion du worker, et périodiquement par un thread
+    de fond pour les lots reçus par les autres workers.
+    """
+
+    def __init__(self, state, frame_store, on_lot=None, on_image=None, on_minute=None, interval=0.2):
+        self.state = state
+        self.frame_store = frame_store
+        self.on_lot = on_lot  # Appelée avec les frames de chaque nouveau lot
+        self.on_image = on_image  # Appelée avec la source de chaque nouvelle image
+        self.on_minute = on_minute  # Appelée avec chaque événement de fin de minute
+        self.interval = interval  # Délai (secondes) entre deux vérifications du journal
+
+        self._lock = threading.Lock()
+        self._derniere_minute = state.derniere_minute()  # Minutes déjà clôturées : pas rediffusées
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='ingest-sync', daemon=True)
+
+        # Chargement initial des lots conservés, sans notification
+        self.synchroniser(notifier=False)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def synchroniser(self, notifier=True):
+        with self._lock:
+            if self.state.generation() > self.frame_store.generation:
+                for type_, generation, recu, contenu in self.state.changements(self.frame_store.generation):
+                    if type_ == 'lot':
+                        self.frame_store.ingest(contenu, generation=generation, updated_at=recu)
+                        if notifier and self.on_lot is not None:
+                            self.on_lot(contenu)
+                    else:
+                        source_id, jpeg, frame_id = contenu
+                        self.frame_store.set_image(source_id, jpeg, frame_id=frame_id,
+                                                   generation=generation, updated_at=recu)
+                        if notifier and self.on_image is not None:
+                            self.on_image(source_id)
+
+            for id_, evenement in self.state.minutes(self._derniere_minute):
+                self._derniere_minute = id_
+                if notifier and self.on_minute is not None:
+                    self.on_minute(evenement)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.synchroniser()
+            except Exception as e:
+                logger.error(f"Échec de la synchronisation de l'état d'ingestion : {e}")
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Accumulateurs en ligne pour les statistiques par minute de /receive_data_animov.
+
+Chaque source dispose d'un MinuteAccumulator qui met à jour, frame par frame,
+la moyenne et la variance (algorithme de Welford), les minimums / maximums et
+un histogramme des comptages. Les comptages de chèvres étant de petits entiers,
+l'histogramme permet de calculer exactement les quartiles et le mode lors du
+changement de minute, en O(nombre de valeurs distinctes), et la mémoire
+utilisée par source ne dépend pas du nombre d'images par seconde.
+"""
+
+import math
+
+
+class SeriesAccumulator:
+    """Statistiques en ligne d'une série de comptages entiers."""
+
+    def __init__(self):
+        self.n = 0
+        self.somme = 0
+        self.moyenne = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        # Histogramme valeur -> effectif, dans l'ordre de première apparition
+        # (même ordre que statistics.multimode).
+        self.histogramme = {}
+
+    def add(self, valeur):
+        self.n += 1
+        self.somme += valeur
+
+        # Algorithme de Welford
+        delta = valeur - self.moyenne
+        self.moyenne += delta / self.n
+        self.m2 += delta * (valeur - self.moyenne)
+
+        if self.min is None or valeur < self.min:
+            self.min = valeur
+        if self.max is None or valeur > self.max:
+            self.max = valeur
+
+        self.histogramme[valeur] = self.histogramme.get(valeur, 0) + 1
+
+    def stdev(self):
+        # Écart type de l'échantillon, comme statistics.stdev
+        return math.sqrt(self.m2 / (self.n - 1))
+
+    def _valeur_rang(self, valeurs_triees, rang):
+        # Renvoie la valeur de rang donné (0-indexé) de la série triée
+        cumul = 0
+        for valeur in valeurs_triees:
+            cumul += self.histogramme[valeur]
+            if rang < cumul:
+                return valeur
+        return valeurs_triees[-1]
+
+    def quartiles(self):
+        # Équivalent exact de statistics.quantiles(data, n=4, method='inclusive')
+        valeurs_triees = sorted(self.histogramme)
+        m = self.n - 1
+        resultat = []
+        for i in range(1, 4):
+            j, delta = divmod(i * m, 4)
+            bas = self._valeur_rang(valeurs_triees, j)
+            haut = self._valeur_rang(valeurs_triees, j + 1) if delta else bas
+            resultat.append((bas * (4 - delta) + haut * delta) / 4)
+        return resultat
+
+    def multimode(self):
+        effectif_max = max(self.histogramme.values())
+        return [valeur for valeur, effectif in self.histogramme.items() if effectif == effectif_max]
+
+
+class MinuteAccumulator:
+    """Agrégation des comptages total / couché / debout d'une source sur une minute."""
+
+    SERIES = ('total', 'couche', 'debout')
+
+    def __init__(self):
+        self.series = {nom: SeriesAccumulator() for nom in self.SERIES}
+
+    @property
+    def nb_frames(self):
+        return self.series['total'].n
+
+    def add_frame(self, total, couche):
+        self.series['total'].add(total)
+        self.series['couche'].add(couche)
+        self.series['debout'].add(total - couche)
+
+    def result(self):
+        """
+        Renvoie le résultat de la minute au format attendu par
+        DatabaseManager.query_set_stat_minutes.
+        """
+        resultat = {'nb_frames': self.nb_frames}
+
+        for nom, serie in self.series.items():
+            resultat[nom] = serie.somme
+            resultat[f'max_{nom}'] = serie.max if serie.max is not None else 0
+            resultat[f'min_{nom}'] = serie.min if serie.min is not None else 10000
+
+            # Moins de deux frames : mêmes valeurs par défaut que l'ancien calcul
+            # basé sur le module statistics.
+            if serie.n < 2:
+                resultat[f'std_{nom}'] = 0
+                resultat[f'quartiles_{nom}'] = [0, 0, 0]
+                resultat[f'mode_{nom}'] = None
+            else:
+                resultat[f'std_{nom}'] = serie.stdev()
+                resultat[f'quartiles_{nom}'] = serie.quartiles()
+                resultat[f'mode_{nom}'] = serie.multimode()
+
+        return resultat
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Cache des réponses déjà encodées de /get_data_animov_ch.
+
+Les données ne changent qu'à la réception d'un nouveau lot : chaque entrée est
+associée à la génération du FrameStore au moment du calcul et le cache est
+vidé dès qu'une nouvelle génération est demandée. Les octets JSON sont
+renvoyés tels quels, sans calcul pandas ni sérialisation.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._generation = None
+        self._entries = OrderedDict()
+
+    def _check_generation(self, generation):
+        # Appelée avec le verrou pris : un nouveau lot invalide tout le cache
+        if generation != self._generation:
+            self._entries.clear()
+            self._generation = generation
+
+    def get(self, cle, generation):
+        with self._lock:
+            if generation != self._generation:
+                return None
+            corps = self._entries.get(cle)
+            if corps is not None:
+                self._entries.move_to_end(cle)
+            return corps
+
+    def put(self, cle, generation, corps):
+        with self._lock:
+            if self._generation is not None and generation < self._generation:
+                # Réponse calculée sur un lot déjà remplacé
+                return
+            self._check_generation(generation)
+            self._entries[cle] = corps
+            self._entries.move_to_end(cle)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
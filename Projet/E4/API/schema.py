@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Registre du schéma MySQL utilisé par l'API d'ingestion.
+
+Les définitions reprennent celles de CICD/migrations/mysql_setup.py. Les tables
+sont créées (si besoin) une seule fois, à la construction du DatabaseManager,
+puis réutilisées telles quelles pour toutes les insertions.
+
+Les tables de cumul (rollup_*) contiennent, par jour/source/heure et par
+jour/source/heure/minute, le nombre de lignes et les sommes des colonnes de
+table_chevres_heures et table_chevres_minute. Elles sont tenues à jour par des
+triggers MySQL à chaque insertion : les moyennes de /chevres_heures et
+/chevres_minutes sont lues directement, sans GROUP BY sur tout l'historique.
+
+Chaque worker de l'API exécute ces créations au démarrage : elles sont
+sérialisées par un verrou nommé MySQL (GET_LOCK), commun à tous les processus.
+"""
+
+import logging
+from contextlib import contextmanager
+
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy import Table, Column, Integer, BigInteger, MetaData, Index, Text, DECIMAL, DateTime, Float, inspect, text
+
+logger = logging.getLogger(__name__)
+
+metadata = MetaData()
+
+# Statistiques par minute calculées par /receive_data_animov
+table_chevres_minute_serveur_v2 = Table('table_chevres_minute_serveur_v2', metadata,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('timestamp', BigInteger, nullable=False),
+    Column('source', Integer, nullable=False),
+    Column('total', Integer, nullable=False),
+    Column('couche', Integer, nullable=False),
+    Column('debout', Integer, nullable=False),
+
+    Column('max_total', Integer, nullable=False),
+    Column('max_couche', Integer, nullable=False),
+    Column('max_debout', Integer, nullable=False),
+
+    Column('min_total', Integer, nullable=False),
+    Column('min_couche', Integer, nullable=False),
+    Column('min_debout', Integer, nullable=False),
+
+    Column('std_total', DECIMAL(6, 3), nullable=False),
+    Column('std_couche', DECIMAL(6, 3), nullable=False),
+    Column('std_debout', DECIMAL(6, 3), nullable=False),
+
+    Column('Q1_total', DECIMAL(6, 3), nullable=False),
+    Column('Q1_couche', DECIMAL(6, 3), nullable=False),
+    Column('Q1_debout', DECIMAL(6, 3), nullable=False),
+
+    Column('Q2_total', DECIMAL(6, 3), nullable=False),
+    Column('Q2_couche', DECIMAL(6, 3), nullable=False),
+    Column('Q2_debout', DECIMAL(6, 3), nullable=False),
+
+    Column('Q3_total', DECIMAL(6, 3), nullable=False),
+    Column('Q3_couche', DECIMAL(6, 3), nullable=False),
+    Column('Q3_debout', DECIMAL(6, 3), nullable=False),
+
+    Column('mode_total', Text, nullable=True),
+    Column('mode_couche', Text, nullable=True),
+    Column('mode_debout', Text, nullable=True),
+
+    Column('nb_frames', Integer, nullable=False)
+)
+
+Index('idx_timestamp', table_chevres_minute_serveur_v2.c.timestamp)
+Index('idx_source', table_chevres_minute_serveur_v2.c.source)
+# Séries par source et plage de temps (/get_serie_*, vues vue_chevres_serie_* et vue_chevre_derniere_*)
+Index('idx_source_timestamp', table_chevres_minute_serveur_v2.c.source, table_chevres_minute_serveur_v2.c.timestamp)
+
+# Totaux par minute (ancienne version, sans les statistiques de dispersion)
+table_chevres_minute_serveur = Table('table_chevres_minute_serveur', metadata,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('timestamp', BigInteger, nullable=False),
+    Column('source', Integer, nullable=False),
+    Column('total', Integer, nullable=False),
+    Column('couche', Integer, nullable=False),
+    Column('debout', Integer, nullable=False),
+    Column('nb_frames', Integer, nullable=False)
+)
+
+Index('idx_timestamp', table_chevres_minute_serveur.c.timestamp)
+Index('idx_source', table_chevres_minute_serveur.c.source)
+
+# Tables écrites par l'API, créées au démarrage si elles n'existent pas
+TABLES_INGESTION = [table_chevres_minute_serveur_v2, table_chevres_minute_serveur]
+
+# Colonnes moyennées par /chevres_heures et /chevres_minutes
+COLONNES_ACTIVITE = ['brush', 'drink', 'eat', 'class_0', 'class_1']
+
+
+def _table_rollup(nom, cles):
+    colonnes = [Column(cle, DateTime if cle == 'jour' else BigInteger, primary_key=True, autoincrement=False)
+                for cle in cles]
+    colonnes.append(Column('nb', BigInteger, nullable=False))
+    colonnes += [Column(f'somme_{colonne}', Float(precision=53), nullable=False) for colonne in COLONNES_ACTIVITE]
+    return Table(nom, metadata, *colonnes)
+
+# Cumuls par jour/source/heure de table_chevres_heures
+rollup_chevres_heures = _table_rollup('rollup_chevres_heures', ['jour', 'source', 'heure'])
+
+# Cumuls par jour/source/heure/minute de table_chevres_minute
+rollup_chevres_minute = _table_rollup('rollup_chevres_minute', ['jour', 'source', 'heure', 'minutes'])
+
+# Table source -> (table de cumul, colonnes de regroupement, nom du trigger)
+ROLLUPS = {
+    'table_chevres_heures': (rollup_chevres_heures, ['jour', 'source', 'heure'], 'trg_rollup_chevres_heures'),
+    'table_chevres_minute': (rollup_chevres_minute, ['jour', 'source', 'heure', 'minutes'], 'trg_rollup_chevres_minute'),
+}
+
+
+def _sql_trigger(source, rollup, cles, trigger):
+    colonnes = cles + ['nb'] + [f'somme_{c}' for c in COLONNES_ACTIVITE]
+    valeurs = [f'NEW.{cle}' for cle in cles] + ['1'] + [f'NEW.{c}' for c in COLONNES_ACTIVITE]
+    cumuls = ['nb = nb + 1'] + [f'somme_{c} = somme_{c} + NEW.{c}' for c in COLONNES_ACTIVITE]
+    return f"""
+        CREATE TRIGGER {trigger} AFTER INSERT ON {source}
+        FOR EACH ROW
+        INSERT INTO {rollup.name} ({', '.join(colonnes)})
+        VALUES ({', '.join(valeurs)})
+        ON DUPLICATE KEY UPDATE {', '.join(cumuls)}
+    """
+
+
+def _sql_backfill(source, rollup, cles):
+    colonnes = cles + ['nb'] + [f'somme_{c}' for c in COLONNES_ACTIVITE]
+    agregats = cles + ['COUNT(*)'] + [f'SUM({c})' for c in COLONNES_ACTIVITE]
+    return f"""
+        REPLACE INTO {rollup.name} ({', '.join(colonnes)})
+        SELECT {', '.join(agregats)}
+        FROM {source}
+        GROUP BY {', '.join(cles)}
+    """
+
+
+# Codes d'erreur MySQL ER_TRG_ALREADY_EXISTS (« Trigger already exists ») et
+# ER_DUP_KEYNAME (« Duplicate key name », index déjà créé)
+ERREUR_TRIGGER_EXISTANT = 1359
+ERREUR_INDEX_EXISTANT = 1061
+
+
+def code_erreur_mysql(erreur):
+    """Code d'erreur MySQL d'une exception SQLAlchemy (None s'il est inconnu)."""
+    args = getattr(erreur.orig, 'args', None)
+    return args[0] if args and isinstance(args[0], int) else None
+
+
+@contextmanager
+def verrou_nomme(connection, nom, timeout=30):
+    """
+    Verrou nommé MySQL (GET_LOCK), partagé par tous les workers connectés à la
+    même base. Si le verrou n'est pas obtenu dans le délai, le bloc est tout
+    de même exécuté (les créations restent tolérantes aux doublons).
+    """
+    obtenu = connection.execute(text("SELECT GET_LOCK(:nom, :timeout)"),
+                                {'nom': nom, 'timeout': timeout}).scalar() == 1
+    if not obtenu:
+        logger.warning(f"Verrou {nom} non obtenu après {timeout} s")
+    try:
+        yield obtenu
+    finally:
+        if obtenu:
+            connection.execute(text("SELECT RELEASE_LOCK(:nom)"), {'nom': nom})
+
+
+def bootstrap_rollups(engine):
+    """
+    Crée les tables de cumul et leurs triggers, puis remplit les cumuls à
+    partir de l'historique s'ils sont vides. Renvoie True si les cumuls
+    sont utilisables.
+    """
+    tables = set(inspect(engine).get_table_names())
+    manquantes = [source for source in ROLLUPS if source not in tables]
+    if manquantes:
+        logger.warning(f"Tables {manquantes} absentes : cumuls non créés")
+        return False
+
+    metadata.create_all(engine, tables=[rollup for rollup, _, _ in ROLLUPS.values()], checkfirst=True)
+
+    with engine.connect() as connection, verrou_nomme(connection, 'animov_bootstrap_rollups'):
+        # MySQL 5.7 ne connaît pas CREATE TRIGGER IF NOT EXISTS
+        existants = set(connection.execute(text(
+            "SELECT TRIGGER_NAME FROM information_schema.TRIGGERS WHERE TRIGGER_SCHEMA = DATABASE()"
+        )).scalars())
+
+        for source, (rollup, cles, trigger) in ROLLUPS.items():
+            # Trigger créé avant le remplissage : les lignes insérées pendant
+            # le remplissage sont comptées, REPLACE recalculant les groupes.
+            if trigger not in existants:
+                try:
+                    connection.execute(text(_sql_trigger(source, rollup, cles, trigger)))
+                except DBAPIError as e:
+                    # Créé entre-temps par un autre worker (verrou non obtenu)
+                    if code_erreur_mysql(e) != ERREUR_TRIGGER_EXISTANT:
+                        raise
+                    logger.info(f"Trigger {trigger} déjà créé")
+
+            if connection.execute(text(f"SELECT 1 FROM {rollup.name} LIMIT 1")).first() is None:
+                connection.execute(text(_sql_backfill(source, rollup, cles)))
+                logger.info(f"Cumuls {rollup.name} initialisés depuis {source}")
+        connection.commit()
+    return True
+
+
+def bootstrap_schema(engine):
+    """
+    Crée les tables d'ingestion et les index manquants (une seule fois, au
+    démarrage), sous un verrou nommé : les workers démarrés en même temps
+    ne construisent pas chacun les mêmes index.
+    """
+    with engine.connect() as connection, verrou_nomme(connection, 'animov_bootstrap_schema'):
+        metadata.create_all(connection, tables=TABLES_INGESTION, checkfirst=True)
+
+        # create_all ne crée les index qu'avec les nouvelles tables : ajout des
+        # index manquants sur les tables déjà en place.
+        inspecteur = inspect(connection)
+        for table in TABLES_INGESTION:
+            existants = {index['name'] for index in inspecteur.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existants:
+                    continue
+                try:
+                    index.create(connection)
+                    logger.info(f"Index {index.name} créé sur {table.name}")
+                except DBAPIError as e:
+                    # Créé entre-temps par un autre worker (verrou non obtenu)
+                    if code_erreur_mysql(e) != ERREUR_INDEX_EXISTANT:
+                        raise
+                    logger.info(f"Index {index.name} déjà créé")
+        connection.commit()
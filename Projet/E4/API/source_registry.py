@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Registre des sources (caméras) connues de l'API.
+
+Les sources sont chargées au démarrage depuis la base (ou, à défaut, depuis
+config.yaml) puis complétées par les sources vues à l'ingestion. La validation
+du paramètre 'sources' des requêtes se fait par appartenance à un ensemble.
+"""
+
+import logging
+import threading
+
+
+class SourceRegistry:
+    def __init__(self, sources=None):
+        self._lock = threading.Lock()
+        self._sources = set(int(source) for source in (sources or []))
+
+    def load(self, charger_sources, sources_defaut=None):
+        """
+        Charge les sources avec la fonction charger_sources (requête en base) ;
+        en cas d'échec, utilise la liste sources_defaut de la configuration.
+        """
+        try:
+            sources = [int(source) for source in charger_sources()]
+        except Exception as e:
+            logging.error(f"Chargement des sources depuis la base impossible : {e}")
+            sources = [int(source) for source in (sources_defaut or [])]
+
+        with self._lock:
+            self._sources.update(sources)
+
+    def add(self, source_id):
+        with self._lock:
+            self._sources.add(int(source_id))
+
+    def sources(self):
+        with self._lock:
+            return sorted(self._sources)
+
+    @staticmethod
+    def parse(sources):
+        """Convertit '3,1,3' en [1, 3] ; lève ValueError si le champ est invalide."""
+        if not sources:
+            raise ValueError("Aucune source")
+        return sorted(set(int(source) for source in sources.split(',')))
+
+    def inconnues(self, sources):
+        with self._lock:
+            return [source for source in sources if source not in self._sources]
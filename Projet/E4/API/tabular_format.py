@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Formats de réponse des routes tabulaires (paramètre de requête 'format').
+
+- records (par défaut) : liste d'objets, comme df.to_dict(orient='records') ;
+- columnar : un tableau de valeurs par colonne, dates en timestamps Unix
+  (secondes) listées dans 'datetime_columns' ;
+- arrow : flux Apache Arrow IPC ;
+- parquet : fichier Parquet.
+
+Les formats arrow et parquet nécessitent pyarrow (dépendance optionnelle).
+"""
+
+import io
+from functools import wraps
+
+import pandas as pd
+from flask import Response, jsonify, request
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow absent : seuls les formats JSON sont proposés
+    pa = None
+    pq = None
+
+FORMATS = ['records', 'columnar', 'arrow', 'parquet']
+FORMATS_BINAIRES = ['arrow', 'parquet']
+
+MIMETYPE_ARROW = 'application/vnd.apache.arrow.stream'
+MIMETYPE_PARQUET = 'application/vnd.apache.parquet'
+
+
+class FormatIndisponible(ValueError):
+    """Format binaire demandé alors que pyarrow n'est pas installé."""
+
+
+def format_demande(args):
+    """Lit le paramètre 'format' ; lève ValueError si la valeur est inconnue."""
+    format_ = args.get('format', 'records')
+    if format_ not in FORMATS:
+        raise ValueError(f"Format inconnu : {format_}")
+    if format_ in FORMATS_BINAIRES and pa is None:
+        raise FormatIndisponible(f"Le format {format_} nécessite pyarrow")
+    return format_
+
+
+def columnar(df):
+    """Convertit un DataFrame en colonnes JSON ; les dates deviennent des timestamps Unix."""
+    data = {}
+    datetime_columns = []
+    for colonne in df.columns:
+        serie = df[colonne]
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            datetime_columns.append(colonne)
+            secondes = (serie - pd.Timestamp(0, tz=serie.dt.tz)) // pd.Timedelta(seconds=1)
+            data[colonne] = secondes.astype(object).where(serie.notna(), None).tolist()
+        else:
+            data[colonne] = serie.astype(object).where(serie.notna(), None).tolist()
+    return {
+        'columns': [str(colonne) for colonne in df.columns],
+        'datetime_columns': datetime_columns,
+        'data': {str(colonne): valeurs for colonne, valeurs in data.items()},
+    }
+
+
+def reponse_tabulaire(df, format_='records'):
+    if format_ == 'columnar':
+        return jsonify(columnar(df))
+
+    if format_ == 'arrow':
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return Response(sink.getvalue().to_pybytes(), mimetype=MIMETYPE_ARROW)
+
+    if format_ == 'parquet':
+        buffer = io.BytesIO()
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), buffer)
+        return Response(buffer.getvalue(), mimetype=MIMETYPE_PARQUET)
+
+    return jsonify(df.to_dict(orient='records'))
+
+
+def format_tabulaire(f):
+    """
+    Décorateur des routes qui renvoient un DataFrame (ou un couple DataFrame,
+    en-têtes) : le paramètre 'format' est validé avant l'appel de la route.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        try:
+            format_ = format_demande(request.args)
+        except FormatIndisponible as e:
+            return jsonify({'error': str(e)}), 406
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        resultat = f(*args, **kwargs)
+        entetes = {}
+        if isinstance(resultat, tuple) and isinstance(resultat[0], pd.DataFrame):
+            resultat, entetes = resultat
+        if not isinstance(resultat, pd.DataFrame):
+            return resultat  # Réponse d'erreur construite par la route
+
+        response = reponse_tabulaire(resultat, format_)
+        response.headers.update(entetes)
+        return response
+    return decorated
@@ -1,4 +1,10 @@
+import gzip
 import json
+import sqlite3
+import datetime
+import contextlib
+
+import db_utils
 
 # Test de la route de login avec des informations d'identification correctes
 def test_login_success(client):
@@ -154,3 +160,348 @@ def test_get_data_animov_ch(client):
         data = json.loads(response.data)
         # Vérifier que la réponse est un dictionnaire
         assert isinstance(data, dict), "La réponse de la route /get_data_animov_ch n'est pas du bon type"
+
+# Test de l'historique des lots reçus pour une source
+def test_get_data_animov_ch_history(client):
+    # Envoyer un lot pour la source 1
+    data_to_send = [{
+        "source_id": 1,
+        "frame_id": 42,
+        "date": ["2024-07-31 13:46:00.000"],
+        "detect": [[1, 100, 100, 200, 200, 0.9, 1, False, False, False]]
+    }]
+    client.post('/receive_data_animov', json=data_to_send)
+
+    response = client.post('/login', json={
+        'username': 'arscg',
+        'password': 'arscg'
+    })
+    token = json.loads(response.data)['token']
+
+    response = client.get('/get_data_animov_ch_history', headers={'x-access-tokens': token}, query_string={'source': 1, 'n': 1})
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    # Le dernier lot de la source 1 est celui qui vient d'être envoyé
+    assert data['data'][-1][0]['frame_id'] == 42
+
+    # Le paramètre source est obligatoire
+    response = client.get('/get_data_animov_ch_history', headers={'x-access-tokens': token})
+    assert response.status_code == 400
+
+# Test du cache de réponses de /get_data_animov_ch
+def test_get_data_animov_ch_cache(client):
+    response = client.post('/login', json={
+        'username': 'arscg',
+        'password': 'arscg'
+    })
+    token = json.loads(response.data)['token']
+    params = {'sources': "1,2", 'with_images': "False", 'with_detect': False, 'with_stats': True, 'with_global_stats': True}
+
+    # Deux requêtes identiques sans nouveau lot renvoient la même réponse
+    premiere = client.get('/get_data_animov_ch', headers={'x-access-tokens': token}, query_string=params)
+    seconde = client.get('/get_data_animov_ch', headers={'x-access-tokens': token}, query_string=params)
+    assert premiere.status_code == 200
+    assert premiere.data == seconde.data
+
+    # Un nouveau lot invalide le cache
+    client.post('/receive_data_animov', json=[{
+        "source_id": 2,
+        "frame_id": 7,
+        "date": ["2024-07-31 13:47:00.000"],
+        "detect": [[1, 100, 100, 200, 200, 0.9, 1, False, False, False]]
+    }])
+    troisieme = client.get('/get_data_animov_ch', headers={'x-access-tokens': token}, query_string=params)
+    data = json.loads(troisieme.data)
+    assert any(entry.get('frame_id') == 7 for entry in data['data'])
+
+# Test de la validation des sources de /get_data_animov_ch
+def test_get_data_animov_ch_sources_invalides(client):
+    response = client.post('/login', json={
+        'username': 'arscg',
+        'password': 'arscg'
+    })
+    token = json.loads(response.data)['token']
+    params = {'with_images': "False", 'with_detect': False, 'with_stats': False, 'with_global_stats': False}
+
+    # Source inconnue
+    response = client.get('/get_data_animov_ch', headers={'x-access-tokens': token}, query_string=dict(params, sources="999"))
+    assert response.status_code == 400
+
+    # Champ sources mal formé
+    response = client.get('/get_data_animov_ch', headers={'x-access-tokens': token}, query_string=dict(params, sources="1,a"))
+    assert response.status_code == 400
+
+    # Sources dans le désordre et en double
+    response = client.get('/get_data_animov_ch', headers={'x-access-tokens': token}, query_string=dict(params, sources="4,1,4"))
+    assert response.status_code == 200
+
+# Test de l'envoi et de la récupération d'une image binaire
+def test_frames(client):
+    response = client.post('/login', json={
+        'username': 'arscg',
+        'password': 'arscg'
+    })
+    token = json.loads(response.data)['token']
+
+    # Envoi d'une image brute pour la source 1
+    image = b'\xff\xd8\xff\xe0test-jpeg\xff\xd9'
+    response = client.post('/frames/1', data=image, content_type='image/jpeg', headers={'X-Frame-Id': '12'})
+    assert response.status_code == 200
+    etag = json.loads(response.data)['etag']
+
+    # Récupération de l'image en binaire
+    response = client.get('/frames/1', headers={'x-access-tokens': token})
+    assert response.status_code == 200
+    assert response.mimetype == 'image/jpeg'
+    assert response.data == image
+
+    # Image inchangée : réponse 304 sans corps
+    response = client.get('/frames/1', headers={'x-access-tokens': token, 'If-None-Match': f'"{etag}"'})
+    assert response.status_code == 304
+
+    # Le JSON ne contient plus que la référence de l'image
+    params = {'sources': "1", 'with_images': "Ref", 'with_detect': False, 'with_stats': False, 'with_global_stats': False}
+    response = client.get('/get_data_animov_ch', headers={'x-access-tokens': token}, query_string=params)
+    data = json.loads(response.data)
+    assert data['data'][0]['frame_url'] == '/frames/1'
+    assert 'frame' not in data['data'][0]
+
+# Deux logins successifs renvoient le même token tant qu'il reste valide
+def test_login_reutilise_token(client):
+    tokens = []
+    for _ in range(2):
+        response = client.post('/login', json={
+            'username': 'arscg',
+            'password': 'arscg'
+        })
+        assert response.status_code == 200
+        tokens.append(json.loads(response.data)['token'])
+    assert tokens[0] == tokens[1]
+
+# Les tokens expirés sont supprimés par la purge
+def test_purge_tokens_expires(client):
+    expiration = datetime.datetime.utcnow() - datetime.timedelta(minutes=5)
+    with sqlite3.connect(db_utils.DATABASE) as conn:
+        conn.execute("INSERT INTO tokens (token, username, expiration) VALUES (?, ?, ?)",
+                     ('token-expire', 'arscg', expiration))
+        conn.commit()
+
+    assert db_utils.purge_expired_tokens() >= 1
+
+    with sqlite3.connect(db_utils.DATABASE) as conn:
+        restants = conn.execute("SELECT COUNT(*) FROM tokens WHERE token=?", ('token-expire',)).fetchone()[0]
+    assert restants == 0
+
+# Une plage de dates mal formée est refusée avant toute requête en base
+def test_chevres_plage_dates_invalide(client):
+    response = client.post('/login', json={
+        'username': 'arscg',
+        'password': 'arscg'
+    })
+    token = json.loads(response.data)['token']
+
+    for route in ['/chevres_heures', '/chevres_minutes']:
+        response = client.get(route, headers={'x-access-tokens': token}, query_string={'start': '27/09/2023'})
+        assert response.status_code == 400, f"Echec sur la route {route}"
+
+# Des filtres mal formés sur les séries sont refusés avant toute requête en base
+def test_get_serie_filtres_invalides(client):
+    response = client.post('/login', json={
+        'username': 'arscg',
+        'password': 'arscg'
+    })
+    token = json.loads(response.data)['token']
+
+    for route in ['/get_serie_heure', '/get_serie_jour', '/get_serie_last_heure', '/get_serie_last_jour']:
+        for params in [{'source': 'a'}, {'start': 'hier'}, {'limit': '0'}]:
+            response = client.get(route, headers={'x-access-tokens': token}, query_string=params)
+            assert response.status_code == 400, f"Echec sur la route {route} avec {params}"
+
+# Un format de réponse inconnu est refusé
+def test_format_inconnu(client):
+    response = client.post('/login', json={
+        'username': 'arscg',
+        'password': 'arscg'
+    })
+    token = json.loads(response.data)['token']
+
+    response = client.get('/chevres_heures', headers={'x-access-tokens': token}, query_string={'format': 'xml'})
+    assert response.status_code == 400
+
+# Réponses conditionnelles (ETag / 304) et compression de /get_data_animov_ch
+def test_get_data_animov_ch_conditionnel(client):
+    response = client.post('/login', json={
+        'username': 'arscg',
+        'password': 'arscg'
+    })
+    token = json.loads(response.data)['token']
+    params = {'sources': "1,2,3,4", 'with_images': "False", 'with_detect': True, 'with_stats': True, 'with_global_stats': True}
+
+    premiere = client.get('/get_data_animov_ch', headers={'x-access-tokens': token}, query_string=params)
+    assert premiere.status_code == 200
+    etag = premiere.headers['ETag']
+    assert 'Last-Modified' in premiere.headers
+
+    # Aucun nouveau lot : 304 sans corps
+    response = client.get('/get_data_animov_ch', headers={'x-access-tokens': token, 'If-None-Match': etag}, query_string=params)
+    assert response.status_code == 304
+    assert response.data == b''
+
+    # Corps compressé si le client accepte gzip
+    response = client.get('/get_data_animov_ch', headers={'x-access-tokens': token, 'Accept-Encoding': 'gzip'}, query_string=params)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == premiere.data
+
+    # Un nouveau lot change l'ETag
+    client.post('/receive_data_animov', json=[{
+        "source_id": 1,
+        "frame_id": 8,
+        "date": ["2024-07-31 13:48:00.000"],
+        "detect": [[1, 100, 100, 200, 200, 0.9, 1, False, False, False]]
+    }])
+    response = client.get('/get_data_animov_ch', headers={'x-access-tokens': token, 'If-None-Match': etag}, query_string=params)
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+# Flux SSE : un lot reçu est poussé aux clients de /stream
+def test_stream(client):
+    response = client.post('/login', json={
+        'username': 'arscg',
+        'password': 'arscg'
+    })
+    token = json.loads(response.data)['token']
+
+    response = client.get('/stream', headers={'x-access-tokens': token}, buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    flux = iter(response.response)
+    assert next(flux).startswith(b'retry:')
+
+    client.post('/receive_data_animov', json=[{
+        "source_id": 3,
+        "frame_id": 9,
+        "date": ["2024-07-31 13:49:00.000"],
+        "detect": [[1, 100, 100, 200, 200, 0.9, 1, False, False, False],
+                   [2, 300, 100, 400, 200, 0.8, 0, False, False, False]]
+    }])
+    # Un événement 'minute' précède le lot si la minute a changé
+    message = next(flux).decode('utf-8')
+    if 'event: minute' in message:
+        message = next(flux).decode('utf-8')
+    assert 'event: frames' in message
+    data = json.loads(message.split('data: ')[1])
+    assert data['sources']['3']['frame_id'] == 9
+    assert data['sources']['3']['stats'] == {'count': 2, 'debout': 1, 'couche': 1}
+    response.close()
+
+# Cache des statistiques globales : réutilisé pour un même lot, invalidé par le lot suivant
+def test_global_stats_cache(monkeypatch):
+    import api_data_animov
+
+    calculs = []
+    def calcul(json_, sources):
+        calculs.append(sources)
+        return [{'source_1': {'avg_count': len(calculs)}}]
+    monkeypatch.setattr(api_data_animov, 'global_stats_data_animov_send', calcul)
+    monkeypatch.setattr(api_data_animov.frame_store, 'generation', 1000)
+    api_data_animov.global_stats_cache.clear()
+
+    premier = api_data_animov.global_stats_data_animov_cached([], '1', 'True')
+    assert api_data_animov.global_stats_data_animov_cached([], '1', 'True') is premier
+    assert calculs == ['1']
+
+    # Nouveau lot : l'entrée précédente est remplacée
+    monkeypatch.setattr(api_data_animov.frame_store, 'generation', 1001)
+    second = api_data_animov.global_stats_data_animov_cached([], '1', 'True')
+    assert second != premier
+    assert calculs == ['1', '1']
+    assert list(api_data_animov.global_stats_cache) == [(1001, '1', 'True')]
+
+    # Résultat calculé sur un lot déjà remplacé : le cache n'est pas écrasé
+    monkeypatch.setattr(api_data_animov.frame_store, 'generation', 1000)
+    api_data_animov.global_stats_data_animov_cached([], '2', 'True')
+    assert list(api_data_animov.global_stats_cache) == [(1001, '1', 'True')]
+
+# Pool de connexions de la base des tokens épuisé : 503 (à réessayer) au lieu d'une erreur 500
+def test_pool_epuise(client, monkeypatch):
+    response = client.post('/login', json={
+        'username': 'arscg',
+        'password': 'arscg'
+    })
+    token = json.loads(response.data)['token']
+
+    store = db_utils.store()
+    store.token_cache.clear()  # Validation en base, sans le cache des tokens
+    monkeypatch.setattr(store.pool, 'timeout', 0.05)
+    with contextlib.ExitStack() as connexions:
+        for _ in range(store.pool.size):
+            connexions.enter_context(store.pool.connection())
+        response = client.post('/logout', headers={'x-access-tokens': token})
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+
+    # Connexions rendues : la requête aboutit
+    response = client.post('/logout', headers={'x-access-tokens': token})
+    assert response.status_code == 200
+
+# /stats_minute : Last-Modified correspond à la minute la plus récente (timestamps Unix en secondes)
+def test_stats_minute_last_modified(client, monkeypatch):
+    import pandas as pd
+    import api_data_animov
+
+    minutes = pd.DataFrame({'timestamp': [1722433500, 1722433560], 'source': [1, 2], 'total': [5, 4]})
+    monkeypatch.setattr(api_data_animov.db_manager, 'query_get_stats_minute', lambda: minutes)
+
+    response = client.post('/login', json={
+        'username': 'arscg',
+        'password': 'arscg'
+    })
+    token = json.loads(response.data)['token']
+
+    response = client.get('/stats_minute', headers={'x-access-tokens': token})
+    assert response.status_code == 200
+    assert response.headers['Last-Modified'] == 'Wed, 31 Jul 2024 13:46:00 GMT'
+    assert response.last_modified == datetime.datetime.fromtimestamp(1722433560, datetime.timezone.utc)
+
+    # Même minute : 304 ; minute suivante : nouvelle réponse
+    response = client.get('/stats_minute', headers={'x-access-tokens': token,
+                                                     'If-Modified-Since': response.headers['Last-Modified']})
+    assert response.status_code == 304
+    minutes.loc[2] = [1722433620, 1, 6]
+    response = client.get('/stats_minute', headers={'x-access-tokens': token,
+                                                     'If-Modified-Since': 'Wed, 31 Jul 2024 13:46:00 GMT'})
+    assert response.status_code == 200
+
+# /stream : au-delà du nombre maximal de clients par worker, 503
+def test_stream_complet(client, monkeypatch):
+    import api_data_animov
+
+    response = client.post('/login', json={
+        'username': 'arscg',
+        'password': 'arscg'
+    })
+    token = json.loads(response.data)['token']
+
+    monkeypatch.setattr(api_data_animov.event_broker, 'max_subscribers', api_data_animov.event_broker.subscribers())
+    response = client.get('/stream', headers={'x-access-tokens': token})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '30'
+
+# Deux workers sur la même base des tokens : un logout chez l'un est vu par le cache de l'autre
+def test_revocation_partagee_entre_workers(tmp_path):
+    from auth_store import AuthStore
+
+    database = str(tmp_path / 'tokens.db')
+    worker_1 = AuthStore(database, revocations_intervalle=0)
+    worker_2 = AuthStore(database, revocations_intervalle=0)
+    worker_1.init_db()
+    worker_1.add_user('arscg', 'arscg')
+
+    token = worker_1.authenticate_user('arscg', 'arscg', 'secret')
+    assert worker_1.validate_token(token, 'secret') is None
+    assert worker_2.validate_token(token, 'secret') is None
+    assert worker_1.token_cache.get(token, 'secret') is not None  # Token gardé en cache
+
+    worker_2.revoke_token(token)
+    assert worker_1.validate_token(token, 'secret') == 'Token invalide'
+    assert worker_2.validate_token(token, 'secret') == 'Token invalide'
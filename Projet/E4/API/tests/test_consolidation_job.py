@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+from consolidation_job import ConsolidationJob
+from ingest_state import IngestState
+
+# Des rafraîchissements simultanés ne lancent qu'une consolidation
+def test_refresh_regroupe_les_appels_simultanes():
+    appels = []
+
+    def consolider():
+        appels.append(1)
+        time.sleep(0.2)
+        return len(appels)
+
+    job = ConsolidationJob(consolider)
+    depart = threading.Barrier(5)
+    resultats = []
+
+    def rafraichir():
+        depart.wait()
+        resultats.append(job.refresh())
+
+    threads = [threading.Thread(target=rafraichir) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(appels) == 1
+    assert all(resultat[:2] == (1, 1) for resultat in resultats)
+
+# En cas d'échec, le dernier résultat consolidé est conservé
+def test_refresh_echec_conserve_le_resultat():
+    valeurs = iter(['premier'])
+
+    def consolider():
+        return next(valeurs)
+
+    job = ConsolidationJob(consolider)
+    assert job.get()[:2] == ('premier', 1)
+
+    with pytest.raises(StopIteration):
+        job.refresh()
+    assert job.snapshot()[:2] == ('premier', 1)
+
+# Deux workers : une seule consolidation, l'autre relit le résultat publié avec la même génération
+def test_un_seul_worker_consolide(tmp_path):
+    database = str(tmp_path / 'ingest_state.db')
+    verrou = threading.Lock()
+    appels, lectures = [], []
+
+    def consolider():
+        appels.append(1)
+        time.sleep(0.2)
+        return 'consolide'
+
+    def lire():
+        lectures.append(1)
+        return 'consolide'
+
+    def verrou_commun():
+        # Verrou entre processus (GET_LOCK en production)
+        class Contexte:
+            def __enter__(self):
+                return verrou.acquire(timeout=5)
+            def __exit__(self, *exc):
+                verrou.release()
+        return Contexte()
+
+    jobs = [ConsolidationJob(consolider, load_fn=lire, partage=IngestState(database), verrou=verrou_commun)
+            for _ in range(2)]
+    depart = threading.Barrier(2)
+    resultats = []
+
+    def rafraichir(job):
+        depart.wait()
+        resultats.append(job.refresh())
+
+    threads = [threading.Thread(target=rafraichir, args=(job,)) for job in jobs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(appels) == 1 and len(lectures) == 1
+    assert resultats[0] == resultats[1]
+    assert resultats[0][:2] == ('consolide', 1)
+
+    # Consolidation récente publiée : le thread de fond d'un nouveau worker relit sans consolider
+    nouveau = ConsolidationJob(consolider, load_fn=lire, partage=IngestState(database), verrou=verrou_commun)
+    assert not nouveau._a_consolider()
+    assert nouveau.get() == resultats[0]
+    assert len(appels) == 1 and len(lectures) == 2
+
+    # Nouvelle consolidation par un worker : les autres la reprennent à la lecture suivante
+    jobs[0].refresh()
+    assert jobs[1].get()[1] == nouveau.get()[1] == 2
+    assert len(appels) == 2
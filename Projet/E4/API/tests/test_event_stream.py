@@ -0,0 +1,43 @@
+import json
+
+from event_stream import EventBroker, format_sse
+
+# Format d'un message SSE
+def test_format_sse():
+    assert format_sse('frames', '{"a": 1}', 3) == 'id: 3\nevent: frames\ndata: {"a": 1}\n\n'
+    assert format_sse('minute', 'a\nb') == 'event: minute\ndata: a\ndata: b\n\n'
+
+# Diffusion à chaque abonné, file bornée et désabonnement à la fermeture du flux
+def test_publication_abonnes():
+    broker = EventBroker(max_queue=2, keepalive=0.01)
+    premier = broker.subscribe()
+    second = broker.subscribe()
+
+    broker.publish('frames', {'n': 1})
+    assert json.loads(premier.get(0).split('data: ')[1]) == {'n': 1}
+    assert second.get(0) is not None
+
+    # Client lent : seuls les événements les plus récents sont gardés
+    for n in range(5):
+        broker.publish('frames', {'n': n})
+    messages = [premier.get(0), premier.get(0), premier.get(0)]
+    assert '"n": 3' in messages[0] and '"n": 4' in messages[1] and messages[2] is None
+
+    flux = broker.stream(premier)
+    assert next(flux).startswith('retry:')
+    assert next(flux) == ': keepalive\n\n'
+    flux.close()
+    assert broker.subscribers() == 1
+
+# Nombre d'abonnés borné : une place se libère à la fermeture d'un flux
+def test_nombre_maximal_abonnes():
+    broker = EventBroker(keepalive=0.01, max_subscribers=2)
+    premier = broker.subscribe()
+    assert broker.subscribe() is not None
+    assert broker.subscribe() is None
+
+    flux = broker.stream(premier)
+    next(flux)
+    flux.close()
+    assert broker.subscribe() is not None
+    assert broker.subscribers() == 2
@@ -0,0 +1,37 @@
+import random
+
+import numpy as np
+import pandas as pd
+
+from frame_stats import stats_frames, COLONNES_STATS
+
+# Les statistiques vectorisées doivent correspondre à un describe() pandas par frame
+def test_stats_frames_equivalent_describe():
+    random.seed(1)
+    lot = []
+    for frame_id, nb in enumerate([1, 2, 3, 7, 20]):
+        detect = [[i, random.uniform(0, 1200), random.uniform(0, 600), random.uniform(0, 1200), random.uniform(0, 600),
+                   random.uniform(0.3, 0.99), random.randint(0, 1), False, False, False] for i in range(nb)]
+        lot.append({'source_id': 1, 'frame_id': frame_id, 'detect': detect})
+
+    resultat = stats_frames([dict(item) for item in lot])
+
+    for item, item_stats in zip(lot, resultat):
+        df = pd.DataFrame(item['detect']).iloc[:, 1:7]
+        df.columns = COLONNES_STATS
+        df[['x_min', 'y_min', 'x_max', 'y_max']] = df[['x_min', 'y_min', 'x_max', 'y_max']].astype(int)
+        df['score'] = df['score'].round(3)
+        attendu = df.describe().transpose()
+
+        stats = item_stats['stats']
+        for nom in ['mean', 'std', 'min', '25%', '50%', '75%', 'max']:
+            assert list(stats[nom].keys()) == COLONNES_STATS
+            assert np.allclose(list(stats[nom].values()), attendu[nom].values, atol=1e-3, equal_nan=True)
+        assert stats['count'] == len(item['detect'])
+        assert stats['debout'] == sum(1 for d in item['detect'] if d[6] == 0)
+        assert stats['couche'] == sum(1 for d in item['detect'] if d[6] == 1)
+
+# Une frame sans détection ne reçoit pas de statistiques
+def test_stats_frames_sans_detection():
+    resultat = stats_frames([{'source_id': 1, 'detect': []}])
+    assert 'stats' not in resultat[0]
@@ -0,0 +1,69 @@
+import gzip
+import datetime
+
+from flask import Flask, jsonify
+
+from http_cache import install_compression, etag, validateurs, non_modifie
+
+DATE = datetime.datetime(2024, 7, 31, 13, 45, 0)
+
+
+def creer_app():
+    app = Flask(__name__)
+    install_compression(app, seuil=100)
+
+    @app.route('/petit')
+    def petit():
+        return jsonify({'a': 1})
+
+    @app.route('/grand')
+    def grand():
+        return jsonify({'valeurs': list(range(500))})
+
+    @app.route('/conditionnel')
+    def conditionnel():
+        etag_ = etag('conditionnel', 1)
+        inchangee = non_modifie(etag_, DATE)
+        if inchangee is not None:
+            return inchangee
+        response = jsonify({'a': 1})
+        response.headers.update(validateurs(etag_, DATE))
+        return response
+
+    return app
+
+
+# Compression au-dessus du seuil, si le client l'accepte
+def test_compression_seuil():
+    client = creer_app().test_client()
+
+    response = client.get('/grand', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.data) == client.get('/grand').data
+
+    # Sous le seuil, ou client sans Accept-Encoding : corps non compressé
+    assert 'Content-Encoding' not in client.get('/petit', headers={'Accept-Encoding': 'gzip'}).headers
+    assert 'Content-Encoding' not in client.get('/grand').headers
+
+
+# Réponse 304 sur If-None-Match ou If-Modified-Since
+def test_etag_et_last_modified():
+    client = creer_app().test_client()
+
+    response = client.get('/conditionnel')
+    assert response.status_code == 200
+    assert response.headers['ETag'].startswith('W/"')
+    assert response.headers['Last-Modified'] == 'Wed, 31 Jul 2024 13:45:00 GMT'
+
+    response = client.get('/conditionnel', headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+    assert response.data == b''
+
+    # If-Modified-Since seul
+    assert client.get('/conditionnel', headers={'If-Modified-Since': 'Wed, 31 Jul 2024 13:45:00 GMT'}).status_code == 304
+    assert client.get('/conditionnel', headers={'If-Modified-Since': 'Wed, 31 Jul 2024 13:44:59 GMT'}).status_code == 200
+
+    # If-None-Match prioritaire : ETag différent, contenu renvoyé
+    assert client.get('/conditionnel', headers={'If-None-Match': 'W/"autre"',
+                                               'If-Modified-Since': 'Wed, 31 Jul 2024 13:45:00 GMT'}).status_code == 200
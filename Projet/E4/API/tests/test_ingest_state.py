@@ -0,0 +1,58 @@
+import os
+import sys
+
+# Modules de l'API (ingest_state ajoute lui-même Projet/commun au chemin)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from frame_store import FrameStore
+from ingest_state import IngestState, Synchroniseur
+
+def lot(source_id, frame_id, classes):
+    return [{'source_id': source_id, 'frame_id': frame_id, 'date': ['2024-07-31 13:45:00.000'],
+             'detect': [[i, 0, 0, 1, 1, 0.9, classe, False, False, False] for i, classe in enumerate(classes)]}]
+
+# Deux workers partagent la même base : un lot reçu par l'un est visible par l'autre
+def test_lots_partages_entre_workers(tmp_path):
+    database = str(tmp_path / 'ingest_state.db')
+    worker_1, worker_2 = FrameStore(), FrameStore()
+    sync_1 = Synchroniseur(IngestState(database), worker_1)
+    recus = []
+    sync_2 = Synchroniseur(IngestState(database), worker_2, on_lot=recus.append)
+
+    with sync_1.state.transaction() as etat:
+        generation = etat.ajouter_lot(lot(1, 10, [0, 1]))
+    sync_1.synchroniser()
+    sync_2.synchroniser()
+
+    assert worker_1.generation == worker_2.generation == generation
+    assert worker_2.latest([1])[0]['frame_id'] == 10
+    assert recus == [lot(1, 10, [0, 1])]
+    assert sync_1.state.instance == sync_2.state.instance
+
+# La minute en cours est agrégée sur les comptages de tous les workers et clôturée une seule fois
+def test_minute_partagee(tmp_path):
+    database = str(tmp_path / 'ingest_state.db')
+    state_1, state_2 = IngestState(database), IngestState(database)
+    minutes = []
+    sync = Synchroniseur(state_2, FrameStore(), on_minute=minutes.append)
+
+    for state, total, couche in [(state_1, 3, 1), (state_2, 5, 2)]:
+        with state.transaction() as etat:
+            etat.add_frame(1, total, couche)
+            etat.last_minute = 45
+
+    with state_2.transaction() as etat:
+        assert etat.last_minute == 45
+        resultats = etat.cloturer_minute()
+        etat.publier_minute({'minute': etat.last_minute, 'sources': resultats})
+        etat.last_minute = 46
+
+    assert resultats[1]['nb_frames'] == 2
+    assert resultats[1]['total'] == 8
+    assert resultats[1]['couche'] == 3
+
+    sync.synchroniser()
+    assert [evenement['minute'] for evenement in minutes] == [45]
+
+    with state_1.transaction() as etat:
+        assert etat.cloturer_minute()[1]['nb_frames'] == 0
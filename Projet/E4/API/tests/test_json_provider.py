@@ -0,0 +1,53 @@
+import datetime
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask
+
+# Module commun aux API E3 et E4 : Projet/commun/json_provider.py
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'commun')))
+
+import json_provider
+from json_provider import install_json_provider
+
+REPONSE = {
+    'source': np.int64(3),
+    'moyennes': [np.float64(1.5), np.nan],
+    'quartiles': np.array([1.0, 2.0, np.nan]),
+    'jour': pd.Timestamp('2023-09-27'),
+    'date': datetime.datetime(2023, 9, 27, 13, 45),
+    'absent': pd.NaT,
+    'actif': np.bool_(True),
+    'df': pd.DataFrame({'x': [1, 2], 'y': [0.5, np.nan]}),
+}
+
+ATTENDU = {
+    'source': 3,
+    'moyennes': [1.5, None],
+    'quartiles': [1.0, 2.0, None],
+    'jour': 'Wed, 27 Sep 2023 00:00:00 GMT',
+    'date': 'Wed, 27 Sep 2023 13:45:00 GMT',
+    'absent': None,
+    'actif': True,
+    'df': [{'x': 1, 'y': 0.5}, {'x': 2, 'y': None}],
+}
+
+# Les types NumPy / pandas sont sérialisés en JSON valide, avec ou sans orjson
+@pytest.mark.parametrize('avec_orjson', [True, False])
+def test_jsonify_types_numpy_pandas(monkeypatch, avec_orjson):
+    if not avec_orjson:
+        monkeypatch.setattr(json_provider, 'orjson', None)
+    elif json_provider.orjson is None:
+        pytest.skip("orjson non installé")
+
+    app = install_json_provider(Flask(__name__))
+    with app.app_context():
+        from flask import jsonify
+        corps = jsonify(REPONSE).get_data(as_text=True)
+
+    assert json.loads(corps) == ATTENDU
+    assert 'NaN' not in corps
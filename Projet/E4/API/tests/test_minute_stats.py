@@ -0,0 +1,34 @@
+import random
+import statistics
+
+from minute_stats import MinuteAccumulator, SeriesAccumulator
+
+# Les statistiques en ligne doivent être identiques à celles du module statistics
+def test_series_accumulator_equivalent_statistics():
+    random.seed(0)
+    for taille in [2, 3, 4, 5, 17, 250, 1500]:
+        valeurs = [random.randint(0, 30) for _ in range(taille)]
+        serie = SeriesAccumulator()
+        for valeur in valeurs:
+            serie.add(valeur)
+
+        assert serie.somme == sum(valeurs)
+        assert serie.min == min(valeurs)
+        assert serie.max == max(valeurs)
+        assert abs(serie.stdev() - statistics.stdev(valeurs)) < 1e-9
+        assert serie.quartiles() == statistics.quantiles(valeurs, n=4, method='inclusive')
+        assert serie.multimode() == statistics.multimode(valeurs)
+
+# Une minute avec une seule frame conserve les valeurs par défaut
+def test_minute_accumulator_une_frame():
+    accumulateur = MinuteAccumulator()
+    accumulateur.add_frame(12, 5)
+    resultat = accumulateur.result()
+
+    assert resultat['nb_frames'] == 1
+    assert resultat['total'] == 12
+    assert resultat['couche'] == 5
+    assert resultat['debout'] == 7
+    assert resultat['std_total'] == 0
+    assert resultat['quartiles_debout'] == [0, 0, 0]
+    assert resultat['mode_couche'] is None
@@ -0,0 +1,40 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask
+
+import tabular_format
+from tabular_format import columnar, reponse_tabulaire
+
+# Les dates deviennent des timestamps Unix et les valeurs manquantes None
+def test_columnar():
+    df = pd.DataFrame({
+        'jour': pd.to_datetime(['2023-09-27', '2023-09-28']),
+        'source': [1, 2],
+        'brush': [0.5, np.nan],
+    })
+    resultat = columnar(df)
+
+    assert resultat['columns'] == ['jour', 'source', 'brush']
+    assert resultat['datetime_columns'] == ['jour']
+    assert resultat['data']['jour'] == [1695772800, 1695859200]
+    assert resultat['data']['source'] == [1, 2]
+    assert resultat['data']['brush'] == [0.5, None]
+    json.dumps(resultat)
+
+# Les réponses binaires se relisent à l'identique avec pyarrow
+@pytest.mark.skipif(tabular_format.pa is None, reason="pyarrow non installé")
+def test_reponse_arrow_parquet():
+    import io
+    import pyarrow as pa
+
+    df = pd.DataFrame({'timestamp': [1712990000, 1712990060], 'source': [1, 1], 'total': [12, 14]})
+    with Flask(__name__).app_context():
+        response = reponse_tabulaire(df, 'arrow')
+        with pa.ipc.open_stream(response.get_data()) as reader:
+            pd.testing.assert_frame_equal(reader.read_pandas(), df)
+
+        response = reponse_tabulaire(df, 'parquet')
+        pd.testing.assert_frame_equal(pd.read_parquet(io.BytesIO(response.get_data())), df)
@@ -0,0 +1,84 @@
+import threading
+
+from write_behind import WriteBehindQueue
+
+# Écrivain factice : échoue les 'echecs' premiers appels, puis enregistre les lots
+class Ecrivain:
+    def __init__(self, echecs=0, erreur=ConnectionError):
+        self.echecs = echecs
+        self.erreur = erreur
+        self.lots = []
+        self.ecrit = threading.Event()
+
+    def __call__(self, batch):
+        if self.echecs:
+            self.echecs -= 1
+            raise self.erreur('base indisponible')
+        self.lots.append(list(batch))
+        self.ecrit.set()
+
+    @property
+    def lignes(self):
+        return [ligne for lot in self.lots for ligne in lot]
+
+# Tampon plein : les lignes les plus anciennes sont abandonnées et comptées
+def test_tampon_borne():
+    ecrivain = Ecrivain()
+    queue = WriteBehindQueue(ecrivain, max_rows=3, retry_on=(ConnectionError,))
+    for ligne in range(5):
+        queue.put(ligne)
+
+    assert queue.pending() == 3
+    assert queue.dropped == 2
+    queue.close(timeout=1)
+    assert ecrivain.lignes == [2, 3, 4]
+
+# Un lot en échec est remis en tête du tampon, puis écrit dans l'ordre au nouvel essai
+def test_lot_remis_en_file_puis_ecrit():
+    ecrivain = Ecrivain(echecs=2)
+    queue = WriteBehindQueue(ecrivain, retry_on=(ConnectionError,))
+    queue.put(1)
+    queue.put(2)
+
+    assert not queue._flush_once()
+    queue.put(3)
+    assert not queue._flush_once()
+    assert queue.pending() == 3
+    assert ecrivain.lots == []
+
+    assert queue._flush_once()
+    assert ecrivain.lots == [[1, 2, 3]]
+    assert queue.pending() == 0
+    assert queue.dropped == 0
+
+# Même chose avec le thread de fond et une attente croissante entre les essais
+def test_nouvel_essai_en_arriere_plan():
+    ecrivain = Ecrivain(echecs=2)
+    queue = WriteBehindQueue(ecrivain, flush_interval=0.01, retry_delay=0.01,
+                             retry_on=(ConnectionError,)).start()
+    queue.put({'minute': 45})
+    assert ecrivain.ecrit.wait(5)
+    queue.close(timeout=1)
+    assert ecrivain.lignes == [{'minute': 45}]
+
+# Erreur hors 'retry_on' : le lot est abandonné sans bloquer la file
+def test_lot_abandonne():
+    ecrivain = Ecrivain(echecs=1, erreur=ValueError)
+    queue = WriteBehindQueue(ecrivain, retry_on=(ConnectionError,))
+    queue.put(1)
+    assert queue._flush_once()
+    assert queue.dropped == 1
+    assert queue.pending() == 0
+
+# close() écrit ce qui reste dans le tampon, sans attendre le prochain vidage
+def test_close_vide_le_tampon():
+    ecrivain = Ecrivain(echecs=1)
+    queue = WriteBehindQueue(ecrivain, flush_interval=60, retry_delay=0.01,
+                             retry_on=(ConnectionError,)).start()
+    for ligne in range(4):
+        queue.put(ligne)
+    queue.close(timeout=5)
+
+    assert ecrivain.lignes == [0, 1, 2, 3]
+    assert queue.pending() == 0
+    assert not queue._thread.is_alive()
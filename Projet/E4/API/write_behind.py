@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+File d'écriture différée (write-behind) pour les statistiques par minute.
+
+Les lignes sont déposées dans un tampon borné par le thread de la requête HTTP
+puis envoyées en base par un thread de fond, regroupées en un seul
+executemany par vidage. En cas d'indisponibilité de la base, le lot est remis
+en tête du tampon et l'envoi est retenté avec une attente croissante.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    def __init__(self, flush_fn, max_rows=10000, flush_interval=1.0,
+                 retry_delay=1.0, max_retry_delay=60.0, retry_on=(Exception,),
+                 name='write-behind'):
+        self.flush_fn = flush_fn  # Fonction qui insère une liste de lignes
+        self.max_rows = max_rows  # Taille maximale du tampon
+        self.flush_interval = flush_interval  # Délai entre deux vidages (secondes)
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.retry_on = retry_on  # Exceptions considérées comme une panne temporaire
+        self.dropped = 0  # Nombre de lignes perdues car le tampon était plein
+
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def put(self, row):
+        with self._cond:
+            if len(self._buffer) >= self.max_rows:
+                # Tampon plein (base indisponible trop longtemps) : on
+                # abandonne la ligne la plus ancienne.
+                self._buffer.popleft()
+                self.dropped += 1
+                logger.warning(f"Tampon write-behind plein, {self.dropped} ligne(s) perdue(s)")
+            self._buffer.append(row)
+
+    def pending(self):
+        with self._cond:
+            return len(self._buffer)
+
+    def _take_batch(self):
+        with self._cond:
+            batch = list(self._buffer)
+            self._buffer.clear()
+        return batch
+
+    def _requeue(self, batch):
+        with self._cond:
+            place = self.max_rows - len(self._buffer)
+            if place < len(batch):
+                self.dropped += len(batch) - max(place, 0)
+                batch = batch[len(batch) - max(place, 0):]
+            self._buffer.extendleft(reversed(batch))
+
+    def _flush_once(self):
+        batch = self._take_batch()
+        if not batch:
+            return True
+        try:
+            self.flush_fn(batch)
+            return True
+        except self.retry_on as e:
+            logger.error(f"Échec de l'écriture de {len(batch)} ligne(s), nouvel essai plus tard : {e}")
+            self._requeue(batch)
+            return False
+        except Exception as e:
+            # Erreur non liée à la disponibilité de la base : le lot est abandonné
+            # pour ne pas bloquer la file indéfiniment.
+            logger.error(f"Lot de {len(batch)} ligne(s) abandonné : {e}")
+            with self._cond:
+                self.dropped += len(batch)
+            return True
+
+    def _run(self):
+        delay = self.flush_interval
+        while True:
+            with self._cond:
+                if not self._stop:
+                    self._cond.wait(timeout=delay)
+                if self._stop:
+                    return
+            if self._flush_once():
+                delay = self.flush_interval
+            else:
+                delay = min(max(delay * 2, self.retry_delay), self.max_retry_delay)
+
+    def close(self, timeout=10.0):
+        """Arrête le thread de fond puis vide le tampon (appelé à l'arrêt)."""
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+        deadline = time.monotonic() + timeout
+        while self.pending() and time.monotonic() < deadline:
+            if not self._flush_once():
+                time.sleep(self.retry_delay)
+        if self.pending():
+            logger.error(f"{self.pending()} ligne(s) non écrite(s) à l'arrêt")
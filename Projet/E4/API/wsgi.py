@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+Point d'entrée de production de l'API E4 (port 5500) :
+
+    python wsgi.py                     # gunicorn (Linux) ou waitress (Windows)
+    gunicorn -w 4 -k gthread wsgi:app  # appel direct de gunicorn
+
+Les workers partagent l'état d'ingestion (ingest_state.py) ; leur nombre se
+règle dans la section 'serveur' de config.yaml.
+"""
+
+import os
+import sys
+
+import yaml
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'commun')))
+
+if __name__ == '__main__':
+    from serveur import servir
+
+    with open("config.yaml", "r") as file:
+        serveur_config = yaml.safe_load(file).get('serveur') or {}
+
+    servir('api_data_animov', port=serveur_config.get('port', 5500),
+           workers=serveur_config.get('workers'), threads=serveur_config.get('threads', 8))
+else:
+    from api_data_animov import app  # Application servie par 'gunicorn wsgi:app'
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+Requêtes GET conditionnelles vers l'API E4.
+
+La dernière réponse de chaque URL est gardée avec son ETag et son
+Last-Modified ; ils sont renvoyés (If-None-Match / If-Modified-Since) à la
+requête suivante. Si l'API répond 304, la réponse gardée est réutilisée :
+la page temps réel ne retélécharge pas des données inchangées toutes les 5 s.
+"""
+
+import requests
+
+
+def get_conditionnel(url, headers, cache, **kwargs):
+    """
+    GET conditionnel ; 'cache' est un dictionnaire (st.session_state...) qui
+    garde la dernière réponse 200 de chaque URL. Renvoie la réponse reçue,
+    ou la réponse gardée en cas de 304.
+    """
+    cle = (url, tuple(sorted((kwargs.get('params') or {}).items())))
+    precedente = cache.get(cle)
+
+    headers = dict(headers)
+    if precedente is not None:
+        if precedente.headers.get('ETag'):
+            headers['If-None-Match'] = precedente.headers['ETag']
+        if precedente.headers.get('Last-Modified'):
+            headers['If-Modified-Since'] = precedente.headers['Last-Modified']
+
+    response = requests.get(url, headers=headers, **kwargs)
+
+    if response.status_code == 304 and precedente is not None:
+        return precedente
+    if response.status_code == 200:
+        cache[cle] = response
+    return response
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Lecture du flux d'événements (Server-Sent Events) de la route /stream de l'API E4.
+
+Chaque événement est renvoyé sous la forme {'event': ..., 'id': ..., 'data': ...},
+les données étant décodées depuis le JSON. Les commentaires de maintien de
+connexion sont ignorés.
+"""
+
+import json
+
+import requests
+
+
+def lire_evenements(lignes):
+    """Décode un flux SSE (itérable de lignes de texte) en événements."""
+    evenement = {}
+    donnees = []
+    for ligne in lignes:
+        if not ligne:
+            # Ligne vide : fin de l'événement en cours
+            if donnees:
+                yield {'event': evenement.get('event', 'message'),
+                       'id': evenement.get('id'),
+                       'data': json.loads('\n'.join(donnees))}
+            evenement, donnees = {}, []
+            continue
+        if ligne.startswith(':'):
+            continue
+
+        champ, _, valeur = ligne.partition(':')
+        if valeur.startswith(' '):
+            valeur = valeur[1:]
+        if champ == 'data':
+            donnees.append(valeur)
+        elif champ in ('event', 'id'):
+            evenement[champ] = valeur
+
+
+def ecouter(url, headers, timeout_lecture=60):
+    """
+    Ouvre le flux et renvoie ses événements au fur et à mesure. Le générateur
+    se termine si la connexion est perdue ou si aucun octet (pas même un
+    commentaire de maintien) n'est reçu pendant 'timeout_lecture' secondes.
+    """
+    try:
+        with requests.get(url, headers=headers, stream=True, timeout=(5, timeout_lecture)) as response:
+            if response.status_code != 200:
+                return
+            yield from lire_evenements(response.iter_lines(decode_unicode=True))
+    except requests.exceptions.RequestException:
+        return
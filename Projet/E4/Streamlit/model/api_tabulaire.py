@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Lecture des réponses des routes tabulaires de l'API E4 (paramètre 'format').
+
+Le format columnar (colonnes JSON, dates en timestamps Unix) est demandé par
+défaut : il ne nécessite pas pyarrow. Les réponses Arrow IPC et Parquet sont
+lues si pyarrow est installé.
+"""
+
+import io
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+MIMETYPE_ARROW = 'application/vnd.apache.arrow.stream'
+MIMETYPE_PARQUET = 'application/vnd.apache.parquet'
+
+
+def dataframe_depuis_reponse(response):
+    """Construit le DataFrame d'une réponse records, columnar, arrow ou parquet."""
+    mimetype = response.headers.get('Content-Type', '').split(';')[0].strip()
+
+    if mimetype == MIMETYPE_ARROW:
+        with pa.ipc.open_stream(response.content) as reader:
+            return reader.read_pandas()
+
+    if mimetype == MIMETYPE_PARQUET:
+        return pd.read_parquet(io.BytesIO(response.content))
+
+    data = response.json()
+    if isinstance(data, dict) and 'columns' in data:
+        df = pd.DataFrame(data['data'], columns=data['columns'])
+        for colonne in data.get('datetime_columns', []):
+            df[colonne] = pd.to_datetime(df[colonne], unit='s')
+        return df
+
+    return pd.DataFrame(data)
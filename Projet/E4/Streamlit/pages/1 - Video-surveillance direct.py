@@ -1,9 +1,10 @@
 import streamlit as st
 from page.page import Analytics
+from model.api_conditionnel import get_conditionnel
+from model.api_evenements import ecouter
 import requests
 import pandas as pd
 from PIL import Image, ImageDraw, ImageFont
-import base64
 import io
 import time
 import warnings
@@ -31,7 +32,11 @@ class RealTime(Analytics):
         """
         Affiche l'image de la caméra avec les statistiques et annotations.
         """
-        image = self.extract_image(frame)  # Extraire l'image de la frame encodée en base64
+        if frame is None:
+            # Aucune image disponible pour cette source : rien à afficher
+            return
+
+        image = self.extract_image(frame)  # Extraire l'image à partir des octets JPEG
 
         hauteur_image = image.height
         taille_police = hauteur_image // 20  # Déterminer la taille de la police en fonction de la hauteur de l'image
@@ -60,12 +65,50 @@ class RealTime(Analytics):
 
     def extract_image(self, frame):
         """
-        Extraire l'image de la frame encodée en base64.
+        Extraire l'image de la frame (octets JPEG).
         """
-        image_data = base64.b64decode(frame)
-        image = Image.open(io.BytesIO(image_data))
+        image = Image.open(io.BytesIO(frame))
         return image.resize((1280, 720))
 
+    def reponses(self):
+        """
+        Dernières réponses de l'API gardées en session, renvoyées telles quelles
+        quand l'API répond 304.
+        """
+        if 'reponses' not in st.session_state:
+            st.session_state['reponses'] = {}
+        return st.session_state['reponses']
+
+    def get_frame(self, source):
+        """
+        Récupère la dernière image JPEG d'une source en binaire.
+        L'image est gardée en session avec son ETag : si elle n'a pas changé,
+        l'API répond 304 sans renvoyer les octets. Renvoie None si l'API
+        n'a pas d'image pour la source et qu'aucune n'est en cache.
+        """
+        if 'frames' not in st.session_state:
+            st.session_state['frames'] = {}
+        cache = st.session_state['frames']
+
+        # Image annoncée par le flux d'événements déjà en cache : pas de requête
+        annoncee = st.session_state.get('frames_annoncees', {}).get(source)
+        if source in cache and annoncee is not None and cache[source]['etag'].strip('"') == annoncee:
+            return cache[source]['jpeg']
+
+        headers = {'x-access-tokens': st.session_state.token}
+        if source in cache:
+            headers['If-None-Match'] = cache[source]['etag']
+
+        response = requests.get(f'http://{END_POINT}/frames/{source}', headers=headers)
+
+        if response.status_code == 200:
+            cache[source] = {'etag': response.headers.get('ETag'), 'jpeg': response.content}
+
+        # 304, ou erreur (404, 401...) : l'image en cache éventuelle reste affichée
+        if source not in cache:
+            return None
+        return cache[source]['jpeg']
+
     def extract_global_stats(self, stats):
         """
         Extraire les statistiques globales des données.
@@ -205,7 +248,7 @@ class RealTime(Analytics):
             if df.empty and df_.empty:
                 # Affichage de l'image sans statistiques si les données sont vides
                 self.display_cam(source,
-                                 response['data'][k]['frame'],
+                                 self.get_frame(source),
                                  None,
                                  None,
                                  df_stats.loc[f'source_{source}'],
@@ -213,7 +256,7 @@ class RealTime(Analytics):
             elif df.empty:
                 # Affichage de l'image avec les statistiques globales uniquement
                 self.display_cam(source,
-                                 response['data'][k]['frame'],
+                                 self.get_frame(source),
                                  None,
                                  df_.loc[f'source_{source}'],
                                  df_stats.loc[f'source_{source}'],
@@ -221,7 +264,7 @@ class RealTime(Analytics):
             elif df_.empty:
                 # Affichage de l'image avec les statistiques de la frame uniquement
                 self.display_cam(source,
-                                 response['data'][k]['frame'],
+                                 self.get_frame(source),
                                  df.loc[f'source_{source}'],
                                  None,
                                  df_stats.loc[f'source_{source}'],
@@ -229,14 +272,19 @@ class RealTime(Analytics):
             else:
                 # Affichage de l'image avec les deux types de statistiques
                 self.display_cam(source,
-                                 response['data'][k]['frame'],
+                                 self.get_frame(source),
                                  df.loc[f'source_{source}'],
                                  df_.loc[f'source_{source}'],
                                  df_stats.loc[f'source_{source}'],
                                  )
         else:
             # Affichage d'un message d'erreur si le flux de données est interrompu
-            image = self.extract_image(response['data'][k - 1]['frame'])
+            frame = self.get_frame(source)
+            if frame is None:
+                st.error(f"Source {source} : flux de données interrompu.")
+                return
+
+            image = self.extract_image(frame)
 
             hauteur_image = image.height
             taille_police = hauteur_image // 20
@@ -282,7 +330,8 @@ class RealTime(Analytics):
         # st.write(ROUTE)
         url = f'http://{END_POINT}/{ROUTE}'
 
-        response = requests.get(url, headers=headers)
+        # Réponse précédente réutilisée si l'API répond 304 (aucun nouveau lot)
+        response = get_conditionnel(url, headers, self.reponses())
 
         if response.status_code == 200:
             response = response.json()
@@ -318,7 +367,7 @@ class RealTime(Analytics):
 
         url = f'http://{END_POINT}/{ROUTE}'
 
-        response = requests.get(url, headers=headers)
+        response = get_conditionnel(url, headers, self.reponses())
 
         if response.status_code == 200:
             response = response.json()
@@ -354,7 +403,7 @@ class RealTime(Analytics):
         Point d'entrée principal pour exécuter l'application Streamlit.
         """
         sources = '1,2,3,4'
-        mode_images = 'Single'
+        mode_images = 'Ref'
         with_detect = 'False'
         with_stats = 'Lite'
         with_global_stats = 'True'
@@ -366,37 +415,83 @@ class RealTime(Analytics):
         df_stats_minute = self.get_api_stats()
         df_stats_heure = self.get_api_stats(type='heure')
 
-        col1, col2 = st.columns([1, 1])
-        k = -1
-        with col1:
-            k += 1
-            try:
-                self.display('1', response, k, df, df_, df_stats_minute, df_stats_heure)
-            except:
-                pass
+        zone = st.empty()
+        self.display_all(zone, response, df, df_, df_stats_minute, df_stats_heure)
 
-            try:
-                k += 1
-                self.display('2', response, k, df, df_, df_stats_minute, df_stats_heure)
-            except:
-                pass
+        if on:
+            # Mise à jour à chaque événement poussé par l'API (lot reçu ou
+            # minute clôturée), sans rechargement périodique de la page.
+            for evenement in self.get_events():
+                if evenement['event'] == 'frames':
+                    df_ = self.update_frame_stats(df_, evenement['data'])
+                elif evenement['event'] == 'minute':
+                    df_stats_minute = self.get_api_stats()
+                    df_stats_heure = self.get_api_stats(type='heure')
+                self.display_all(zone, response, df, df_, df_stats_minute, df_stats_heure)
+
+            # Flux interrompu (API redémarrée...) : nouvelle tentative
+            time.sleep(3)
+            st.rerun()
 
-        with col2:
-            try:
+    def display_all(self, zone, response, df, df_, df_stats_minute, df_stats_heure):
+        """
+        Affiche les quatre sources dans la zone, en remplaçant l'affichage précédent.
+        """
+        with zone.container():
+            col1, col2 = st.columns([1, 1])
+            k = -1
+            with col1:
                 k += 1
-                self.display('3', response, k, df, df_, df_stats_minute, df_stats_heure)
-            except:
-                pass
+                try:
+                    self.display('1', response, k, df, df_, df_stats_minute, df_stats_heure)
+                except:
+                    pass
 
-            try:
-                k += 1
-                self.display('4', response, k, df, df_, df_stats_minute, df_stats_heure)
-            except:
-                pass
+                try:
+                    k += 1
+                    self.display('2', response, k, df, df_, df_stats_minute, df_stats_heure)
+                except:
+                    pass
 
-        if on:
-            time.sleep(5)
-            st.rerun()
+            with col2:
+                try:
+                    k += 1
+                    self.display('3', response, k, df, df_, df_stats_minute, df_stats_heure)
+                except:
+                    pass
+
+                try:
+                    k += 1
+                    self.display('4', response, k, df, df_, df_stats_minute, df_stats_heure)
+                except:
+                    pass
+
+    def get_events(self):
+        """
+        Événements du flux /stream de l'API ; les images annoncées sont notées
+        pour que get_frame ne les redemande pas si elles sont déjà en cache.
+        """
+        headers = {'x-access-tokens': st.session_state.token}
+        if 'frames_annoncees' not in st.session_state:
+            st.session_state['frames_annoncees'] = {}
+
+        for evenement in ecouter(f'http://{END_POINT}/stream', headers):
+            if evenement['event'] == 'frames':
+                for source_id, source in evenement['data']['sources'].items():
+                    if source.get('etag'):
+                        st.session_state['frames_annoncees'][str(source_id)] = source['etag']
+            yield evenement
+
+    def update_frame_stats(self, df_, data):
+        """
+        Met à jour les statistiques par frame avec celles d'un événement 'frames'.
+        """
+        df_ = df_.copy() if df_ is not None else pd.DataFrame(columns=['total', 'debout', 'couche'])
+        for source_id, source in data['sources'].items():
+            if 'stats' in source:
+                df_.loc[f'source_{source_id}', ['total', 'debout', 'couche']] = [
+                    source['stats']['count'], source['stats']['debout'], source['stats']['couche']]
+        return df_
 
 if __name__ == "__main__":
     app = RealTime()
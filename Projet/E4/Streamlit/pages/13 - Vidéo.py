@@ -2,6 +2,7 @@ import streamlit as st
 from model.model import segment_video
 import os
 from page.page import Analytics
+from model.api_tabulaire import dataframe_depuis_reponse
 import requests
 import plotly.graph_objects as go
 import pandas as pd
@@ -65,13 +66,12 @@ class VideoAnalytics(Analytics):
         }
         
         url = f'http://{END_POINT}/chevres_minutes'
-        response = requests.get(url, headers=headers)
+        # Format colonnes : réponse plus compacte, dates déjà en timestamps Unix
+        response = requests.get(url, headers=headers, params={'format': 'columnar'})
 
         try:
             response.raise_for_status()
-            data = response.json()
-            df = pd.DataFrame(data)
-            df['jour'] = pd.to_datetime(df['jour'], format='%a, %d %b %Y %H:%M:%S GMT')
+            df = dataframe_depuis_reponse(response)
             return df
 
         except requests.exceptions.HTTPError as http_err:
@@ -1,5 +1,6 @@
 import streamlit as st
 from page.page import Analytics
+from model.api_tabulaire import dataframe_depuis_reponse
 import plotly.graph_objects as go
 import matplotlib.colors as mcolors
 from plotly.subplots import make_subplots
@@ -102,13 +103,12 @@ class VideoAnalytics_3_(Analytics):
         }
 
         url = f'http://{END_POINT}/chevres_heures'
-        response = requests.get(url, headers=headers)
+        # Format colonnes : réponse plus compacte, dates déjà en timestamps Unix
+        response = requests.get(url, headers=headers, params={'format': 'columnar'})
 
         try:
             response.raise_for_status()
-            data = response.json()
-            df = pd.DataFrame(data)
-            df['jour'] = pd.to_datetime(df['jour'], format='%a, %d %b %Y %H:%M:%S GMT')
+            df = dataframe_depuis_reponse(response)
             return df
 
         except requests.exceptions.HTTPError as http_err:
@@ -135,13 +135,12 @@ class VideoAnalytics_3_(Analytics):
         }
 
         url = f'http://{END_POINT}/chevres_minutes'
-        response = requests.get(url, headers=headers)
+        # Format colonnes : réponse plus compacte, dates déjà en timestamps Unix
+        response = requests.get(url, headers=headers, params={'format': 'columnar'})
 
         try:
             response.raise_for_status()
-            data = response.json()
-            df = pd.DataFrame(data)
-            df['jour'] = pd.to_datetime(df['jour'], format='%a, %d %b %Y %H:%M:%S GMT')
+            df = dataframe_depuis_reponse(response)
             return df
 
         except requests.exceptions.HTTPError as http_err:
@@ -1,5 +1,6 @@
 import streamlit as st
 from page.page import Analytics
+from model.api_tabulaire import dataframe_depuis_reponse
 import requests
 import pandas as pd
 from PIL import Image, ImageDraw, ImageFont
@@ -64,18 +65,15 @@ class VideoAnalytics(Analytics):
             url = f'http://{END_POINT}/get_serie_last_heure'
         else:
             url = f'http://{END_POINT}/get_serie_last_heure'
-            
-        response = requests.get(url, headers=headers)
+
+        # Filtrage par source fait par l'API, en SQL
+        response = requests.get(url, headers=headers, params={'source': source, 'format': 'columnar'})
 
         try:
             response.raise_for_status()
-            data = response.json()
-            df = pd.DataFrame(data)
-
-            # Filtrer les données pour la source spécifiée
-            filtered_df = df[df['source'] == source]
+            df = dataframe_depuis_reponse(response)
 
-            return filtered_df
+            return df
 
         except requests.HTTPError as http_err:
             print(f'HTTP error occurred: {http_err}')
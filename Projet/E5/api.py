@@ -19,6 +19,15 @@ import traceback
 import logging
 import numpy as np
 from io import BytesIO
+import sys
+
+# Fournisseur JSON commun aux API (Projet/commun) ; absent dans l'image Docker
+# qui ne contient que api.py : la sérialisation par défaut de Flask est gardée.
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'commun')))
+try:
+    from json_provider import install_json_provider
+except ImportError:
+    install_json_provider = None
 
 log_levels = {
     'DEBUG': 10,
@@ -101,6 +110,8 @@ def send_email(message, sujet):
     server.quit()
 
 app = Flask(__name__)
+if install_json_provider is not None:
+    install_json_provider(app)
 
 @app.route('/send_mail', methods=['GET'])
 def send_mail( corps = "Bonjour, ceci est un message de test envoyé depuis Python.", subjet = "Sujet de votre email"):
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+Point d'entrée de production de l'API E5 (port 5002) :
+
+    python wsgi.py                                      # gunicorn (Linux) ou waitress (Windows)
+    gunicorn -w 1 --threads 8 -b 0.0.0.0:5002 api:app  # image Docker (Dockerfile)
+
+Un seul worker par défaut : l'état de surveillance (seuils, dernières mesures
+du démon) est gardé en mémoire par api.py. Section 'serveur' de config.yaml.
+"""
+
+import os
+import sys
+
+import yaml
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'commun')))
+
+if __name__ == '__main__':
+    from serveur import servir
+
+    with open("config.yaml", "r") as file:
+        serveur_config = yaml.safe_load(file).get('serveur') or {}
+
+    servir('api', port=serveur_config.get('port', 5002),
+           workers=serveur_config.get('workers', 1), threads=serveur_config.get('threads', 8))
+else:
+    from api import app  # Application servie par 'gunicorn wsgi:app'
@@ -33,16 +33,16 @@ start "MLflow Server" cmd /k "CALL conda.bat activate ANIMOV_Yolo && mlflow serv
 
 REM API E5
 cd /d %BASE_DIR%E5
-start "API E5" cmd /k "CALL conda.bat activate ANIMOV_Yolo && python api.py"
+start "API E5" cmd /k "CALL conda.bat activate ANIMOV_Yolo && python wsgi.py"
 
 REM API E3E4
 cd /d %BASE_DIR%E4\API
-start "API E4" cmd /k "CALL conda.bat activate ANIMOV_Yolo && python api_data_animov.py"
+start "API E4" cmd /k "CALL conda.bat activate ANIMOV_Yolo && python wsgi.py"
 
 REM Démarrer l'API Flask
 cd /d %BASE_DIR%E3\api_flask
 REM start "API Flask" cmd /k "CALL conda.bat activate ANIMOV_Yolo && python appjwt_refactoring_gpu.py"
-start "API Flask" cmd /k "CALL conda.bat activate ANIMOV_Yolo && python appjwt.py"
+start "API Flask" cmd /k "CALL conda.bat activate ANIMOV_Yolo && python wsgi.py"
 
 REM Démarrer l'application Streamlit
 cd /d %BASE_DIR%E3\app
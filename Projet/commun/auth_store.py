@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+"""
+Base d'authentification SQLite (utilisateurs et tokens JWT) commune aux API
+E3 (api_flask/appjwt.py) et E4 (API/api_data_animov.py).
+
+Les connexions SQLite sont ouvertes une fois puis réutilisées par un petit
+pool : plus d'ouverture de fichier à chaque requête, et chaque connexion
+garde en cache ses requêtes préparées. Les connexions sont en mode WAL
+(les validations ne sont pas bloquées par les logins) avec un délai
+d'attente en cas de verrou, pour éviter les erreurs « database is locked ».
+
+Les tokens validés sont gardés en cache par chaque processus. Avec plusieurs
+workers, une révocation (logout) est aussi inscrite dans la table
+revocations, que chaque worker relit au plus toutes les
+REVOCATIONS_INTERVALLE secondes pour retirer ces tokens de son cache.
+
+Les modules db_utils de chaque API exposent ces fonctions avec leur propre
+fichier DATABASE.
+"""
+
+import os
+import queue
+import sqlite3
+import datetime
+import threading
+import time
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+import jwt
+
+TOKEN_DUREE = datetime.timedelta(hours=12)  # Durée de validité d'un token
+# Un token déjà émis n'est réutilisé au login que s'il reste valide au moins ce délai
+TOKEN_REUTILISATION_MIN = datetime.timedelta(hours=1)
+
+# Format des dates d'expiration en base (identique à l'adaptateur datetime de sqlite3)
+FORMAT_EXPIRATION = '%Y-%m-%d %H:%M:%S.%f'
+
+# Délai maximal (secondes) avant qu'un token révoqué par un autre worker ne soit plus accepté
+REVOCATIONS_INTERVALLE = 1.0
+
+logger = logging.getLogger(__name__)
+
+# Requêtes de la base d'authentification, toujours le même texte SQL pour
+# profiter du cache de requêtes préparées de chaque connexion.
+SQL_CREATE_USERS = '''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL UNIQUE,
+        password TEXT NOT NULL
+    )
+'''
+SQL_CREATE_TOKENS = '''
+    CREATE TABLE IF NOT EXISTS tokens (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        token TEXT NOT NULL,
+        username TEXT NOT NULL,
+        expiration DATETIME NOT NULL
+    )
+'''
+SQL_CREATE_REVOCATIONS = '''
+    CREATE TABLE IF NOT EXISTS revocations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        token TEXT NOT NULL,
+        date DATETIME NOT NULL
+    )
+'''
+SQL_INDEX = [
+    "CREATE INDEX IF NOT EXISTS idx_tokens_token ON tokens (token)",
+    "CREATE INDEX IF NOT EXISTS idx_tokens_expiration ON tokens (expiration)",
+    "CREATE INDEX IF NOT EXISTS idx_tokens_username_expiration ON tokens (username, expiration)",
+]
+SQL_INSERT_USER = "INSERT INTO users (username, password) VALUES (?, ?)"
+SQL_SELECT_USER = "SELECT id FROM users WHERE username=? AND password=?"
+SQL_SELECT_TOKEN_UTILISATEUR = "SELECT token FROM tokens WHERE username=? AND expiration>? ORDER BY expiration DESC LIMIT 1"
+SQL_INSERT_TOKEN = "INSERT INTO tokens (token, username, expiration) VALUES (?, ?, ?)"
+SQL_SELECT_EXPIRATION = "SELECT expiration FROM tokens WHERE token=?"
+SQL_DELETE_TOKEN = "DELETE FROM tokens WHERE token=?"
+SQL_PURGE_TOKENS = "DELETE FROM tokens WHERE expiration<?"
+SQL_INSERT_REVOCATION = "INSERT INTO revocations (token, date) VALUES (?, ?)"
+SQL_DERNIERE_REVOCATION = "SELECT COALESCE(MAX(id), 0) FROM revocations"
+SQL_REVOCATIONS_DEPUIS = "SELECT id, token FROM revocations WHERE id>? ORDER BY id"
+SQL_PURGE_REVOCATIONS = "DELETE FROM revocations WHERE date<?"
+
+
+def _format_expiration(expiration):
+    return expiration.strftime(FORMAT_EXPIRATION)
+
+
+def _parse_expiration(expiration):
+    if isinstance(expiration, datetime.datetime):
+        return expiration
+    return datetime.datetime.fromisoformat(expiration)
+
+
+# Pool de connexions SQLite réutilisables entre threads
+class ConnectionPool:
+    def __init__(self, database, size=8, timeout=5.0, cached_statements=64):
+        self.database = database
+        self.size = size  # Nombre maximal de connexions ouvertes
+        self.timeout = timeout  # Attente maximale (secondes) sur un verrou SQLite
+        self.cached_statements = cached_statements  # Requêtes préparées gardées par connexion
+        self._libres = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._ouvertes = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, timeout=self.timeout,
+                               cached_statements=self.cached_statements,
+                               check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._libres.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._ouvertes < self.size:
+                self._ouvertes += 1
+                creer = True
+            else:
+                creer = False
+        if creer:
+            try:
+                return self._connect()
+            except sqlite3.Error:
+                with self._lock:
+                    self._ouvertes -= 1
+                raise
+        # Pool plein : attente qu'une connexion soit rendue. Même exception
+        # qu'un verrou SQLite trop long, que les appelants traitent déjà.
+        try:
+            return self._libres.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"Aucune connexion libre après {self.timeout} s (pool de {self.size})") from None
+
+    @contextmanager
+    def connection(self):
+        """Prête une connexion ; validation (commit) en sortie, annulation en cas d'erreur."""
+        conn = self._acquire()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._libres.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                conn = self._libres.get_nowait()
+            except queue.Empty:
+                return
+            conn.close()
+            with self._lock:
+                self._ouvertes -= 1
+
+
+# Cache en mémoire des tokens déjà validés, borné (LRU) et à durée de vie
+# limitée : les requêtes authentifiées n'interrogent plus SQLite à chaque appel.
+class TokenCache:
+    def __init__(self, max_size=1024, ttl=300):
+        self.max_size = max_size  # Nombre maximal de tokens gardés en cache
+        self.ttl = ttl  # Durée (secondes) avant de revérifier le token en base
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (token, clé) -> (expiration, date de mise en cache)
+
+    def get(self, token, secret_key):
+        cle = (token, secret_key)
+        with self._lock:
+            entree = self._entries.get(cle)
+            if entree is None:
+                return None
+            expiration, date_cache = entree
+            if time.monotonic() - date_cache > self.ttl or expiration < datetime.datetime.utcnow():
+                del self._entries[cle]
+                return None
+            self._entries.move_to_end(cle)
+            return expiration
+
+    def put(self, token, secret_key, expiration):
+        with self._lock:
+            self._entries[(token, secret_key)] = (expiration, time.monotonic())
+            self._entries.move_to_end((token, secret_key))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def revoke(self, token):
+        with self._lock:
+            for cle in [cle for cle in self._entries if cle[0] == token]:
+                del self._entries[cle]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class AuthStore:
+    def __init__(self, database, pool_size=8, timeout=5.0, revocations_intervalle=REVOCATIONS_INTERVALLE):
+        self.database = database
+        self.pool = ConnectionPool(database, size=pool_size, timeout=timeout)
+        self.token_cache = TokenCache()
+        self.revocations_intervalle = revocations_intervalle  # Délai entre deux lectures des révocations
+
+        self._revocations_lock = threading.Lock()
+        self._derniere_revocation = None  # Dernière révocation appliquée au cache
+        self._revocations_lues = 0.0  # Date (monotonic) de la dernière lecture
+
+    def init_db(self):
+        with self.pool.connection() as conn:
+            conn.execute(SQL_CREATE_USERS)
+            conn.execute(SQL_CREATE_TOKENS)
+            conn.execute(SQL_CREATE_REVOCATIONS)
+            for sql in SQL_INDEX:
+                conn.execute(sql)
+
+    def add_user(self, username, password):
+        with self.pool.connection() as conn:
+            conn.execute(SQL_INSERT_USER, (username, password))
+
+    def authenticate_user(self, username, password, secret_key):
+        with self.pool.connection() as conn:
+            if conn.execute(SQL_SELECT_USER, (username, password)).fetchone() is None:
+                return None
+            maintenant = datetime.datetime.utcnow()
+
+            # Réutilisation du dernier token encore valide de l'utilisateur :
+            # un login ne crée plus systématiquement une nouvelle ligne.
+            existant = conn.execute(SQL_SELECT_TOKEN_UTILISATEUR,
+                                    (username, _format_expiration(maintenant + TOKEN_REUTILISATION_MIN))).fetchone()
+            if existant:
+                try:
+                    jwt.decode(existant[0], secret_key, algorithms=["HS256"])
+                    return existant[0]
+                except jwt.InvalidTokenError:
+                    pass  # Signé avec une autre clé : un nouveau token est émis
+
+            expiration = maintenant + TOKEN_DUREE
+            token = jwt.encode({'user': username, 'exp': expiration}, secret_key, algorithm="HS256")
+            conn.execute(SQL_INSERT_TOKEN, (token, username, _format_expiration(expiration)))
+            return token
+
+    def validate_token(self, token, secret_key):
+        """
+        Vérifie un token (présence en base, expiration et signature JWT).
+        Renvoie None si le token est valide, sinon le message d'erreur.
+        """
+        self._appliquer_revocations()
+        if self.token_cache.get(token, secret_key) is not None:
+            return None
+
+        try:
+            with self.pool.connection() as conn:
+                token_data = conn.execute(SQL_SELECT_EXPIRATION, (token,)).fetchone()
+            if not token_data:
+                return 'Token invalide'
+            expiration = _parse_expiration(token_data[0])
+            if expiration < datetime.datetime.utcnow():
+                return 'Token expiré'
+            jwt.decode(token, secret_key, algorithms=["HS256"])
+        except jwt.ExpiredSignatureError:
+            return 'Token expiré'
+        except jwt.InvalidTokenError:
+            return 'Token invalide'
+
+        self.token_cache.put(token, secret_key, expiration)
+        return None
+
+    def revoke_token(self, token):
+        with self.pool.connection() as conn:
+            conn.execute(SQL_DELETE_TOKEN, (token,))
+            # Révocation signalée aux autres workers, qui ont pu garder le token en cache
+            conn.execute(SQL_INSERT_REVOCATION, (token, _format_expiration(datetime.datetime.utcnow())))
+        self.token_cache.revoke(token)
+
+    def _appliquer_revocations(self):
+        """Retire du cache les tokens révoqués par les autres workers (au plus une lecture par intervalle)."""
+        with self._revocations_lock:
+            maintenant = time.monotonic()
+            if self._derniere_revocation is not None and maintenant - self._revocations_lues < self.revocations_intervalle:
+                return
+            with self.pool.connection() as conn:
+                if self._derniere_revocation is None:
+                    # Premier appel : le cache est vide, seules les révocations suivantes comptent
+                    self._derniere_revocation = conn.execute(SQL_DERNIERE_REVOCATION).fetchone()[0]
+                    revocations = []
+                else:
+                    revocations = conn.execute(SQL_REVOCATIONS_DEPUIS, (self._derniere_revocation,)).fetchall()
+            for id_, token in revocations:
+                self.token_cache.revoke(token)
+                self._derniere_revocation = id_
+            self._revocations_lues = maintenant
+
+    def purge_expired_tokens(self):
+        """Supprime les tokens expirés et renvoie le nombre de lignes supprimées."""
+        maintenant = datetime.datetime.utcnow()
+        with self.pool.connection() as conn:
+            cursor = conn.execute(SQL_PURGE_TOKENS, (_format_expiration(maintenant),))
+            # Au-delà de la durée de vie du cache, aucun worker ne garde plus ces tokens
+            conn.execute(SQL_PURGE_REVOCATIONS,
+                         (_format_expiration(maintenant - datetime.timedelta(seconds=self.token_cache.ttl)),))
+            return cursor.rowcount
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(database):
+    """Renvoie la base d'authentification associée au fichier (une instance par fichier)."""
+    chemin = os.path.abspath(database)
+    with _stores_lock:
+        if chemin not in _stores:
+            _stores[chemin] = AuthStore(chemin)
+        return _stores[chemin]
+
+
+# Purge périodique des tokens expirés dans un thread de fond
+class TokenPurger:
+    def __init__(self, purge, interval=3600):
+        self.purge = purge  # Fonction de purge, renvoie le nombre de tokens supprimés
+        self.interval = interval  # Délai entre deux purges (secondes)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='token-purge', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            try:
+                supprimes = self.purge()
+                if supprimes:
+                    logger.info(f"{supprimes} token(s) expiré(s) supprimé(s)")
+            except sqlite3.Error as e:
+                logger.error(f"Échec de la purge des tokens : {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Fournisseur JSON commun aux API Flask (E3 appjwt.py, E4 api_data_animov.py,
+E5 api.py), installé par install_json_provider(app).
+
+Les réponses contiennent des scalaires et tableaux NumPy, des objets pandas
+et des NaN : ils sont convertis directement (NaN et NaT deviennent null),
+sans passer par des conversions au cas par cas dans les routes. Si orjson
+est installé, il est utilisé pour l'encodage et le décodage ; sinon le
+module json standard est utilisé, avec les mêmes conversions.
+
+Le format reste celui de Flask : clés triées, dates au format HTTP
+(« Wed, 27 Sep 2023 00:00:00 GMT »), Decimal et UUID en chaînes.
+"""
+
+import dataclasses
+import datetime
+import decimal
+import json
+import math
+import uuid
+
+import numpy as np
+import pandas as pd
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:  # orjson absent : encodage par le module json standard
+    orjson = None
+
+if orjson is not None:
+    # Dates laissées à convertir() pour garder le format HTTP de Flask
+    OPTIONS_ORJSON = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def convertir(o):
+    """Conversion des objets non JSON natifs (fonction 'default' des encodeurs)."""
+    if isinstance(o, (datetime.date, datetime.datetime)):
+        if o is pd.NaT:
+            return None
+        if isinstance(o, pd.Timestamp):
+            o = o.to_pydatetime()
+        return http_date(o)
+    if isinstance(o, np.bool_):
+        return bool(o)
+    if isinstance(o, np.integer):
+        return int(o)
+    if isinstance(o, np.floating):
+        return None if math.isnan(o) or math.isinf(o) else float(o)
+    if isinstance(o, np.ndarray):
+        return nettoyer(o.tolist())
+    if isinstance(o, pd.DataFrame):
+        return nettoyer(o.to_dict(orient='records'))
+    if isinstance(o, (pd.Series, pd.Index)):
+        return nettoyer(o.tolist())
+    if o is pd.NaT or o is pd.NA:
+        return None
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def nettoyer(o):
+    """Remplace récursivement NaN / infini par None (chemin sans orjson)."""
+    if isinstance(o, float):
+        return None if math.isnan(o) or math.isinf(o) else o
+    if isinstance(o, dict):
+        return {cle: nettoyer(valeur) for cle, valeur in o.items()}
+    if isinstance(o, (list, tuple)):
+        return [nettoyer(valeur) for valeur in o]
+    return o
+
+
+class AnimovJSONProvider(DefaultJSONProvider):
+    default = staticmethod(convertir)
+
+    def _dumps_orjson(self, obj):
+        option = OPTIONS_ORJSON | (orjson.OPT_SORT_KEYS if self.sort_keys else 0)
+        return orjson.dumps(obj, default=convertir, option=option)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            try:
+                return self._dumps_orjson(obj).decode('utf-8')
+            except TypeError:
+                pass  # Type non géré par orjson (entier > 64 bits...) : chemin standard
+        kwargs.setdefault('default', convertir)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        kwargs.setdefault('allow_nan', False)
+        return json.dumps(nettoyer(obj), **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        joli = self.compact is False or (self.compact is None and self._app.debug)
+        if orjson is not None and not joli:
+            try:
+                corps = self._dumps_orjson(obj) + b"\n"
+                return self._app.response_class(corps, mimetype=self.mimetype)
+            except TypeError:
+                pass
+        return super().response(*args, **kwargs)
+
+
+def install_json_provider(app):
+    """Installe le fournisseur JSON sur l'application (jsonify, request.json)."""
+    app.json_provider_class = AnimovJSONProvider
+    app.json = AnimovJSONProvider(app)
+    return app
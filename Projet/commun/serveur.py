@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Lancement des API Flask en production (fichiers wsgi.py de chaque API).
+
+Sous Linux, gunicorn lance plusieurs processus (workers) avec plusieurs
+threads chacun. Chaque worker importe lui-même le module de l'application
+(pas de préchargement dans le processus maître) : les threads de fond
+(purge des tokens, écriture différée, synchronisation...) démarrent donc dans
+chaque worker. Sous Windows, où gunicorn n'existe pas, waitress sert
+l'application dans un seul processus avec plusieurs threads. À défaut des
+deux, le serveur de développement de Flask est utilisé.
+
+Le nombre de workers vient de la configuration, sinon de la variable
+d'environnement WEB_CONCURRENCY, sinon du nombre de cœurs.
+"""
+
+import importlib
+import logging
+import multiprocessing
+import os
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # gunicorn absent (Windows) : waitress ou serveur Flask
+    BaseApplication = None
+
+try:
+    import waitress
+except ImportError:
+    waitress = None
+
+logger = logging.getLogger(__name__)
+
+
+def nb_workers(workers=None):
+    if workers:
+        return int(workers)
+    if os.environ.get('WEB_CONCURRENCY'):
+        return int(os.environ['WEB_CONCURRENCY'])
+    return multiprocessing.cpu_count()
+
+
+def threads_par_processus(workers=None, threads=8):
+    """
+    Threads servant des requêtes dans un même processus, pour dimensionner
+    les pools de connexions : 'threads' avec gunicorn, tous les threads avec
+    waitress (un seul processus).
+    """
+    if BaseApplication is None and waitress is not None:
+        return nb_workers(workers) * threads
+    return threads
+
+
+def charger_app(module):
+    return importlib.import_module(module).app
+
+
+if BaseApplication is not None:
+    class ApplicationGunicorn(BaseApplication):
+        def __init__(self, module, options):
+            self.module = module
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for cle, valeur in self.options.items():
+                self.cfg.set(cle, valeur)
+
+        def load(self):
+            # Appelé dans chaque worker (preload_app désactivé)
+            return charger_app(self.module)
+
+
+def servir(module, port, host='0.0.0.0', workers=None, threads=8, timeout=120):
+    """
+    Sert l'application 'app' du module donné (ex. 'api_data_animov').
+    'threads' : threads par worker (connexions /stream, requêtes lentes).
+    """
+    workers = nb_workers(workers)
+
+    if BaseApplication is not None:
+        options = {
+            'bind': f'{host}:{port}',
+            'workers': workers,
+            'threads': threads,
+            'worker_class': 'gthread',
+            'timeout': timeout,
+            'preload_app': False,
+        }
+        logger.info(f"gunicorn : {workers} worker(s) x {threads} thread(s) sur le port {port}")
+        ApplicationGunicorn(module, options).run()
+    elif waitress is not None:
+        logger.info(f"waitress : {workers * threads} thread(s) sur le port {port}")
+        waitress.serve(charger_app(module), host=host, port=int(port), threads=workers * threads)
+    else:
+        logger.warning("Ni gunicorn ni waitress ne sont installés : serveur de développement Flask")
+        charger_app(module).run(host=host, port=int(port), threaded=True)